@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Throughput benchmark of the input pipeline, without the model.
+#
+# Usage:
+#   python -m data.benchmark --config_file configs/seg/ade20k/base_fcn_ade20k_seg.conf \
+#       --phase train --num_batches 200 --report bench.json
+
+
+import os
+import json
+import time
+import argparse
+import importlib
+import collections
+import torch
+
+from lib.data.cv2_aug_transforms import CV2AugCompose
+from lib.data.pil_aug_transforms import PILAugCompose
+from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.util.configer import Configer
+from lib.tools.util.logger import Logger as Log
+
+
+DATA_LOADER_DICT = {
+    'seg': 'data.seg.data_loader',
+    'det': 'data.det.data_loader',
+    'cls': 'data.cls.data_loader',
+    'pose': 'data.pose.data_loader',
+    'gan': 'data.gan.data_loader',
+    'ins': 'data.ins.data_loader',
+}
+
+# The seconds accumulated in the current process (main or worker), sent back with every batch.
+STAT_DICT = collections.defaultdict(float)
+
+
+def timed(func, key):
+    def wrapper(*args, **kwargs):
+        start_time = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            STAT_DICT[key] += time.time() - start_time
+
+    return wrapper
+
+
+def timed_iter(func, key):
+    # The time of every next of the iterator, as the items are read lazily between the yields.
+    def wrapper(*args, **kwargs):
+        iterator = iter(func(*args, **kwargs))
+        while True:
+            start_time = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                STAT_DICT[key] += time.time() - start_time
+
+            yield item
+
+    return wrapper
+
+
+class PipelineBenchmark(object):
+    """Iterate the configured loader and report the input pipeline throughput.
+
+    The decode (ImageHelper.read_image*), augment (CV2AugCompose/PILAugCompose), the rest of __getitem__
+    (to tensor, normalize, target generation...), or of the yields of __iter__ for the IterableDataset,
+    and collate are timed inside the workers, and sent back
+    with the batches. The worker utilisation is the busy time of a worker over the wall time.
+    """
+    def __init__(self, configer):
+        self.configer = configer
+
+    def get_loader(self, phase):
+        if phase == 'test':
+            from data.test.test_data_loader import TestDataLoader
+            return TestDataLoader(self.configer).get_testloader()
+
+        task = self.configer.get('task')
+        if task not in DATA_LOADER_DICT:
+            Log.error('Task: {} is not valid.'.format(task))
+            exit(1)
+
+        data_loader = importlib.import_module(DATA_LOADER_DICT[task]).DataLoader(self.configer)
+        if phase == 'train':
+            return data_loader.get_trainloader()
+
+        elif phase == 'val':
+            return data_loader.get_valloader()
+
+        else:
+            Log.error('Phase: {} is not valid.'.format(phase))
+            exit(1)
+
+    @staticmethod
+    def instrument(loader):
+        # The patches are inherited by the workers, which are forked at the first iteration.
+        torch_loader = getattr(loader, 'loader', loader)
+        dataset = torch_loader.dataset
+        aug_transform = getattr(dataset, 'aug_transform', None)
+        if isinstance(aug_transform, (CV2AugCompose, PILAugCompose)):
+            aug_transform.time_dict = dict()
+
+        ImageHelper.read_image = staticmethod(timed(ImageHelper.read_image, 'decode'))
+        ImageHelper.read_image_from_bytes = staticmethod(timed(ImageHelper.read_image_from_bytes, 'decode'))
+        CV2AugCompose.__call__ = timed(CV2AugCompose.__call__, 'augment')
+        PILAugCompose.__call__ = timed(PILAugCompose.__call__, 'augment')
+        if isinstance(dataset, torch.utils.data.IterableDataset):
+            # The stream datasets never call __getitem__.
+            type(dataset).__iter__ = timed_iter(type(dataset).__iter__, 'getitem')
+        else:
+            type(dataset).__getitem__ = timed(type(dataset).__getitem__, 'getitem')
+
+        collate_fn = torch_loader.collate_fn
+
+        def bench_collate(batch):
+            start_time = time.time()
+            out = collate_fn(batch)
+            STAT_DICT['collate'] += time.time() - start_time
+            worker_info = torch.utils.data.get_worker_info()
+            info = dict(worker='main' if worker_info is None else worker_info.id,
+                        num_samples=len(batch), stats=dict(STAT_DICT))
+            if isinstance(aug_transform, (CV2AugCompose, PILAugCompose)):
+                info['trans'] = dict(aug_transform.time_dict)
+                aug_transform.time_dict.clear()
+
+            STAT_DICT.clear()
+            return out, info
+
+        torch_loader.collate_fn = bench_collate
+
+    def run(self, phase, num_batches, warmup):
+        loader = self.get_loader(phase)
+        self.instrument(loader)
+        num_workers = getattr(loader, 'loader', loader).num_workers
+
+        stage_dict = collections.defaultdict(float)
+        trans_dict = collections.defaultdict(float)
+        busy_dict = collections.defaultdict(float)
+        num_samples, num_measured, wait_time = 0, 0, 0.0
+        init_time = start_time = time.time()
+        first_batch_time = None
+        wait_start = time.time()
+        while num_measured < num_batches:
+            num_epoch_batches = 0
+            for batch, info in loader:
+                num_epoch_batches += 1
+                wait_time_i = time.time() - wait_start
+                if first_batch_time is None:
+                    first_batch_time = time.time() - init_time
+
+                if warmup > 0:
+                    warmup -= 1
+                    if warmup == 0:
+                        start_time = time.time()
+
+                    wait_start = time.time()
+                    continue
+
+                wait_time += wait_time_i
+                num_measured += 1
+                num_samples += info['num_samples']
+                for key, value in info['stats'].items():
+                    stage_dict[key] += value
+
+                for key, value in info.get('trans', dict()).items():
+                    trans_dict[key] += value
+
+                busy_dict[info['worker']] += info['stats'].get('getitem', 0.0) + info['stats'].get('collate', 0.0)
+                if num_measured == num_batches:
+                    break
+
+                wait_start = time.time()
+
+            if num_epoch_batches == 0:
+                Log.error('The {} loader is empty.'.format(phase))
+                exit(1)
+
+        wall_time = time.time() - start_time
+        return self.report(phase, num_workers, num_measured, num_samples, wall_time, first_batch_time,
+                           wait_time, stage_dict, trans_dict, busy_dict)
+
+    def report(self, phase, num_workers, num_batches, num_samples, wall_time, first_batch_time,
+               wait_time, stage_dict, trans_dict, busy_dict):
+        def per_sample(seconds):
+            return 1000.0 * seconds / max(num_samples, 1)
+
+        other_time = stage_dict['getitem'] - stage_dict['decode'] - stage_dict['augment']
+        num_slots = max(num_workers, 1)
+        return dict(
+            time=time.strftime('%Y-%m-%d %H:%M:%S'),
+            config_file=self.configer.get('config_file', default=None),
+            task=self.configer.get('task'),
+            phase=phase,
+            num_workers=num_workers,
+            num_batches=num_batches,
+            num_samples=num_samples,
+            wall_time=wall_time,
+            samples_per_sec=num_samples / wall_time,
+            batches_per_sec=num_batches / wall_time,
+            first_batch_time=first_batch_time,
+            main_wait_ratio=wait_time / wall_time,
+            stage_ms_per_sample=dict(decode=per_sample(stage_dict['decode']),
+                                     augment=per_sample(stage_dict['augment']),
+                                     getitem_other=per_sample(other_time),
+                                     collate=per_sample(stage_dict['collate'])),
+            transform_ms_per_sample={key: per_sample(value) for key, value in trans_dict.items()},
+            worker_utilisation={str(key): value / wall_time for key, value in sorted(busy_dict.items(), key=str)},
+            mean_worker_utilisation=sum(busy_dict.values()) / wall_time / num_slots
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_file', default=None, type=str,
+                        dest='config_file', help='The file of the hyper parameters.')
+    parser.add_argument('--phase', default='train', type=str,
+                        dest='phase', help='The split of the loader: train, val or test.')
+    parser.add_argument('--gpu', default=None, nargs='+', type=int,
+                        dest='gpu', help='The gpu list used.')
+    parser.add_argument('--data_dir', default=None, type=str,
+                        dest='data.data_dir', help='The Directory of the data.')
+    parser.add_argument('--workers', default=None, type=int,
+                        dest='data.num_workers', help='The number of workers to load data.')
+    parser.add_argument('--train_batch_size', default=None, type=int,
+                        dest='train.batch_size', help='The batch size of training.')
+    parser.add_argument('--val_batch_size', default=None, type=int,
+                        dest='val.batch_size', help='The batch size of validation.')
+    parser.add_argument('--num_batches', default=100, type=int,
+                        dest='num_batches', help='The number of the measured batches.')
+    parser.add_argument('--warmup', default=10, type=int,
+                        dest='warmup', help='The number of the batches skipped before measuring.')
+    parser.add_argument('--report', default=None, type=str,
+                        dest='report', help='The path of the json report.')
+    parser.add_argument('--log_level', default="info", type=str,
+                        dest='logging.log_level', help='To set the level to print to screen.')
+    parser.add_argument('--log_format', default="%(asctime)s %(levelname)-7s %(message)s", type=str,
+                        dest='logging.log_format', help='To set the format to print to screen.')
+
+    args = parser.parse_args()
+    configer = Configer(args_parser=args)
+    configer.update('data.data_dir', os.path.expanduser(configer.get('data', 'data_dir')))
+    Log.init(log_level=configer.get('logging', 'log_level'),
+             log_format=configer.get('logging', 'log_format'))
+
+    report = PipelineBenchmark(configer).run(args.phase, args.num_batches, args.warmup)
+    Log.info('Benchmark: {:.2f} samples/s.'.format(report['samples_per_sec']))
+    if args.report is not None:
+        with open(args.report, 'w') as write_stream:
+            json.dump(report, write_stream, indent=2)
+
+    else:
+        print(json.dumps(report, indent=2))
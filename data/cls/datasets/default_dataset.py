@@ -8,6 +8,9 @@ import json
 import os
 import torch.utils.data as data
 
+from lib.data.manifest import Manifest
+from lib.data.resize_cache import ResizeCache
+from lib.data.sample_cache import SampleCache
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
@@ -17,18 +20,56 @@ class DefaultDataset(data.Dataset):
 
     def __init__(self, root_dir=None, dataset=None, aug_transform=None, img_transform=None, configer=None):
         self.configer = configer
+        self.sample_cache = SampleCache(**self.configer.get('{}.sample_cache'.format(dataset), default=dict()))
         self.aug_transform = aug_transform
         self.img_transform = img_transform
-        self.img_list, self.label_list = self.__read_json_file(root_dir, dataset)
+        self.scale_hint = None if aug_transform is None else aug_transform.get_scale_hint()
+        self.resize_cache = ResizeCache(self.configer.get('{}.resize_cache'.format(dataset), default=None),
+                                        aug_transform=aug_transform, configer=self.configer)
+        # The config of the reads, in the keys of the sample cache.
+        self.read_key = (self.configer.get('data', 'image_tool'), self.configer.get('data', 'input_mode'),
+                         None if self.scale_hint is None else aug_transform.trans_dict[aug_transform.get_first_resize()],
+                         self.resize_cache.ready and self.resize_cache.cache_dir)
+        self.list_items(root_dir, dataset)
 
     def __getitem__(self, index):
-        img = ImageHelper.read_image(self.img_list[index],
+        return self.get_sample(**self.sample_cache.get(self.get_cache_key(index), lambda: self.read_sample(index)))
+
+    def __len__(self):
+
+        return len(self.img_list)
+
+    def list_items(self, root_dir, dataset):
+        self.img_list, self.label_list = self.__read_json_file(root_dir, dataset)
+        self.stamp_list = self.list_stamps()
+
+    def list_stamps(self):
+        """The stamps of the listed files in the manifests, for the keys of the sample cache."""
+        if not self.sample_cache.enabled:
+            return None
+
+        return Manifest.get_stamps(self.img_list, cache_dir=self.configer.get('data.manifest_dir', default=None))
+
+    def get_cache_key(self, index):
+        """The key of the sample in the sample cache, only from the listing."""
+        return None if not self.sample_cache.enabled else (self.read_key, self.stamp_list[index])
+
+    def read_sample(self, index):
+        """Read the image, from the resize cache if it is cached, then the aug transform skips the cached prefix."""
+        path_list, resized = self.resize_cache.get_paths(self.img_list[index])
+        img = ImageHelper.read_image(path_list[0],
                                      tool=self.configer.get('data', 'image_tool'),
-                                     mode=self.configer.get('data', 'input_mode'))
-        label = self.label_list[index]
+                                     mode=self.configer.get('data', 'input_mode'),
+                                     scale=None if resized else self.scale_hint)
+        return dict(img=img, label=self.read_label(index), resized=resized)
+
+    def read_label(self, index):
+        return self.label_list[index]
 
+    def get_sample(self, img, label, resized=False):
+        """The processing of a read sample, shared by the datasets of the other sources, e.g. ShardDataset."""
         if self.aug_transform is not None:
-            img = self.aug_transform(img)
+            img = self.aug_transform(img, skip_prefix=resized)
 
         if self.img_transform is not None:
             img = self.img_transform(img)
@@ -38,19 +79,17 @@ class DefaultDataset(data.Dataset):
             label=DataContainer(label, stack=True),
         )
 
-    def __len__(self):
-
-        return len(self.img_list)
-
     def __read_json_file(self, root_dir, dataset):
         img_list = list()
         label_list = list()
+        image_manifest = Manifest.get(os.path.join(root_dir, 'dataset'), recursive=True,
+                                      cache_dir=self.configer.get('data.manifest_dir', default=None))
 
         with open(os.path.join(root_dir, '{}.json'.format(dataset)), 'r') as file_stream:
             items = json.load(file_stream)
             for item in items:
                 img_path = os.path.join(root_dir, 'dataset', item['image_path'])
-                if not os.path.exists(img_path):
+                if not image_manifest.exists(item['image_path']):
                     Log.warn('Image Path: {} not exists.'.format(img_path))
                     continue
 
@@ -62,7 +101,7 @@ class DefaultDataset(data.Dataset):
                 items = json.load(file_stream)
                 for item in items:
                     img_path = os.path.join(root_dir, 'dataset', item['image_path'])
-                    if not os.path.exists(img_path):
+                    if not image_manifest.exists(item['image_path']):
                         Log.warn('Image Path: {} not exists.'.format(img_path))
                         continue
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Image Classification dataset reading the packed shard files.
+
+
+import os
+
+from data.cls.datasets.default_dataset import DefaultDataset
+from lib.data.shard import ShardReader
+from lib.tools.helper.image_helper import ImageHelper
+
+
+class ShardDataset(DefaultDataset):
+    """The DefaultDataset of the samples in the shards, only the reads differ.
+
+    The images are decoded at the reduced resolution of the scale hint, and the samples are cached by the
+    sample cache with the keys of their image blobs. The resize cache, keyed by the image paths, does not
+    apply to the shards.
+    """
+    def __init__(self, root_dir=None, dataset=None, aug_transform=None, img_transform=None, configer=None):
+        super(ShardDataset, self).__init__(root_dir=root_dir, dataset=dataset, aug_transform=aug_transform,
+                                           img_transform=img_transform, configer=configer)
+        self.resize_cache = None
+
+    def __len__(self):
+        return len(self.item_list)
+
+    def list_items(self, root_dir, dataset):
+        self.reader_list, self.item_list = self.__list_shards(root_dir, dataset)
+
+    def get_cache_key(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        return self.read_key, reader.get_blob_key(self.item_list[index][1], 'image')
+
+    def read_sample(self, index):
+        return dict(img=self.read_image(index), label=self.read_label(index))
+
+    def read_image(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        return ImageHelper.read_image_from_bytes(reader.get_blob(self.item_list[index][1], 'image'),
+                                                 tool=self.configer.get('data', 'image_tool'),
+                                                 mode=self.configer.get('data', 'input_mode'), scale=self.scale_hint)
+
+    def read_label(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        return reader.get_meta(self.item_list[index][1])['label']
+
+    def __list_shards(self, root_dir, dataset):
+        reader_list = [ShardReader(os.path.join(root_dir, dataset))]
+        if dataset == 'train' and self.configer.get('data', 'include_val'):
+            reader_list.append(ShardReader(os.path.join(root_dir, 'val')))
+
+        item_list = list()
+        for reader_id, reader in enumerate(reader_list):
+            item_list += [(reader_id, record_id) for record_id in range(len(reader))
+                          if reader.has_blob(record_id, 'image')]
+
+        return reader_list, item_list
+
+
+if __name__ == "__main__":
+    # Test data loader.
+    pass
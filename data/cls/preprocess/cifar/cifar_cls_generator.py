@@ -4,6 +4,7 @@
 
 
 from PIL import Image
+import io
 import os
 import json
 import os.path
@@ -16,11 +17,13 @@ if sys.version_info[0] == 2:
 else:
     import pickle
 
+from lib.data.generator import ParallelGenerator
+
 
 IMAGE_DIR = 'image'
 
 
-class Cifar10ClsGenerator(object):
+class Cifar10ClsGenerator(ParallelGenerator):
     """`CIFAR10 <https://www.cs.toronto.edu/~kriz/cifar.html>`_ Dataset.
     Args:
         root (string): Root directory of dataset where directory
@@ -53,6 +56,7 @@ class Cifar10ClsGenerator(object):
     }
 
     def __init__(self, args, image_dir=IMAGE_DIR):
+        super(Cifar10ClsGenerator, self).__init__(args.save_dir, nproc=args.nproc)
         self.args = args
         if not self._check_integrity():
             raise RuntimeError('Dataset not found or corrupted.' +
@@ -98,19 +102,7 @@ class Cifar10ClsGenerator(object):
 
         self._load_meta()
 
-        self.train_json_file = os.path.join(self.args.save_dir, 'train/label.json')
-        self.val_json_file = os.path.join(self.args.save_dir, 'val/label.json')
-
-        if not os.path.exists(self.args.save_dir):
-            os.makedirs(self.args.save_dir)
-
-        self.train_image_dir = os.path.join(self.args.save_dir, 'train', image_dir)
-        self.val_image_dir = os.path.join(self.args.save_dir, 'val', image_dir)
-        if not os.path.exists(self.train_image_dir):
-            os.makedirs(self.train_image_dir)
-
-        if not os.path.exists(self.val_image_dir):
-            os.makedirs(self.val_image_dir)
+        self.image_dir = image_dir
 
     def _load_meta(self):
         path = os.path.join(self.args.root_dir, self.meta['filename'])
@@ -141,53 +133,35 @@ class Cifar10ClsGenerator(object):
             return False
         return True
 
-    def generate_label(self):
-        """
-        Args:
-            index (int): Index
-        Returns:
-            tuple: (image, target) where target is index of the target class.
-        """
+    def get_splits(self):
+        return ['train', 'val']
 
-        train_json_list = list()
-        val_json_list = list()
+    def get_items(self, split):
+        num_images = len(self.train_targets) if split == 'train' else len(self.test_targets)
+        return [(str(index).zfill(len(str(num_images))), index) for index in range(num_images)]
 
-        for index in range(len(self.train_targets)):
+    def process_item(self, split, name, index):
+        if split == 'train':
             img, target = self.train_data[index], self.train_targets[index]
-
-            # doing this so that it is consistent with all other datasets
-            # to return a PIL Image
-            img = Image.fromarray(img)
-
-            filename = str(index).zfill(len(str(len(self.train_targets))))
-            filename = '{}.jpg'.format(filename)
-            img.save(os.path.join(self.train_image_dir, filename))
-            img_dict = dict()
-            img_dict['image_path'] = '{}/{}'.format(IMAGE_DIR, filename)
-            img_dict['label'] = target
-            train_json_list.append(img_dict)
-
-        for index in range(len(self.test_targets)):
+        else:
             img, target = self.test_data[index], self.test_targets[index]
 
-            # doing this so that it is consistent with all other datasets
-            # to return a PIL Image
-            img = Image.fromarray(img)
-
-            filename = str(index).zfill(len(str(len(self.test_targets))))
-            filename = '{}.jpg'.format(filename)
-            img.save(os.path.join(self.val_image_dir, filename))
-            img_dict = dict()
-            img_dict['image_path'] = '{}/{}'.format(IMAGE_DIR, filename)
-            img_dict['label'] = target
-            val_json_list.append(img_dict)
-
-        fw = open(self.train_json_file, 'w')
-        fw.write(json.dumps(train_json_list))
-        fw.close()
-
-        fw = open(self.val_json_file, 'w')
-        fw.write(json.dumps(val_json_list))
+        # doing this so that it is consistent with all other datasets
+        # to return a PIL Image
+        img = Image.fromarray(img)
+        img_stream = io.BytesIO()
+        img.save(img_stream, format='JPEG')
+
+        filename = '{}.jpg'.format(name)
+        img_dict = dict()
+        img_dict['image_path'] = '{}/{}'.format(IMAGE_DIR, filename)
+        img_dict['label'] = target
+        return dict(files=dict(image=(os.path.join(self.image_dir, filename), img_stream.getvalue())), meta=img_dict)
+
+    def finish_split(self, split, record_list):
+        json_list = [record['meta'] for record in sorted(record_list, key=lambda record: record['name'])]
+        fw = open(os.path.join(self.args.save_dir, split, 'label.json'), 'w')
+        fw.write(json.dumps(json_list))
         fw.close()
 
     def _check_integrity(self):
@@ -226,13 +200,15 @@ if __name__ == "__main__":
                         dest='root_dir', help='The directory of the image data.')
     parser.add_argument('--dataset', default="cifar10", type=str,
                         dest='dataset', help='The dataset name.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
     args = parser.parse_args()
 
     if args.dataset == 'cifar10':
         cifar10_cls_generator = Cifar10ClsGenerator(args)
-        cifar10_cls_generator.generate_label()
+        cifar10_cls_generator.generate()
 
     else:
         assert args.dataset == 'cifar100'
         cifar100_cls_generator = Cifar100ClsGenerator(args)
-        cifar100_cls_generator.generate_label()
+        cifar100_cls_generator.generate()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Pack the Cls data (label json & images) into shard files.
+
+
+import os
+import json
+import argparse
+
+from lib.data.generator import ParallelGenerator
+from lib.tools.util.logger import Logger as Log
+
+
+class PackedClsGenerator(ParallelGenerator):
+
+    def __init__(self, args):
+        super(PackedClsGenerator, self).__init__(args.save_dir, nproc=args.nproc,
+                                                 packed=True, shard_size=args.shard_size)
+        self.args = args
+
+    def get_splits(self):
+        return self.args.datasets
+
+    def get_items(self, split):
+        with open(os.path.join(self.args.root_dir, '{}.json'.format(split)), 'r') as file_stream:
+            items = json.load(file_stream)
+
+        return [(item['image_path'], item) for item in items]
+
+    def process_item(self, split, name, item):
+        img_path = os.path.join(self.args.root_dir, 'dataset', item['image_path'])
+        if not os.path.exists(img_path):
+            Log.warn('Image Path: {} not exists.'.format(img_path))
+            return None
+
+        with open(img_path, 'rb') as img_stream:
+            return dict(files=dict(image=(item['image_path'], img_stream.read())), meta=dict(label=item['label']))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root_dir', default=None, type=str,
+                        dest='root_dir', help='The directory of the generated cls data.')
+    parser.add_argument('--save_dir', default=None, type=str,
+                        dest='save_dir', help='The directory to save the packed data.')
+    parser.add_argument('--datasets', default=['train', 'val'], nargs='+', type=str,
+                        dest='datasets', help='The label json files to pack.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--shard_size', default=1024, type=int,
+                        dest='shard_size', help='The max size(MB) of one shard file.')
+
+    args = parser.parse_args()
+
+    packed_cls_generator = PackedClsGenerator(args)
+    packed_cls_generator.generate()
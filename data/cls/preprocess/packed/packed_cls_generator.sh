@@ -0,0 +1,15 @@
+#!/usr/bin/env bash
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Pack train & val data into shard files.
+
+
+WORK_DIR=$(cd $(dirname $0)/../../../../;pwd)
+export PYTHONPATH=${WORK_DIR}:${PYTHONPATH}
+
+ROOT_DIR='/home/donny/DataSet/ImageNet'
+SAVE_DIR='/home/donny/DataSet/ImageNet_packed'
+
+
+python $(dirname $0)/packed_cls_generator.py --root_dir $ROOT_DIR \
+                                             --save_dir $SAVE_DIR
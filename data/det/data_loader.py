@@ -3,15 +3,19 @@
 # Author: Donny You(youansheng@gmail.com)
 
 
-import torch
 from torch.utils import data
 
 import lib.data.pil_aug_transforms as pil_aug_trans
 import lib.data.cv2_aug_transforms as cv2_aug_trans
 import lib.data.transforms as trans
+from lib.data.batch_aug_transforms import BatchAugCompose
 from lib.data.collate import collate
+from lib.data.prefetch_loader import PrefetchLoader
+from lib.data.sampler import GroupedBatchSampler, ResumableSampler, get_group_ids
+from lib.runner.grad_accumulator import GradAccumulator
 from lib.tools.util.logger import Logger as Log
 from data.det.datasets.default_dataset import DefaultDataset
+from data.det.datasets.shard_dataset import ShardDataset
 
 
 class DataLoader(object):
@@ -27,6 +31,8 @@ class DataLoader(object):
             Log.error('Not support {} image tool.'.format(self.configer.get('data', 'image_tool')))
             exit(1)
 
+        self.batch_aug_train_transform = BatchAugCompose(self.configer, split='train')
+
         if self.configer.get('data', 'image_tool') == 'pil':
             self.aug_val_transform = pil_aug_trans.PILAugCompose(self.configer, split='val')
         elif self.configer.get('data', 'image_tool') == 'cv2':
@@ -45,25 +51,39 @@ class DataLoader(object):
                                      aug_transform=self.aug_train_transform,
                                      img_transform=self.img_transform, configer=self.configer)
 
+        elif self.configer.get('dataset', default=None) == 'packed':
+            dataset = ShardDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='train',
+                                   aug_transform=self.aug_train_transform,
+                                   img_transform=self.img_transform, configer=self.configer)
+
         else:
             Log.error('{} dataset is invalid.'.format(self.configer.get('dataset')))
             exit(1)
 
-        sampler = None
-        if self.configer.get('network.distributed'):
-            sampler = torch.utils.data.distributed.DistributedSampler(dataset)
+        sampler = ResumableSampler(dataset, seed=self.configer.get('seed', default=None),
+                                   distributed=self.configer.get('network.distributed', default=False))
+
+        if self.configer.get('train.group_batch', default=None) is not None:
+            batch_sampler = GroupedBatchSampler(
+                sampler,
+                group_ids=get_group_ids(dataset.get_img_sizes(), **self.configer.get('train.group_batch')),
+                batch_size=GradAccumulator.get_micro_batch_size(self.configer),
+                drop_last=self.configer.get('data', 'drop_last')
+            )
+            sampler_args = dict(batch_sampler=batch_sampler)
+        else:
+            sampler_args = dict(sampler=sampler, batch_size=GradAccumulator.get_micro_batch_size(self.configer),
+                                drop_last=self.configer.get('data', 'drop_last'))
 
         trainloader = data.DataLoader(
-            dataset, sampler=sampler,
-            batch_size=self.configer.get('train', 'batch_size'), shuffle=(sampler is None),
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
-            drop_last=self.configer.get('data', 'drop_last'),
+            dataset, pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('train', 'data_transformer')
-            )
+            ),
+            **sampler_args, **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return trainloader
+        return PrefetchLoader.wrap(trainloader, self.configer, batch_transform=self.batch_aug_train_transform)
 
     def get_valloader(self):
         if self.configer.get('dataset', default=None) in [None, 'default']:
@@ -72,6 +92,12 @@ class DataLoader(object):
                                      img_transform=self.img_transform,
                                      configer=self.configer)
 
+        elif self.configer.get('dataset', default=None) == 'packed':
+            dataset = ShardDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='val',
+                                   aug_transform=self.aug_val_transform,
+                                   img_transform=self.img_transform,
+                                   configer=self.configer)
+
         else:
             Log.error('{} dataset is invalid.'.format(self.configer.get('dataset')))
             exit(1)
@@ -79,11 +105,12 @@ class DataLoader(object):
         valloader = data.DataLoader(
             dataset,
             batch_size=self.configer.get('val', 'batch_size'), shuffle=False,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('val', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return valloader
+        return PrefetchLoader.wrap(valloader, self.configer)
 
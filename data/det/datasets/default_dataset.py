@@ -6,11 +6,12 @@
 
 import os
 import torch
-import numpy as np
 import torch.utils.data as data
 
+from lib.data.anno_store import AnnoStore
+from lib.data.manifest import Manifest
+from lib.data.sample_cache import SampleCache
 from lib.parallel.data_container import DataContainer
-from lib.tools.helper.json_helper import JsonHelper
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
 
@@ -23,16 +24,51 @@ class DefaultDataset(data.Dataset):
                  aug_transform=None, img_transform=None, configer=None):
         super(DefaultDataset, self).__init__()
         self.configer = configer
+        self.sample_cache = SampleCache(**self.configer.get('{}.sample_cache'.format(dataset), default=dict()))
         self.aug_transform = aug_transform
         self.img_transform = img_transform
-        self.img_list, self.json_list = self.__list_dirs(root_dir, dataset)
+        # The config of the reads, in the keys of the sample cache.
+        self.read_key = (self.configer.get('data', 'image_tool'), self.configer.get('data', 'input_mode'),
+                         self.configer.get('data', 'keep_difficult'))
+        self.list_items(root_dir, dataset)
 
     def __getitem__(self, index):
+        return self.get_sample(**self.sample_cache.get(self.get_cache_key(index), lambda: self.read_sample(index)))
+
+    def list_items(self, root_dir, dataset):
+        self.img_list, self.anno_list = self.__list_dirs(root_dir, dataset)
+        self.stamp_list = self.list_stamps()
+
+    def list_stamps(self):
+        """The stamps of the listed files & annos, for the keys of the sample cache."""
+        if not self.sample_cache.enabled:
+            return None
+
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
+        return list(zip(Manifest.get_stamps(self.img_list, cache_dir=manifest_dir),
+                        AnnoStore.get_stamps(self.anno_list, cache_dir=manifest_dir)))
+
+    def get_cache_key(self, index):
+        """The key of the sample in the sample cache, only from the listing."""
+        return None if not self.sample_cache.enabled else (self.read_key, self.stamp_list[index])
+
+    def read_sample(self, index):
+        img, img_size = self.read_image(index)
+        bboxes, labels = self.read_objects(index)
+        return dict(img=img, img_size=img_size, bboxes=bboxes, labels=labels)
+
+    def read_image(self, index):
+        """Return the image and its [width, height]."""
         img = ImageHelper.read_image(self.img_list[index],
                                      tool=self.configer.get('data', 'image_tool'),
                                      mode=self.configer.get('data', 'input_mode'))
-        img_size = ImageHelper.get_size(img)
-        bboxes, labels = self.__read_json_file(self.json_list[index])
+        return img, ImageHelper.get_size(img)
+
+    def read_objects(self, index):
+        return self.__read_anno(self.anno_list[index])
+
+    def get_sample(self, img, img_size, bboxes, labels):
+        """The processing of a read sample, shared by the datasets of the other sources, e.g. ShardDataset."""
         ori_bboxes, ori_labels = bboxes.copy(), labels.copy()
 
         if self.aug_transform is not None:
@@ -61,55 +97,33 @@ class DefaultDataset(data.Dataset):
 
         return len(self.img_list)
 
-    def __read_json_file(self, json_file):
-        """
-            filename: JSON file
-
-            return: three list: key_points list, centers list and scales list.
-        """
-        json_dict = JsonHelper.load_file(json_file)
-
-        labels = list()
-        bboxes = list()
-
-        for object in json_dict['objects']:
-            if 'difficult' in object and object['difficult'] and not self.configer.get('data', 'keep_difficult'):
-                continue
+    def get_img_sizes(self):
+        return ImageHelper.read_sizes(self.img_list, cache_dir=self.configer.get('data.manifest_dir', default=None))
 
-            labels.append(object['label'])
-            bboxes.append(object['bbox'])
+    def __read_anno(self, anno):
+        objects = AnnoStore.read_objects(anno)
+        if self.configer.get('data', 'keep_difficult'):
+            return objects['bboxes'], objects['labels']
 
-        return np.array(bboxes).astype(np.float32), np.array(labels)
+        keep = ~objects['difficult']
+        return objects['bboxes'][keep], objects['labels'][keep]
 
     def __list_dirs(self, root_dir, dataset):
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
+        use_store = self.configer.get('data.anno_store', default=False)
         img_list = list()
-        json_list = list()
-        image_dir = os.path.join(root_dir, dataset, 'image')
-        json_dir = os.path.join(root_dir, dataset, 'json')
-
-        for file_name in os.listdir(json_dir):
-            image_name = '.'.join(file_name.split('.')[:-1])
-            img_path = ImageHelper.imgpath(image_dir, image_name)
-            json_path = os.path.join(json_dir, file_name)
-            if not os.path.exists(json_path) or img_path is None:
-                Log.warn('Json Path: {} not exists.'.format(json_path))
-                continue
-
-            json_list.append(json_path)
-            img_list.append(img_path)
-
-        if dataset == 'train' and self.configer.get('data', 'include_val'):
-            image_dir = os.path.join(root_dir, 'val/image')
-            json_dir = os.path.join(root_dir, 'val/json')
-            for file_name in os.listdir(json_dir):
-                image_name = '.'.join(file_name.split('.')[:-1])
-                img_path = ImageHelper.imgpath(image_dir, image_name)
-                json_path = os.path.join(json_dir, file_name)
-                if not os.path.exists(json_path) or img_path is None:
-                    Log.warn('Json Path: {} not exists.'.format(json_path))
+        anno_list = list()
+        split_list = [dataset, 'val'] if dataset == 'train' and self.configer.get('data', 'include_val') else [dataset]
+        for split in split_list:
+            image_manifest = Manifest.get(os.path.join(root_dir, split, 'image'), cache_dir=manifest_dir)
+            for image_name, anno in AnnoStore.list_annos(os.path.join(root_dir, split),
+                                                         use_store=use_store, cache_dir=manifest_dir):
+                img_path = image_manifest.imgpath(image_name)
+                if img_path is None:
+                    Log.warn('Image of {} not exists.'.format(image_name))
                     continue
 
-                json_list.append(json_path)
+                anno_list.append(anno)
                 img_list.append(img_path)
 
-        return img_list, json_list
+        return img_list, anno_list
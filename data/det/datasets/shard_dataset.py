@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Object Detection dataset reading the packed shard files.
+
+
+import os
+import numpy as np
+
+from data.det.datasets.default_dataset import DefaultDataset
+from lib.data.shard import ShardReader
+from lib.tools.helper.image_helper import ImageHelper
+
+
+class ShardDataset(DefaultDataset):
+    """The DefaultDataset of the samples in the shards, only the reads differ.
+
+    The samples are cached by the sample cache with the keys of their image blobs.
+    """
+    def __len__(self):
+
+        return len(self.item_list)
+
+    def list_items(self, root_dir, dataset):
+        self.reader_list, self.item_list = self.__list_shards(root_dir, dataset)
+
+    def get_cache_key(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        return self.read_key, reader.get_blob_key(self.item_list[index][1], 'image')
+
+    def read_image(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        img = ImageHelper.read_image_from_bytes(reader.get_blob(self.item_list[index][1], 'image'),
+                                                tool=self.configer.get('data', 'image_tool'),
+                                                mode=self.configer.get('data', 'input_mode'))
+        return img, ImageHelper.get_size(img)
+
+    def read_objects(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        return self.__read_objects(reader.get_meta(self.item_list[index][1]))
+
+    def get_img_sizes(self):
+        """Return the [width, height] of every image, from the meta or the image header in the shard."""
+        size_list = list()
+        for reader_id, record_id in self.item_list:
+            meta = self.reader_list[reader_id].get_meta(record_id)
+            if 'width' in meta and 'height' in meta:
+                size_list.append([meta['width'], meta['height']])
+                continue
+
+            size_list.append(ImageHelper.read_size_from_bytes(self.reader_list[reader_id].get_blob(record_id, 'image')))
+
+        return size_list
+
+    def __read_objects(self, json_dict):
+        labels = list()
+        bboxes = list()
+
+        for object in json_dict['objects']:
+            if 'difficult' in object and object['difficult'] and not self.configer.get('data', 'keep_difficult'):
+                continue
+
+            labels.append(object['label'])
+            bboxes.append(object['bbox'])
+
+        return np.array(bboxes).astype(np.float32), np.array(labels)
+
+    def __list_shards(self, root_dir, dataset):
+        reader_list = [ShardReader(os.path.join(root_dir, dataset))]
+        if dataset == 'train' and self.configer.get('data', 'include_val'):
+            reader_list.append(ShardReader(os.path.join(root_dir, 'val')))
+
+        item_list = list()
+        for reader_id, reader in enumerate(reader_list):
+            item_list += [(reader_id, record_id) for record_id in range(len(reader))
+                          if reader.has_blob(record_id, 'image')]
+
+        return reader_list, item_list
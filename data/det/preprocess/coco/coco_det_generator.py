@@ -4,13 +4,13 @@
 # COCO det data generator.
 
 
-import json
 import os
 import argparse
-import shutil
 
 from pycocotools.coco import COCO
 
+from lib.data.generator import ParallelGenerator
+
 
 JOSN_DIR = 'json'
 IMAGE_DIR = 'image'
@@ -31,53 +31,62 @@ CAT_DICT = {
 }
 
 
-class CocoDetGenerator(object):
+def str2bool(v):
+    """ Usage:
+    parser.add_argument('--pretrained', type=str2bool, nargs='?', const=True,
+                        dest='pretrained', help='Whether to use pretrained models.')
+    """
+    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Unsupported value encountered.')
 
-    def __init__(self, args, json_dir=JOSN_DIR, image_dir=IMAGE_DIR):
-        self.args = args
-        self.json_dir = os.path.join(self.args.save_dir, json_dir)
-        if not os.path.exists(self.json_dir):
-            os.makedirs(self.json_dir)
 
-        self.image_dir = os.path.join(self.args.save_dir, image_dir)
-        if not os.path.exists(self.image_dir):
-            os.makedirs(self.image_dir)
+class CocoDetGenerator(ParallelGenerator):
 
+    def __init__(self, args, json_dir=JOSN_DIR, image_dir=IMAGE_DIR):
+        super(CocoDetGenerator, self).__init__(args.save_dir, nproc=args.nproc,
+                                               packed=args.packed, shard_size=args.shard_size,
+                                               anno_store=args.anno_store)
+        self.args = args
+        self.json_dir = json_dir
+        self.image_dir = image_dir
         self.coco = COCO(self.args.anno_file)
         self.cat_ids = self.coco.getCatIds(catNms=CAT_DICT.keys())
         print(len(self.cat_ids))
         self.img_ids = list(self.coco.imgs.keys())
 
-    def generate_label(self):
-        for i, img_id in enumerate(self.img_ids):
-            json_dict = dict()
-            file_name = self.coco.imgs[img_id]['file_name']
-            json_dict['width'] = self.coco.imgs[img_id]['width']
-            json_dict['height'] = self.coco.imgs[img_id]['height']
-
-            ann_ids = self.coco.getAnnIds(imgIds=img_id, catIds=self.cat_ids, iscrowd=False)
-            annos = self.coco.loadAnns(ann_ids)
-            object_list = list()
-            for anno in annos:
-                object_dict = dict()
-                object_dict['label'] = self.cat_ids.index(anno['category_id'])
-                bbox = anno['bbox']
-                object_dict['bbox'] = [float(bbox[0]), float(bbox[1]),
-                                       (float(bbox[2]) + float(bbox[0])), (float(bbox[3]) + float(bbox[1]))]
-
-                # Sanitize bboxes -- some are invalid
-                if anno['area'] > 0 and float(bbox[2]) > 0 and float(bbox[3]) > 0:
-                    object_list.append(object_dict)
-
-            json_dict['objects'] = object_list
-            fw = open(os.path.join(self.json_dir, '{}.json'.format(file_name.split('.')[0])), 'w')
-            fw.write(json.dumps(json_dict))
-            fw.close()
-            shutil.copy(os.path.join(self.args.ori_img_dir, file_name),
-                        os.path.join(self.image_dir, file_name))
-
-            if i % 1000 == 0:
-                print("Processed {} of {}".format(i, len(self.img_ids)))
+    def get_items(self, split):
+        return [(self.coco.imgs[img_id]['file_name'].split('.')[0], img_id) for img_id in self.img_ids]
+
+    def process_item(self, split, name, img_id):
+        json_dict = dict()
+        file_name = self.coco.imgs[img_id]['file_name']
+        json_dict['width'] = self.coco.imgs[img_id]['width']
+        json_dict['height'] = self.coco.imgs[img_id]['height']
+
+        ann_ids = self.coco.getAnnIds(imgIds=img_id, catIds=self.cat_ids, iscrowd=False)
+        annos = self.coco.loadAnns(ann_ids)
+        object_list = list()
+        for anno in annos:
+            object_dict = dict()
+            object_dict['label'] = self.cat_ids.index(anno['category_id'])
+            bbox = anno['bbox']
+            object_dict['bbox'] = [float(bbox[0]), float(bbox[1]),
+                                   (float(bbox[2]) + float(bbox[0])), (float(bbox[3]) + float(bbox[1]))]
+
+            # Sanitize bboxes -- some are invalid
+            if anno['area'] > 0 and float(bbox[2]) > 0 and float(bbox[3]) > 0:
+                object_list.append(object_dict)
+
+        json_dict['objects'] = object_list
+        with open(os.path.join(self.args.ori_img_dir, file_name), 'rb') as img_stream:
+            img_content = img_stream.read()
+
+        return dict(files=dict(image=(os.path.join(self.image_dir, file_name), img_content)),
+                    meta=json_dict, meta_path=os.path.join(self.json_dir, '{}.json'.format(name)))
 
 
 if __name__ == "__main__":
@@ -89,8 +98,16 @@ if __name__ == "__main__":
                         dest='ori_img_dir', help='The directory of the image data.')
     parser.add_argument('--anno_file', default=None, type=str,
                         dest='anno_file', help='The annotation file.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--packed', type=str2bool, nargs='?', const=True, default=False,
+                        dest='packed', help='Whether to write the shard files instead of the json & image files.')
+    parser.add_argument('--shard_size', default=1024, type=int,
+                        dest='shard_size', help='The max size(MB) of one shard file.')
+    parser.add_argument('--anno_store', type=str2bool, nargs='?', const=True, default=False,
+                        dest='anno_store', help='Whether to write the binary annotation store.')
 
     args = parser.parse_args()
 
     coco_det_generator = CocoDetGenerator(args)
-    coco_det_generator.generate_label()
+    coco_det_generator.generate()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Pack the Det data (image & json dirs) into shard files.
+
+
+import os
+import json
+import argparse
+
+from lib.data.generator import ParallelGenerator
+from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.util.logger import Logger as Log
+
+
+IMAGE_DIR = 'image'
+JSON_DIR = 'json'
+
+
+class PackedDetGenerator(ParallelGenerator):
+
+    def __init__(self, args, image_dir=IMAGE_DIR, json_dir=JSON_DIR):
+        super(PackedDetGenerator, self).__init__(args.save_dir, nproc=args.nproc,
+                                                 packed=True, shard_size=args.shard_size)
+        self.args = args
+        self.image_dir = image_dir
+        self.json_dir = json_dir
+
+    def get_splits(self):
+        return self.args.datasets
+
+    def get_items(self, split):
+        json_dir = os.path.join(self.args.root_dir, split, self.json_dir)
+        return [('.'.join(file_name.split('.')[:-1]), os.path.join(json_dir, file_name))
+                for file_name in sorted(os.listdir(json_dir))]
+
+    def process_item(self, split, image_name, json_path):
+        img_path = ImageHelper.imgpath(os.path.join(self.args.root_dir, split, self.image_dir), image_name)
+        if img_path is None:
+            Log.warn('Image Path of {} not exists.'.format(json_path))
+            return None
+
+        with open(json_path, 'r') as json_stream:
+            json_dict = json.load(json_stream)
+
+        with open(img_path, 'rb') as img_stream:
+            return dict(files=dict(image=(os.path.basename(img_path), img_stream.read())), meta=json_dict)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root_dir', default=None, type=str,
+                        dest='root_dir', help='The directory of the generated det data.')
+    parser.add_argument('--save_dir', default=None, type=str,
+                        dest='save_dir', help='The directory to save the packed data.')
+    parser.add_argument('--datasets', default=['train', 'val'], nargs='+', type=str,
+                        dest='datasets', help='The subdirs to pack.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--shard_size', default=1024, type=int,
+                        dest='shard_size', help='The max size(MB) of one shard file.')
+
+    args = parser.parse_args()
+
+    packed_det_generator = PackedDetGenerator(args)
+    packed_det_generator.generate()
@@ -4,12 +4,12 @@
 # VOC det data generator.
 
 
-import json
 import os
 import argparse
-import shutil
 from bs4 import BeautifulSoup
 
+from lib.data.generator import ParallelGenerator
+
 
 JOSN_DIR = 'json'
 IMAGE_DIR = 'image'
@@ -21,25 +21,28 @@ CAT_DICT = {
 }
 
 
-class VocDetGenerator(object):
-
-    def __init__(self, args, json_dir=JOSN_DIR, image_dir=IMAGE_DIR):
-        self.args = args
-        self.train_json_dir = os.path.join(self.args.save_dir, 'train', json_dir)
-        self.val_json_dir = os.path.join(self.args.save_dir, 'val', json_dir)
-        if not os.path.exists(self.train_json_dir):
-            os.makedirs(self.train_json_dir)
+def str2bool(v):
+    """ Usage:
+    parser.add_argument('--pretrained', type=str2bool, nargs='?', const=True,
+                        dest='pretrained', help='Whether to use pretrained models.')
+    """
+    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Unsupported value encountered.')
 
-        if not os.path.exists(self.val_json_dir):
-            os.makedirs(self.val_json_dir)
 
-        self.train_image_dir = os.path.join(self.args.save_dir, 'train', image_dir)
-        self.val_image_dir = os.path.join(self.args.save_dir, 'val', image_dir)
-        if not os.path.exists(self.train_image_dir):
-            os.makedirs(self.train_image_dir)
+class VocDetGenerator(ParallelGenerator):
 
-        if not os.path.exists(self.val_image_dir):
-            os.makedirs(self.val_image_dir)
+    def __init__(self, args, json_dir=JOSN_DIR, image_dir=IMAGE_DIR):
+        super(VocDetGenerator, self).__init__(args.save_dir, nproc=args.nproc,
+                                              packed=args.packed, shard_size=args.shard_size,
+                                              anno_store=args.anno_store)
+        self.args = args
+        self.json_dir = json_dir
+        self.image_dir = image_dir
 
     def _get_info_tree(self, label_file, dataset='VOC2007'):
         label_file_path = os.path.join(self.args.root_dir, dataset, 'Annotations', label_file)
@@ -69,58 +72,38 @@ class VocDetGenerator(object):
         tree_dict['objects'] = object_list
         return tree_dict
 
-    def generate_label(self):
-        file_count = 0
+    def get_splits(self):
+        return ['train', 'val']
+
+    def _read_names(self, list_file):
+        with open(os.path.join(self.args.root_dir, list_file), 'r') as list_stream:
+            return [img_name.rstrip() for img_name in list_stream.readlines()]
+
+    def get_items(self, split):
+        item_list = list()
+        if split == 'val':
+            return [(img_name, 'VOC2007') for img_name in self._read_names('VOC2007/ImageSets/Main/test.txt')]
+
         if self.args.dataset in ['VOC07', 'VOC07+12', 'VOC07++12']:
-            with open(os.path.join(self.args.root_dir, 'VOC2007/ImageSets/Main/trainval.txt'), 'r') as train_stream:
-                for img_name in train_stream.readlines():
-                    img_name = img_name.rstrip()
-                    label_file = '{}.xml'.format(img_name)
-                    file_count += 1
-                    tree_dict = self._get_info_tree(label_file, dataset='VOC2007')
-                    fw = open(os.path.join(self.train_json_dir, '{}.json'.format(img_name)), 'w')
-                    fw.write(json.dumps(tree_dict))
-                    fw.close()
-                    shutil.copy(os.path.join(self.args.root_dir, 'VOC2007/JPEGImages', '{}.jpg'.format(img_name)),
-                                os.path.join(self.train_image_dir, '{}.jpg'.format(img_name)))
+            item_list += [(img_name, 'VOC2007') for img_name in self._read_names('VOC2007/ImageSets/Main/trainval.txt')]
 
         if self.args.dataset in ['VOC07+12', 'VOC07++12', 'VOC12']:
-            with open(os.path.join(self.args.root_dir, 'VOC2012/ImageSets/Main/trainval.txt'), 'r') as train_stream:
-                for img_name in train_stream.readlines():
-                    img_name = img_name.rstrip()
-                    label_file = '{}.xml'.format(img_name)
-                    file_count += 1
-                    tree_dict = self._get_info_tree(label_file, dataset='VOC2012')
-                    fw = open(os.path.join(self.train_json_dir, '{}.json'.format(img_name)), 'w')
-                    fw.write(json.dumps(tree_dict))
-                    fw.close()
-                    shutil.copy(os.path.join(self.args.root_dir, 'VOC2012/JPEGImages', '{}.jpg'.format(img_name)),
-                                os.path.join(self.train_image_dir, '{}.jpg'.format(img_name)))
+            item_list += [(img_name, 'VOC2012') for img_name in self._read_names('VOC2012/ImageSets/Main/trainval.txt')]
 
         if self.args.dataset in ['VOC07++12']:
-            with open(os.path.join(self.args.root_dir, 'VOC2007/ImageSets/Main/test.txt'), 'r') as train_stream:
-                for img_name in train_stream.readlines():
-                    img_name = img_name.rstrip()
-                    label_file = '{}.xml'.format(img_name)
-                    file_count += 1
-                    tree_dict = self._get_info_tree(label_file)
-                    fw = open(os.path.join(self.train_json_dir, '{}.json'.format(img_name)), 'w')
-                    fw.write(json.dumps(tree_dict))
-                    fw.close()
-                    shutil.copy(os.path.join(self.args.root_dir, 'VOC2007/JPEGImages', '{}.jpg'.format(img_name)),
-                                os.path.join(self.train_image_dir, '{}.jpg'.format(img_name)))
-
-        with open(os.path.join(self.args.root_dir, 'VOC2007/ImageSets/Main/test.txt'), 'r') as train_stream:
-            for img_name in train_stream.readlines():
-                img_name = img_name.rstrip()
-                label_file = '{}.xml'.format(img_name)
-                file_count += 1
-                tree_dict = self._get_info_tree(label_file)
-                fw = open(os.path.join(self.val_json_dir, '{}.json'.format(img_name)), 'w')
-                fw.write(json.dumps(tree_dict))
-                fw.close()
-                shutil.copy(os.path.join(self.args.root_dir, 'VOC2007/JPEGImages', '{}.jpg'.format(img_name)),
-                            os.path.join(self.val_image_dir, '{}.jpg'.format(img_name)))
+            item_list += [(img_name, 'VOC2007') for img_name in self._read_names('VOC2007/ImageSets/Main/test.txt')]
+
+        return item_list
+
+    def process_item(self, split, img_name, dataset):
+        tree_dict = self._get_info_tree('{}.xml'.format(img_name), dataset=dataset)
+        img_path = os.path.join(self.args.root_dir, dataset, 'JPEGImages', '{}.jpg'.format(img_name))
+        with open(img_path, 'rb') as img_stream:
+            img_content = img_stream.read()
+
+        return dict(files=dict(image=(os.path.join(self.image_dir, '{}.jpg'.format(img_name)), img_content)),
+                    meta=tree_dict, meta_path=os.path.join(self.json_dir, '{}.json'.format(img_name)))
+
 
 if __name__ == "__main__":
 
@@ -131,8 +114,16 @@ if __name__ == "__main__":
                         dest='root_dir', help='The directory of the voc root.')
     parser.add_argument('--dataset', default=None, type=str,
                         dest='dataset', help='The target dataset that will be generated.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--packed', type=str2bool, nargs='?', const=True, default=False,
+                        dest='packed', help='Whether to write the shard files instead of the json & image files.')
+    parser.add_argument('--shard_size', default=1024, type=int,
+                        dest='shard_size', help='The max size(MB) of one shard file.')
+    parser.add_argument('--anno_store', type=str2bool, nargs='?', const=True, default=False,
+                        dest='anno_store', help='Whether to write the binary annotation store.')
 
     args = parser.parse_args()
 
     voc_det_generator = VocDetGenerator(args)
-    voc_det_generator.generate_label()
+    voc_det_generator.generate()
@@ -12,6 +12,9 @@ import lib.data.pil_aug_transforms as pil_aug_trans
 import lib.data.cv2_aug_transforms as cv2_aug_trans
 import lib.data.transforms as trans
 from lib.data.collate import collate
+from lib.data.prefetch_loader import PrefetchLoader
+from lib.data.sampler import ResumableSampler
+from lib.runner.grad_accumulator import GradAccumulator
 from lib.tools.util.logger import Logger as Log
 
 
@@ -68,17 +71,20 @@ class DataLoader(object):
             Log.error('{} train loader is invalid.'.format(self.configer.get('train', 'loader')))
             exit(1)
 
+        sampler = ResumableSampler(dataset, seed=self.configer.get('seed', default=None),
+                                   distributed=self.configer.get('network.distributed', default=False))
         trainloader = data.DataLoader(
-            dataset,
-            batch_size=self.configer.get('train', 'batch_size'), shuffle=True,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            dataset, sampler=sampler,
+            batch_size=GradAccumulator.get_micro_batch_size(self.configer),
+            pin_memory=True,
             drop_last=self.configer.get('data', 'drop_last'),
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('train', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return trainloader
+        return PrefetchLoader.wrap(trainloader, self.configer)
 
 
 
@@ -110,13 +116,14 @@ class DataLoader(object):
         valloader = data.DataLoader(
             dataset,
             batch_size=self.configer.get('val', 'batch_size'), shuffle=False,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('val', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return valloader
+        return PrefetchLoader.wrap(valloader, self.configer)
 
 
 if __name__ == "__main__":
@@ -8,6 +8,7 @@ import os
 import random
 import torch.utils.data as data
 
+from lib.data.manifest import Manifest
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
 
@@ -50,16 +51,17 @@ class DefaultCycleGANDataset(data.Dataset):
         return len(self.imgA_list)
 
     def __list_dirs(self, root_dir, dataset):
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
         imgA_list = list()
         imgB_list = list()
         imageA_dir = os.path.join(root_dir, dataset, 'imageA')
         imageB_dir = os.path.join(root_dir, dataset, 'imageB')
 
-        for file_name in os.listdir(imageA_dir):
+        for file_name in Manifest.get(imageA_dir, cache_dir=manifest_dir).list_files():
             imgA_path = os.path.join(imageA_dir, file_name)
             imgA_list.append(imgA_path)
 
-        for file_name in os.listdir(imageB_dir):
+        for file_name in Manifest.get(imageB_dir, cache_dir=manifest_dir).list_files():
             imgB_path = os.path.join(imageB_dir, file_name)
             imgB_list.append(imgB_path)
 
@@ -67,11 +69,11 @@ class DefaultCycleGANDataset(data.Dataset):
             imageA_dir = os.path.join(root_dir, 'val/imageA')
             imageB_dir = os.path.join(root_dir, 'val/imageB')
 
-            for file_name in os.listdir(imageA_dir):
+            for file_name in Manifest.get(imageA_dir, cache_dir=manifest_dir).list_files():
                 imgA_path = os.path.join(imageA_dir, file_name)
                 imgA_list.append(imgA_path)
 
-            for file_name in os.listdir(imageB_dir):
+            for file_name in Manifest.get(imageB_dir, cache_dir=manifest_dir).list_files():
                 imgB_path = os.path.join(imageB_dir, file_name)
                 imgB_list.append(imgB_path)
 
@@ -9,6 +9,7 @@ import json
 import random
 import torch.utils.data as data
 
+from lib.data.manifest import Manifest
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
@@ -58,12 +59,14 @@ class DefaultFaceGANDataset(data.Dataset):
         imgB_list = list()
         labelA_list = list()
         labelB_list = list()
+        image_manifest = Manifest.get(root_dir, recursive=True,
+                                      cache_dir=self.configer.get('data.manifest_dir', default=None))
 
         with open(os.path.join(root_dir, 'protocols/{}_label{}A.json'.format(dataset, tag)), 'r') as file_stream:
             items = json.load(file_stream)
             for item in items:
                 img_path = os.path.join(root_dir, item['image_path'])
-                if not os.path.exists(img_path):
+                if not image_manifest.exists(item['image_path']):
                     Log.warn('Image Path: {} not exists.'.format(img_path))
                     continue
 
@@ -74,7 +77,7 @@ class DefaultFaceGANDataset(data.Dataset):
             items = json.load(file_stream)
             for item in items:
                 img_path = os.path.join(root_dir, item['image_path'])
-                if not os.path.exists(img_path):
+                if not image_manifest.exists(item['image_path']):
                     Log.warn('Image Path: {} not exists.'.format(img_path))
                     continue
 
@@ -86,7 +89,7 @@ class DefaultFaceGANDataset(data.Dataset):
                 items = json.load(file_stream)
                 for item in items:
                     img_path = os.path.join(root_dir, item['image_path'])
-                    if not os.path.exists(img_path):
+                    if not image_manifest.exists(item['image_path']):
                         Log.warn('Image Path: {} not exists.'.format(img_path))
                         continue
 
@@ -97,7 +100,7 @@ class DefaultFaceGANDataset(data.Dataset):
                 items = json.load(file_stream)
                 for item in items:
                     img_path = os.path.join(root_dir, item['image_path'])
-                    if not os.path.exists(img_path):
+                    if not image_manifest.exists(item['image_path']):
                         Log.warn('Image Path: {} not exists.'.format(img_path))
                         continue
 
@@ -7,6 +7,7 @@
 import os
 import torch.utils.data as data
 
+from lib.data.manifest import Manifest
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
@@ -49,17 +50,19 @@ class DefaultPix2pixDataset(data.Dataset):
         return len(self.imgA_list)
 
     def __list_dirs(self, root_dir, dataset):
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
         imgA_list = list()
         imgB_list = list()
 
         imageA_dir = os.path.join(root_dir, dataset, 'imageA')
         imageB_dir = os.path.join(root_dir, dataset, 'imageB')
 
-        for file_name in os.listdir(imageA_dir):
+        imageB_manifest = Manifest.get(imageB_dir, cache_dir=manifest_dir)
+        for file_name in Manifest.get(imageA_dir, cache_dir=manifest_dir).list_files():
             image_name = '.'.join(file_name.split('.')[:-1])
-            imgA_path = ImageHelper.imgpath(imageA_dir, image_name)
-            imgB_path = ImageHelper.imgpath(imageB_dir, image_name)
-            if not os.path.exists(imgA_path) or not os.path.exists(imgB_path):
+            imgA_path = os.path.join(imageA_dir, file_name)
+            imgB_path = imageB_manifest.imgpath(image_name)
+            if not ImageHelper.is_img(file_name) or imgB_path is None:
                 Log.warn('Img Path: {} not exists.'.format(imgA_path))
                 continue
 
@@ -69,11 +72,12 @@ class DefaultPix2pixDataset(data.Dataset):
         if dataset == 'train' and self.configer.get('data', 'include_val'):
             imageA_dir = os.path.join(root_dir, 'val/imageA')
             imageB_dir = os.path.join(root_dir, 'val/imageB')
-            for file_name in os.listdir(imageA_dir):
+            imageB_manifest = Manifest.get(imageB_dir, cache_dir=manifest_dir)
+            for file_name in Manifest.get(imageA_dir, cache_dir=manifest_dir).list_files():
                 image_name = '.'.join(file_name.split('.')[:-1])
-                imgA_path = ImageHelper.imgpath(imageA_dir, image_name)
-                imgB_path = ImageHelper.imgpath(imageB_dir, image_name)
-                if not os.path.exists(imgA_path) or not os.path.exists(imgB_path):
+                imgA_path = os.path.join(imageA_dir, file_name)
+                imgB_path = imageB_manifest.imgpath(image_name)
+                if not ImageHelper.is_img(file_name) or imgB_path is None:
                     Log.warn('Img Path: {} not exists.'.format(imgA_path))
                     continue
 
@@ -9,7 +9,11 @@ from torch.utils import data
 import lib.data.pil_aug_transforms as pil_aug_trans
 import lib.data.cv2_aug_transforms as cv2_aug_trans
 import lib.data.transforms as trans
+from lib.data.batch_aug_transforms import BatchAugCompose
 from lib.data.collate import collate
+from lib.data.prefetch_loader import PrefetchLoader
+from lib.data.sampler import ResumableSampler
+from lib.runner.grad_accumulator import GradAccumulator
 from lib.tools.util.logger import Logger as Log
 from data.pose.datasets.default_cpm_dataset import DefaultCPMDataset
 from data.pose.datasets.default_openpose_dataset import DefaultOpenPoseDataset
@@ -28,6 +32,9 @@ class DataLoader(object):
             Log.error('Not support {} image tool.'.format(self.configer.get('data', 'image_tool')))
             exit(1)
 
+        # The heatmaps are built in the datasets, so only the photometric batch transforms.
+        self.batch_aug_train_transform = BatchAugCompose(self.configer, split='train', geometric=False)
+
         if self.configer.get('data', 'image_tool') == 'pil':
             self.aug_val_transform = pil_aug_trans.PILAugCompose(self.configer, split='val')
         elif self.configer.get('data', 'image_tool') == 'cv2':
@@ -57,16 +64,19 @@ class DataLoader(object):
             Log.error('{} dataset is invalid.'.format(self.configer.get('dataset', default=None)))
             exit(1)
 
+        sampler = ResumableSampler(dataset, seed=self.configer.get('seed', default=None),
+                                   distributed=self.configer.get('network.distributed', default=False))
         trainloader = data.DataLoader(
-            dataset,
-            batch_size=self.configer.get('train', 'batch_size'), shuffle=True,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            dataset, sampler=sampler,
+            batch_size=GradAccumulator.get_micro_batch_size(self.configer),
+            pin_memory=True,
             drop_last=self.configer.get('data', 'drop_last'),
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('train', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
-        return trainloader
+        return PrefetchLoader.wrap(trainloader, self.configer, batch_transform=self.batch_aug_train_transform)
 
     def get_valloader(self, dataset=None):
         dataset = 'val' if dataset is None else dataset
@@ -89,12 +99,13 @@ class DataLoader(object):
         valloader = data.DataLoader(
             dataset,
             batch_size=self.configer.get('val', 'batch_size'), shuffle=False,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('val', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
-        return valloader
+        return PrefetchLoader.wrap(valloader, self.configer)
 
 
 if __name__ == "__main__":
@@ -9,8 +9,10 @@ import torch
 import numpy as np
 import torch.utils.data as data
 
+from lib.data.anno_store import AnnoStore
+from lib.data.manifest import Manifest
+from lib.data.sample_cache import SampleCache
 from lib.parallel.data_container import DataContainer
-from lib.tools.helper.json_helper import JsonHelper
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
 from data.pose.utils.heatmap_generator import HeatmapGenerator
@@ -22,13 +24,32 @@ class DefaultOpenPoseDataset(data.Dataset):
     def __init__(self, root_dir=None, dataset=None,
                  aug_transform=None,img_transform=None, configer=None):
         self.configer = configer
+        self.sample_cache = SampleCache(**self.configer.get('{}.sample_cache'.format(dataset), default=dict()))
         self.aug_transform = aug_transform
         self.img_transform = img_transform
         self.heatmap_generator = HeatmapGenerator(self.configer)
         self.paf_generator = PafGenerator(self.configer)
-        self.img_list, self.json_list, self.mask_list = self.__list_dirs(root_dir, dataset)
+        # The config of the reads, in the keys of the sample cache.
+        self.read_key = (self.configer.get('data', 'image_tool'), self.configer.get('data', 'input_mode'))
+        self.img_list, self.anno_list, self.mask_list = self.__list_dirs(root_dir, dataset)
+        self.stamp_list = self.list_stamps()
+
+    def list_stamps(self):
+        """The stamps of the listed files & annos, for the keys of the sample cache."""
+        if not self.sample_cache.enabled:
+            return None
+
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
+        return list(zip(Manifest.get_stamps(self.img_list, cache_dir=manifest_dir),
+                        AnnoStore.get_stamps(self.anno_list, cache_dir=manifest_dir),
+                        Manifest.get_stamps(self.mask_list, cache_dir=manifest_dir)))
 
     def __getitem__(self, index):
+        return self.get_sample(**self.sample_cache.get(
+            None if self.stamp_list is None else (self.read_key, self.stamp_list[index]),
+            lambda: self.read_sample(index)))
+
+    def read_sample(self, index):
         img = ImageHelper.read_image(self.img_list[index],
                                      tool=self.configer.get('data', 'image_tool'),
                                      mode=self.configer.get('data', 'input_mode'))
@@ -40,8 +61,10 @@ class DefaultOpenPoseDataset(data.Dataset):
             if self.configer.get('data', 'image_tool') == 'pil':
                 maskmap = ImageHelper.to_img(maskmap)
 
-        kpts, bboxes = self.__read_json_file(self.json_list[index])
+        kpts, bboxes = self.__read_anno(self.anno_list[index])
+        return dict(img=img, maskmap=maskmap, kpts=kpts, bboxes=bboxes)
 
+    def get_sample(self, img, maskmap, kpts, bboxes):
         if self.aug_transform is not None and len(bboxes) > 0:
             img, maskmap, kpts, bboxes = self.aug_transform(img, maskmap=maskmap, kpts=kpts, bboxes=bboxes)
 
@@ -76,63 +99,35 @@ class DefaultOpenPoseDataset(data.Dataset):
 
         return len(self.img_list)
 
-    def __read_json_file(self, json_file):
-        """
-            filename: JSON file
-
-            return: three list: key_points list, centers list and scales list.
-        """
-        json_dict = JsonHelper.load_file(json_file)
-
-        kpts = list()
-        bboxes = list()
-
-        for object in json_dict['objects']:
-            kpts.append(object['keypoints'])
-            if 'bbox' in object:
-                bboxes.append(object['bbox'])
+    def __read_anno(self, anno):
+        objects = AnnoStore.read_objects(anno)
+        kpts = objects['kpts']
+        if kpts is None:
+            kpts = np.zeros((0, self.configer.get('data', 'num_kpts'), 3), dtype=np.float32)
 
-        return np.array(kpts).astype(np.float32), np.array(bboxes).astype(np.float32)
+        return kpts, objects['bboxes'][objects['has_bbox']]
 
     def __list_dirs(self, root_dir, dataset):
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
+        use_store = self.configer.get('data.anno_store', default=False)
         img_list = list()
-        json_list = list()
+        anno_list = list()
         mask_list = list()
-        image_dir = os.path.join(root_dir, dataset, 'image')
-        json_dir = os.path.join(root_dir, dataset, 'json')
-        mask_dir = os.path.join(root_dir, dataset, 'mask')
-
-        for file_name in os.listdir(json_dir):
-            image_name = '.'.join(file_name.split('.')[:-1])
-            mask_path = os.path.join(mask_dir, '{}.png'.format(image_name))
-            img_path = ImageHelper.imgpath(image_dir, image_name)
-            json_path = os.path.join(json_dir, file_name)
-            if not os.path.exists(json_path) or img_path is None:
-                Log.warn('Json Path: {} not exists.'.format(json_path))
-                continue
-
-            json_list.append(json_path)
-            mask_list.append(mask_path)
-            img_list.append(img_path)
-
-        if dataset == 'train' and self.configer.get('data', 'include_val'):
-            image_dir = os.path.join(root_dir, 'val/image')
-            json_dir = os.path.join(root_dir, 'val/json')
-            mask_dir = os.path.join(root_dir, 'val/mask')
-            for file_name in os.listdir(json_dir):
-                image_name = '.'.join(file_name.split('.')[:-1])
-                mask_path = os.path.join(mask_dir, '{}.png'.format(image_name))
-                img_path = ImageHelper.imgpath(image_dir, image_name)
-                json_path = os.path.join(json_dir, file_name)
-                if not os.path.exists(json_path) or img_path is None:
-                    Log.warn('Json Path: {} not exists.'.format(json_path))
+        split_list = [dataset, 'val'] if dataset == 'train' and self.configer.get('data', 'include_val') else [dataset]
+        for split in split_list:
+            image_manifest = Manifest.get(os.path.join(root_dir, split, 'image'), cache_dir=manifest_dir)
+            for image_name, anno in AnnoStore.list_annos(os.path.join(root_dir, split),
+                                                         use_store=use_store, cache_dir=manifest_dir):
+                img_path = image_manifest.imgpath(image_name)
+                if img_path is None:
+                    Log.warn('Image of {} not exists.'.format(image_name))
                     continue
 
-                json_list.append(json_path)
-                mask_list.append(mask_path)
+                anno_list.append(anno)
+                mask_list.append(os.path.join(root_dir, split, 'mask', '{}.png'.format(image_name)))
                 img_list.append(img_path)
 
-        return img_list, json_list, mask_list
+        return img_list, anno_list, mask_list
 
 
 if __name__ == "__main__":
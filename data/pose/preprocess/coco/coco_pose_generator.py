@@ -3,16 +3,17 @@
 # Author: Donny You(youansheng@gmail.com)
 
 
+import io
 import os
 import math
-import json
-import shutil
 import argparse
 import numpy as np
 from PIL import Image
 
 from pycocotools.coco import COCO
 
+from lib.data.generator import ParallelGenerator
+
 
 COCO_TO_OURS = [0, 15, 14, 17, 16, 5, 2, 6, 3, 7, 4, 11, 8, 12, 9, 13, 10]
 
@@ -21,133 +22,145 @@ MASK_DIR = 'mask'
 IMAGE_DIR = 'image'
 
 
-class CocoPoseGenerator(object):
+def str2bool(v):
+    """ Usage:
+    parser.add_argument('--pretrained', type=str2bool, nargs='?', const=True,
+                        dest='pretrained', help='Whether to use pretrained models.')
+    """
+    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Unsupported value encountered.')
+
+
+class CocoPoseGenerator(ParallelGenerator):
 
     def __init__(self, args, json_dir=JOSN_DIR, mask_dir=MASK_DIR, image_dir=IMAGE_DIR):
+        super(CocoPoseGenerator, self).__init__(args.root_dir, nproc=args.nproc, anno_store=args.anno_store)
         self.args = args
-        self.json_dir = os.path.join(self.args.root_dir, json_dir)
-        if not os.path.exists(self.json_dir):
-            os.makedirs(self.json_dir)
+        self.json_dir = json_dir
+        self.image_dir = image_dir
+        self.mask_dir = mask_dir
+        self.coco = COCO(self.args.anno_file)
+        self.img_ids = list(self.coco.imgs.keys())
 
-        self.image_dir = os.path.join(self.args.root_dir, image_dir)
-        if not os.path.exists(self.image_dir):
-            os.makedirs(self.image_dir)
+    def get_items(self, split):
+        return [(self.coco.imgs[img_id]['file_name'].split('.')[0], img_id) for img_id in self.img_ids]
 
-        self.mask_dir = os.path.join(self.args.root_dir, mask_dir)
-        if not os.path.exists(self.mask_dir):
-            os.makedirs(self.mask_dir)
+    @staticmethod
+    def _encode_png(mask):
+        png_stream = io.BytesIO()
+        Image.fromarray(mask, mode='P').save(png_stream, format='PNG')
+        return png_stream.getvalue()
 
-        self.coco = COCO(self.args.anno_file)
-        self.img_ids = list(self.coco.imgs.keys())
+    def process_item(self, split, name, img_id):
+        json_dict = dict()
+        ann_ids = self.coco.getAnnIds(imgIds=img_id)
+        img_anns = self.coco.loadAnns(ann_ids)
+        num_persons = len(img_anns)
+        filename = self.coco.imgs[img_id]['file_name']
+        width = self.coco.imgs[img_id]['width']
+        height = self.coco.imgs[img_id]['height']
+        json_dict['height'] = height
+        json_dict['width'] = width
+
+        mask_list = list()
+
+        persons = list()
+        person_centers = list()
+
+        for p in range(num_persons):
+            if img_anns[p]['iscrowd'] == 1:
+                continue
 
-    def generate_label(self):
-        for i, img_id in enumerate(self.img_ids):
-            json_dict = dict()
-            ann_ids = self.coco.getAnnIds(imgIds=img_id)
-            img_anns = self.coco.loadAnns(ann_ids)
-            num_persons = len(img_anns)
-            filename = self.coco.imgs[img_id]['file_name']
-            width = self.coco.imgs[img_id]['width']
-            height = self.coco.imgs[img_id]['height']
-            json_dict['height'] = height
-            json_dict['width'] = width
+            if img_anns[p]['num_keypoints'] < 5 or img_anns[p]['area'] < 32 * 32:
+                mask_list.append(p)
+                continue
 
-            mask_list = list()
+            kpt = img_anns[p]['keypoints']
+            dic = dict()
+
+            # person center
+            person_center = [img_anns[p]['bbox'][0] + img_anns[p]['bbox'][2] / 2.0,
+                             img_anns[p]['bbox'][1] + img_anns[p]['bbox'][3] / 2.0]
+
+            # skip this person if the distance to exiting person is too small
+            flag = 0
+            for pc in person_centers:
+                dis = math.sqrt((person_center[0] - pc[0]) * (person_center[0] - pc[0])
+                                + (person_center[1] - pc[1]) * (person_center[1] - pc[1]))
+                if dis < pc[2] * 0.3:
+                    flag = 1
+                    break
+
+            if flag == 1:
+                mask_list.append(p)
+                continue
+
+            dic['bbox'] = [img_anns[p]['bbox'][0], img_anns[p]['bbox'][1],
+                           img_anns[p]['bbox'][0] + img_anns[p]['bbox'][2],
+                           img_anns[p]['bbox'][1] + img_anns[p]['bbox'][3]]
+
+            dic['kpts'] = np.zeros((17, 3)).tolist()
+            for part in range(17):
+                dic['kpts'][part][0] = kpt[part * 3]
+                dic['kpts'][part][1] = kpt[part * 3 + 1]
+                # visiable is 1, unvisiable is 0 and not labeled is -1
+                if kpt[part * 3 + 2] == 2:
+                    dic['kpts'][part][2] = 1
+                elif kpt[part * 3 + 2] == 1:
+                    dic['kpts'][part][2] = 0
+                else:
+                    dic['kpts'][part][2] = -1
 
-            persons = list()
-            person_centers = list()
+            persons.append(dic)
+            person_centers.append(np.append(person_center, max(img_anns[p]['bbox'][2], img_anns[p]['bbox'][3])))
 
+        if len(persons) > 0:
+            persons = self.__coco_to_ours(persons)
+            json_dict['objects'] = persons
+
+            mask_all = np.zeros((height, width), dtype=np.uint8)
+            mask_miss = np.zeros((height, width), dtype=np.uint8)
+            flag = 0
             for p in range(num_persons):
                 if img_anns[p]['iscrowd'] == 1:
+                    mask_crowd = self.coco.annToMask(img_anns[p])
+                    temp = np.bitwise_and(mask_all, mask_crowd)
+                    mask_crowd = mask_crowd - temp
+                    flag += 1
                     continue
+                else:
+                    mask = self.coco.annToMask(img_anns[p])
 
-                if img_anns[p]['num_keypoints'] < 5 or img_anns[p]['area'] < 32 * 32:
-                    mask_list.append(p)
-                    continue
+                if p in mask_list:
+                    mask_miss = np.bitwise_or(mask, mask_miss)
+                else:
+                    mask_all = np.bitwise_or(mask, mask_all)
 
-                kpt = img_anns[p]['keypoints']
-                dic = dict()
+            if flag < 1:
+                mask_miss = np.logical_not(mask_miss)
 
-                # person center
-                person_center = [img_anns[p]['bbox'][0] + img_anns[p]['bbox'][2] / 2.0,
-                                 img_anns[p]['bbox'][1] + img_anns[p]['bbox'][3] / 2.0]
+            elif flag == 1:
+                mask_miss = np.logical_not(np.bitwise_or(mask_miss, mask_crowd))
+            else:
+                raise Exception('crowd segments > 1')
 
-                # skip this person if the distance to exiting person is too small
-                flag = 0
-                for pc in person_centers:
-                    dis = math.sqrt((person_center[0] - pc[0]) * (person_center[0] - pc[0])
-                                    + (person_center[1] - pc[1]) * (person_center[1] - pc[1]))
-                    if dis < pc[2] * 0.3:
-                        flag = 1
-                        break
+            mask_miss_vis = np.zeros((height, width), dtype=np.uint8)
+            mask_miss_vis[:, :] = mask_miss * 255
+            with open(os.path.join(self.args.img_dir, filename), 'rb') as img_stream:
+                img_content = img_stream.read()
 
-                if flag == 1:
-                    mask_list.append(p)
-                    continue
+            return dict(files=dict(image=(os.path.join(self.image_dir, filename), img_content),
+                                   mask=(os.path.join(self.mask_dir, '{}.png'.format(name)),
+                                         self._encode_png(mask_miss)),
+                                   mask_vis=(os.path.join(self.mask_dir, '{}_vis.png'.format(name)),
+                                             self._encode_png(mask_miss_vis))),
+                        meta=json_dict, meta_path=os.path.join(self.json_dir, '{}.json'.format(name)))
 
-                dic['bbox'] = [img_anns[p]['bbox'][0], img_anns[p]['bbox'][1],
-                               img_anns[p]['bbox'][0] + img_anns[p]['bbox'][2],
-                               img_anns[p]['bbox'][1] + img_anns[p]['bbox'][3]]
-
-                dic['kpts'] = np.zeros((17, 3)).tolist()
-                for part in range(17):
-                    dic['kpts'][part][0] = kpt[part * 3]
-                    dic['kpts'][part][1] = kpt[part * 3 + 1]
-                    # visiable is 1, unvisiable is 0 and not labeled is -1
-                    if kpt[part * 3 + 2] == 2:
-                        dic['kpts'][part][2] = 1
-                    elif kpt[part * 3 + 2] == 1:
-                        dic['kpts'][part][2] = 0
-                    else:
-                        dic['kpts'][part][2] = -1
-
-                persons.append(dic)
-                person_centers.append(np.append(person_center, max(img_anns[p]['bbox'][2], img_anns[p]['bbox'][3])))
-
-            if len(persons) > 0:
-                persons = self.__coco_to_ours(persons)
-                json_dict['objects'] = persons
-
-                mask_all = np.zeros((height, width), dtype=np.uint8)
-                mask_miss = np.zeros((height, width), dtype=np.uint8)
-                flag = 0
-                for p in range(num_persons):
-                    if img_anns[p]['iscrowd'] == 1:
-                        mask_crowd = self.coco.annToMask(img_anns[p])
-                        temp = np.bitwise_and(mask_all, mask_crowd)
-                        mask_crowd = mask_crowd - temp
-                        flag += 1
-                        continue
-                    else:
-                        mask = self.coco.annToMask(img_anns[p])
-
-                    if p in mask_list:
-                        mask_miss = np.bitwise_or(mask, mask_miss)
-                    else:
-                        mask_all = np.bitwise_or(mask, mask_all)
-
-                if flag < 1:
-                    mask_miss = np.logical_not(mask_miss)
-
-                elif flag == 1:
-                    mask_miss = np.logical_not(np.bitwise_or(mask_miss, mask_crowd))
-                else:
-                    raise Exception('crowd segments > 1')
-
-                fw = open(os.path.join(self.json_dir, '{}.json'.format(filename.split('.')[0])), 'w')
-                fw.write(json.dumps(json_dict))
-                fw.close()
-                mask_miss_vis = np.zeros((height, width), dtype=np.uint8)
-                mask_miss_vis[:, :] = mask_miss * 255
-                mask_image = Image.fromarray(mask_miss, mode='P')
-                mask_image.save(os.path.join(self.mask_dir, '{}.png'.format(filename.split('.')[0])))
-                mask_image_vis = Image.fromarray(mask_miss_vis, mode='P')
-                mask_image_vis.save(os.path.join(self.mask_dir, '{}_vis.png'.format(filename.split('.')[0])))
-                shutil.copyfile(os.path.join(self.args.img_dir, filename),
-                                os.path.join(self.image_dir, filename))
-
-            if i % 1000 == 0:
-                print("Processed {} of {}".format(i, len(self.img_ids)))
+        return None
 
     def __coco_to_ours(self, persons):
         our_persons = list()
@@ -182,8 +195,12 @@ if __name__ == "__main__":
                         dest='anno_file', help='The annotations file of coco keypoints.')
     parser.add_argument('--ori_img_dir', default=None, type=str,
                         dest='img_dir', help='The image dir corresponding to coco anno file.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--anno_store', type=str2bool, nargs='?', const=True, default=False,
+                        dest='anno_store', help='Whether to write the binary annotation store.')
 
     args = parser.parse_args()
 
     coco_pose_generator = CocoPoseGenerator(args)
-    coco_pose_generator.generate_label()
+    coco_pose_generator.generate()
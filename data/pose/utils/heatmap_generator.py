@@ -3,6 +3,7 @@
 # Author: Donny You(youansheng@gmail.com)
 
 
+import math
 import numpy as np
 import torch
 
@@ -10,9 +11,24 @@ from lib.tools.util.logger import Logger as Log
 
 
 class HeatmapGenerator(object):
+    """Render the keypoint heatmaps.
 
+    Every peak is only evaluated inside the window where exp(-exponent) is not masked (exponent <= 4.6052),
+    and all the keypoints of one person are rendered at once. Persons are accumulated in order, so that the
+    float32 sums are the same as rendering every peak over the whole map.
+    """
     def __init__(self, configer):
         self.configer = configer
+        self.grid_dict = dict()
+
+    def get_grid(self, width, height, stride):
+        key = (width, height, stride)
+        if key not in self.grid_dict:
+            start = stride / 2.0 - 0.5
+            self.grid_dict[key] = (np.arange(int(width // stride)) * stride + start,
+                                   np.arange(int(height // stride)) * stride + start)
+
+        return self.grid_dict[key]
 
     def __call__(self, gt_kpts, input_size, maskmap=None):
         width, height = input_size
@@ -23,36 +39,49 @@ class HeatmapGenerator(object):
 
         heatmap = np.zeros((num_keypoints + 1, height // stride, width // stride), dtype=np.float32)
         start = stride / 2.0 - 0.5
-
+        if method == 'gaussian':
+            radius = math.sqrt(2.0 * 4.6052) * sigma
+        elif method == 'laplace':
+            radius = 2.0 * 4.6052 * sigma
+        else:
+            Log.error('Not support heatmap method.')
+            exit(1)
+
+        x_grid, y_grid = self.get_grid(width, height, stride)
+        half_size = int(math.ceil(radius / stride)) + 1
+        offset = np.arange(-half_size, half_size + 1)
         for i in range(len(gt_kpts)):
-            for j in range(num_keypoints):
-                if gt_kpts[i][j][2] < 0:
-                    continue
-
-                x = gt_kpts[i][j][0]
-                y = gt_kpts[i][j][1]
-                y_range = [i for i in range(int(height // stride))]
-                x_range = [i for i in range(int(width // stride))]
-                xx, yy = np.meshgrid(x_range, y_range)
-                xx = xx * stride + start
-                yy = yy * stride + start
-                d2 = (xx - x) ** 2 + (yy - y) ** 2
-                if method == 'gaussian':
-                    exponent = d2 / 2.0 / sigma / sigma
-                elif method == 'laplace':
-                    exponent = np.sqrt(d2) / 2.0 / sigma
-
-                else:
-                    Log.error('Not support heatmap method.')
-                    exit(1)
-
-                mask = exponent <= 4.6052
-                cofid_map = np.exp(-exponent)
-                cofid_map = np.multiply(mask, cofid_map)
-                heatmap[j:j+1, :, :] += cofid_map[np.newaxis, :, :]
-
-                heatmap[j:j+1, :, :][heatmap[j:j+1, :, :] > 1.0] = 1.0
-
+            kpts = np.asarray(gt_kpts[i])[:num_keypoints]
+            kpt_index = np.nonzero(kpts[:, 2] >= 0)[0]
+            if len(kpt_index) == 0:
+                continue
+
+            x = kpts[kpt_index, 0]
+            y = kpts[kpt_index, 1]
+            xs = np.round((x - start) / stride).astype(np.int64)[:, np.newaxis] + offset
+            ys = np.round((y - start) / stride).astype(np.int64)[:, np.newaxis] + offset
+            x_valid = np.logical_and(xs >= 0, xs < len(x_grid))
+            y_valid = np.logical_and(ys >= 0, ys < len(y_grid))
+            xs = np.clip(xs, 0, len(x_grid) - 1)
+            ys = np.clip(ys, 0, len(y_grid) - 1)
+
+            d2 = (x_grid[xs][:, np.newaxis, :] - x[:, np.newaxis, np.newaxis]) ** 2 \
+                + (y_grid[ys][:, :, np.newaxis] - y[:, np.newaxis, np.newaxis]) ** 2
+            if method == 'gaussian':
+                exponent = d2 / 2.0 / sigma / sigma
+            else:
+                exponent = np.sqrt(d2) / 2.0 / sigma
+
+            cofid_map = np.multiply(exponent <= 4.6052, np.exp(-exponent))
+            valid = np.logical_and(y_valid[:, :, np.newaxis], x_valid[:, np.newaxis, :])
+            kk = np.broadcast_to(kpt_index[:, np.newaxis, np.newaxis], valid.shape)[valid]
+            yy = np.broadcast_to(ys[:, :, np.newaxis], valid.shape)[valid]
+            xx = np.broadcast_to(xs[:, np.newaxis, :], valid.shape)[valid]
+            heatmap[kk, yy, xx] += cofid_map[valid]
+
+        if len(gt_kpts) > 0:
+            # All the peaks are non-negative, so clamping once equals clamping after every peak.
+            np.minimum(heatmap[:-1], 1.0, out=heatmap[:-1])
             heatmap[num_keypoints, :, :] = 1.0 - np.max(heatmap[:-1, :, :], axis=0)
 
         heatmap = torch.from_numpy(heatmap)
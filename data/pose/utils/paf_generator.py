@@ -9,7 +9,12 @@ import torch
 
 
 class PafGenerator(object):
+    """Render the part affinity fields.
 
+    Every limb map is the running average of the unit vectors of the persons covering the pixel. Only
+    the pixels in the limb window, and the pixels already covered three times or more (whose float32
+    average may move when re-scaled by the count), are updated for every person.
+    """
     def __init__(self, configer):
         self.configer = configer
 
@@ -19,13 +24,13 @@ class PafGenerator(object):
         stride = self.configer.get('network', 'stride')
         theta = self.configer.get('target.paf.theta')
         width, height = input_width // stride, input_height // stride
-        accumulate_vec_map = np.zeros((len(vec_pair) * 2, height, width), dtype=np.float32)
-        cnt = np.zeros((len(vec_pair), height, width), dtype=np.int32)
-        channel, height, width = cnt.shape
-        for j in range(len(gt_kpts)):
-            for i in range(channel):
-                a = vec_pair[i][0] - 1
-                b = vec_pair[i][1] - 1
+        accumulate_vec_map = np.zeros((len(vec_pair) * 2, height * width), dtype=np.float32)
+        cnt = np.zeros((len(vec_pair), height * width), dtype=np.int32)
+        for i in range(len(vec_pair)):
+            a = vec_pair[i][0] - 1
+            b = vec_pair[i][1] - 1
+            multi_index = np.zeros((0,), dtype=np.int64)
+            for j in range(len(gt_kpts)):
                 if gt_kpts[j][a][2] < 0 or gt_kpts[j][b][2] < 0:
                     continue
 
@@ -49,32 +54,33 @@ class PafGenerator(object):
                 min_h = max(int(round(min(ay, by) - theta)), 0)
                 max_h = min(int(round(max(ay, by) + theta)), height)
 
-                range_x = list(range(int(min_w), int(max_w), 1))
-                range_y = list(range(int(min_h), int(max_h), 1))
-                xx, yy = np.meshgrid(range_x, range_y)
-
-                xx = xx.astype(np.uint32)
-                yy = yy.astype(np.uint32)
-                px = xx - ax  # the vector from (x,y) to centerA
-                py = yy - ay
+                range_x = np.arange(min_w, max_w)
+                range_y = np.arange(min_h, max_h)
+                px = range_x.astype(np.uint32)[np.newaxis, :] - ax  # the vector from (x,y) to centerA
+                py = range_y.astype(np.uint32)[:, np.newaxis] - ay
                 limb_width = np.abs(bax * py - bay * px)
                 mask = limb_width < theta  # mask is 2D
-
-                vec_map = np.zeros((2, height, width), dtype=np.float32)
-                vec_map[:, yy, xx] = np.repeat(mask[np.newaxis, :, :], 2, axis=0)
-                vec_map[:, yy, xx] *= np.array([bax, bay])[:, np.newaxis, np.newaxis]
-
-                mask = np.logical_or(np.abs(vec_map[0:1, :, :]) > 0, np.abs(vec_map[1:2, :, :]) > 0)
-
-                accumulate_vec_map[2*i:2*i+2, :, :] = np.multiply(accumulate_vec_map[2*i:2*i+2], cnt[i:i+1, :, :])
-                accumulate_vec_map[2*i:2*i+2, :, :] += vec_map
-                cnt[i:i+1, :, :][mask == 1] += 1
-                mask = cnt[i:i+1, :, :] == 0
-                cnt[i:i+1, :, :][mask == 1] = 1
-                accumulate_vec_map[2*i:2*i+2, :, :] = np.divide(accumulate_vec_map[2*i:2*i+2, :, :], cnt[i:i+1, :, :])
-                cnt[i:i+1, :, :][mask == 1] = 0
-
-        vecmap = torch.from_numpy(accumulate_vec_map)
+                limb_index = (range_y[:, np.newaxis] * width + range_x[np.newaxis, :])[mask]
+
+                vec = np.array([bax, bay], dtype=np.float32)[:, np.newaxis]
+                if len(multi_index) == 0:
+                    index = limb_index
+                    cur_cnt = cnt[i, index]
+                    new_cnt = cur_cnt + 1
+                else:
+                    index = np.union1d(limb_index, multi_index)
+                    in_limb = np.isin(index, limb_index, assume_unique=True)
+                    cur_cnt = cnt[i, index]
+                    new_cnt = cur_cnt + in_limb
+                    vec = vec * in_limb
+
+                vec_map = np.multiply(accumulate_vec_map[2*i:2*i+2, index], cur_cnt).astype(np.float32)
+                vec_map += vec
+                accumulate_vec_map[2*i:2*i+2, index] = np.divide(vec_map, np.maximum(new_cnt, 1))
+                cnt[i, index] = new_cnt
+                multi_index = index[new_cnt >= 3]
+
+        vecmap = torch.from_numpy(accumulate_vec_map.reshape(len(vec_pair) * 2, height, width))
         if maskmap is not None:
             vecmap = vecmap * maskmap
 
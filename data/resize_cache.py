@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Build the offline cache of the deterministic prefix of aug_trans, read by the datasets with <split>.resize_cache set.
+#
+# Usage:
+#   python -m data.resize_cache --config_file configs/seg/cityscapes/base_fcn_cityscapes_seg.conf \
+#       --phase val --cache_root ~/cache/cityscapes --nproc 16
+
+
+import os
+import argparse
+import importlib
+
+from lib.tools.util.configer import Configer
+from lib.tools.util.logger import Logger as Log
+from lib.tools.util.progressbar import track_parallel_progress
+
+
+DATA_LOADER_DICT = {
+    'cls': 'data.cls.data_loader',
+    'seg': 'data.seg.data_loader',
+}
+
+
+def build_resize_cache(configer, phase, nproc=1):
+    task = configer.get('task')
+    if task not in DATA_LOADER_DICT:
+        Log.error('Resize cache of the {} task is not supported.'.format(task))
+        exit(1)
+
+    data_loader = importlib.import_module(DATA_LOADER_DICT[task]).DataLoader(configer)
+    dataset = data_loader.get_dataset(phase)
+    resize_cache = getattr(dataset, 'resize_cache', None)
+    if resize_cache is None or not resize_cache.enabled:
+        Log.error('The {} dataset has no resize cache: {}.resize_cache is not set, '
+                  'or the aug transforms have no deterministic prefix.'.format(phase, phase))
+        exit(1)
+
+    if task == 'seg':
+        item_list = list(zip(dataset.img_list, dataset.label_list))
+    else:
+        item_list = [(img_path,) for img_path in dataset.img_list]
+
+    Log.info('Building resize cache {} of {} samples...'.format(resize_cache.cache_dir, len(item_list)))
+    result_list = track_parallel_progress(resize_cache.build_item, item_list, nproc, chunksize=8)
+    resize_cache.finish(result_list)
+    built_count = sum(1 for _, _, built in result_list if built)
+    Log.info('Built {} samples, {} existing samples skipped.'.format(built_count, len(result_list) - built_count))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_file', default=None, type=str,
+                        dest='config_file', help='The file of the hyper parameters.')
+    parser.add_argument('--phase', default='train', type=str,
+                        dest='phase', help='The split of the dataset: train or val.')
+    parser.add_argument('--data_dir', default=None, type=str,
+                        dest='data.data_dir', help='The Directory of the data.')
+    parser.add_argument('--cache_root', default=None, type=str,
+                        dest='cache_root', help='The root of the cache, default <phase>.resize_cache.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--log_level', default="info", type=str,
+                        dest='logging.log_level', help='To set the level to print to screen.')
+    parser.add_argument('--log_format', default="%(asctime)s %(levelname)-7s %(message)s", type=str,
+                        dest='logging.log_format', help='To set the format to print to screen.')
+
+    args = parser.parse_args()
+    configer = Configer(args_parser=args)
+    configer.update('data.data_dir', os.path.expanduser(configer.get('data', 'data_dir')))
+    if args.cache_root is not None:
+        if configer.get('{}.resize_cache'.format(args.phase), default=None) is None:
+            configer.add('{}.resize_cache'.format(args.phase), args.cache_root)
+        else:
+            configer.update('{}.resize_cache'.format(args.phase), args.cache_root)
+
+    Log.init(log_level=configer.get('logging', 'log_level'),
+             log_format=configer.get('logging', 'log_format'))
+    build_resize_cache(configer, args.phase, nproc=args.nproc)
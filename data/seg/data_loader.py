@@ -4,16 +4,20 @@
 # Class for the Semantic Segmentation Data Loader.
 
 
-import torch
 from torch.utils import data
 
 import lib.data.pil_aug_transforms as pil_aug_trans
 import lib.data.cv2_aug_transforms as cv2_aug_trans
 import lib.data.transforms as trans
+from lib.data.batch_aug_transforms import BatchAugCompose
 from lib.data.collate import collate
+from lib.data.prefetch_loader import PrefetchLoader
+from lib.data.sampler import ResumableSampler
+from lib.runner.grad_accumulator import GradAccumulator
 from lib.tools.util.logger import Logger as Log
 from data.seg.datasets.default_dataset import DefaultDataset
 from data.seg.datasets.cityscapes_dataset import CityscapesDataset
+from data.seg.datasets.shard_dataset import ShardDataset
 
 
 class DataLoader(object):
@@ -29,6 +33,8 @@ class DataLoader(object):
             Log.error('Not support {} image tool.'.format(self.configer.get('data', 'image_tool')))
             exit(1)
 
+        self.batch_aug_train_transform = BatchAugCompose(self.configer, split='train')
+
         if self.configer.get('data', 'image_tool') == 'pil':
             self.aug_val_transform = pil_aug_trans.PILAugCompose(self.configer, split='val')
         elif self.configer.get('data', 'image_tool') == 'cv2':
@@ -45,71 +51,66 @@ class DataLoader(object):
             trans.ToLabel(),
             trans.ReLabel(255, -1), ])
 
-    def get_trainloader(self):
+    def get_dataset(self, dataset):
+        """The dataset of a split (train or val), with the aug transform of the split."""
+        aug_transform = self.aug_train_transform if dataset == 'train' else self.aug_val_transform
         if self.configer.get('dataset', default=None) in [None, 'default']:
-            dataset = DefaultDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='train',
-                                     aug_transform=self.aug_train_transform,
+            return DefaultDataset(root_dir=self.configer.get('data', 'data_dir'), dataset=dataset,
+                                  aug_transform=aug_transform,
+                                  img_transform=self.img_transform,
+                                  label_transform=self.label_transform,
+                                  configer=self.configer)
+
+        elif self.configer.get('dataset', default=None) == 'cityscapes':
+            return CityscapesDataset(root_dir=self.configer.get('data', 'data_dir'), dataset=dataset,
+                                     aug_transform=aug_transform,
                                      img_transform=self.img_transform,
                                      label_transform=self.label_transform,
                                      configer=self.configer)
 
-        elif self.configer.get('dataset', default=None) == 'cityscapes':
-            dataset = CityscapesDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='train',
-                                        aug_transform=self.aug_train_transform,
-                                        img_transform=self.img_transform,
-                                        label_transform=self.label_transform,
-                                        configer=self.configer)
+        elif self.configer.get('dataset', default=None) == 'packed':
+            return ShardDataset(root_dir=self.configer.get('data', 'data_dir'), dataset=dataset,
+                                aug_transform=aug_transform,
+                                img_transform=self.img_transform,
+                                label_transform=self.label_transform,
+                                configer=self.configer)
 
         else:
             Log.error('{} dataset is invalid.'.format(self.configer.get('dataset')))
             exit(1)
 
-        sampler = None
-        if self.configer.get('network.distributed'):
-            sampler = torch.utils.data.distributed.DistributedSampler(dataset)
+    def get_trainloader(self):
+        dataset = self.get_dataset('train')
+        sampler = ResumableSampler(dataset, seed=self.configer.get('seed', default=None),
+                                   distributed=self.configer.get('network.distributed', default=False))
 
         trainloader = data.DataLoader(
             dataset, sampler=sampler,
-            batch_size=self.configer.get('train', 'batch_size'), shuffle=(sampler is None),
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            batch_size=GradAccumulator.get_micro_batch_size(self.configer),
+            pin_memory=True,
             drop_last=self.configer.get('data', 'drop_last'),
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('train', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return trainloader
+        return PrefetchLoader.wrap(trainloader, self.configer, batch_transform=self.batch_aug_train_transform)
 
 
     def get_valloader(self):
-        if self.configer.get('dataset', default=None) in [None, 'default']:
-            dataset = DefaultDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='val',
-                                     aug_transform=self.aug_val_transform,
-                                     img_transform=self.img_transform,
-                                     label_transform=self.label_transform,
-                                     configer=self.configer)
-
-        elif self.configer.get('dataset', default=None) == 'cityscapes':
-            dataset = CityscapesDataset(root_dir=self.configer.get('data', 'data_dir'), dataset='val',
-                                        aug_transform=self.aug_val_transform,
-                                        img_transform=self.img_transform,
-                                        label_transform=self.label_transform,
-                                        configer=self.configer)
-
-        else:
-            Log.error('{} dataset is invalid.'.format(self.configer.get('dataset')))
-            exit(1)
-
+        dataset = self.get_dataset('val')
         valloader = data.DataLoader(
             dataset,
             batch_size=self.configer.get('val', 'batch_size'), shuffle=False,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('val', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return valloader
+        return PrefetchLoader.wrap(valloader, self.configer)
 
 
 
@@ -4,11 +4,14 @@
 
 
 import os
-import numpy as np
 from torch.utils import data
 
+from lib.data.manifest import Manifest
+from lib.data.resize_cache import ResizeCache
+from lib.data.sample_cache import SampleCache
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.helper.label_helper import LabelHelper
 from lib.tools.util.logger import Logger as Log
 
 
@@ -16,33 +19,83 @@ class DefaultDataset(data.Dataset):
     def __init__(self, root_dir, dataset=None, aug_transform=None,
                  img_transform=None, label_transform=None, configer=None):
         self.configer = configer
+        self.sample_cache = SampleCache(**self.configer.get('{}.sample_cache'.format(dataset), default=dict()))
         self.aug_transform = aug_transform
         self.img_transform = img_transform
         self.label_transform = label_transform
-        self.img_list, self.label_list = self.__list_dirs(root_dir, dataset)
+        self.label_lut = LabelHelper.get_encode_lut(self.configer)
+        # The full resolution target of the evaluation, not needed in training.
+        self.with_ori_target = dataset != 'train'
+        self.scale_hint = None if aug_transform is None else aug_transform.get_scale_hint()
+        self.resize_cache = ResizeCache(self.configer.get('{}.resize_cache'.format(dataset), default=None),
+                                        aug_transform=aug_transform, configer=self.configer)
+        # The config of the reads, in the keys of the sample cache.
+        self.read_key = (self.configer.get('data', 'image_tool'), self.configer.get('data', 'input_mode'),
+                         None if self.scale_hint is None else aug_transform.trans_dict[aug_transform.get_first_resize()],
+                         self.resize_cache.ready and self.resize_cache.cache_dir)
+        self.list_items(root_dir, dataset)
 
     def __len__(self):
         return len(self.img_list)
 
     def __getitem__(self, index):
-        img = ImageHelper.read_image(self.img_list[index],
-                                     tool=self.configer.get('data', 'image_tool'),
-                                     mode=self.configer.get('data', 'input_mode'))
-        img_size = ImageHelper.get_size(img)
-        labelmap = ImageHelper.read_image(self.label_list[index],
-                                          tool=self.configer.get('data', 'image_tool'), mode='P')
-        if self.configer.get('data.label_list', default=None):
-            labelmap = self._encode_label(labelmap)
+        return self.get_sample(**self.sample_cache.get(self.get_cache_key(index), lambda: self.read_sample(index)))
+
+    def list_items(self, root_dir, dataset):
+        self.img_list, self.label_list = self.__list_dirs(root_dir, dataset)
+        self.stamp_list = self.list_stamps()
 
-        if self.configer.get('data.reduce_zero_label', default=None):
-            labelmap = self._reduce_zero_label(labelmap)
+    def list_stamps(self):
+        """The stamps of the listed files in the manifests, for the keys of the sample cache."""
+        if not self.sample_cache.enabled:
+            return None
 
-        ori_target = ImageHelper.to_np(labelmap)
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
+        return list(zip(Manifest.get_stamps(self.img_list, cache_dir=manifest_dir),
+                        Manifest.get_stamps(self.label_list, cache_dir=manifest_dir)))
+
+    def get_cache_key(self, index):
+        """The key of the sample in the sample cache, only from the listing."""
+        return None if not self.sample_cache.enabled else (self.read_key, self.stamp_list[index])
+
+    def read_sample(self, index):
+        """Read the image (maybe resized by the caches) & labelmap, and the [width, height] of the original image.
+
+        The files of the resize cache are read if the sample is cached, then the aug transform skips the cached
+        prefix, and the original labelmap is read for ori_target.
+        """
+        path_list, resized = self.resize_cache.get_paths(self.img_list[index], self.label_list[index])
+        img = ImageHelper.read_image(path_list[0],
+                                     tool=self.configer.get('data', 'image_tool'),
+                                     mode=self.configer.get('data', 'input_mode'),
+                                     scale=None if resized else self.scale_hint)
+        if resized:
+            img_size = self.resize_cache.get_size(self.img_list[index])
+        elif self.scale_hint is None:
+            img_size = ImageHelper.get_size(img)
+        else:
+            img_size = ImageHelper.read_size(self.img_list[index])
+
+        labelmap = ImageHelper.read_image(path_list[1], tool=self.configer.get('data', 'image_tool'), mode='P')
+        ori_labelmap = None
+        if resized and self.with_ori_target:
+            ori_labelmap = ImageHelper.read_image(self.label_list[index],
+                                                  tool=self.configer.get('data', 'image_tool'), mode='P')
+
+        return dict(img=img, img_size=img_size, labelmap=labelmap, ori_labelmap=ori_labelmap, resized=resized)
+
+    def get_sample(self, img, img_size, labelmap, ori_labelmap=None, resized=False):
+        """The processing of a read sample, shared by the datasets of the other sources, e.g. ShardDataset."""
+        labelmap = LabelHelper.apply(labelmap, self.label_lut)
+        meta = dict(ori_img_wh=img_size)
+        if self.with_ori_target:
+            meta['ori_target'] = ImageHelper.to_np(labelmap if ori_labelmap is None
+                                                   else LabelHelper.apply(ori_labelmap, self.label_lut))
 
         if self.aug_transform is not None:
-            img, labelmap = self.aug_transform(img, labelmap=labelmap)
+            img, labelmap = self.aug_transform(img, labelmap=labelmap, skip_prefix=resized)
 
-        border_size = ImageHelper.get_size(img)
+        meta['border_wh'] = ImageHelper.get_size(img)
 
         if self.img_transform is not None:
             img = self.img_transform(img)
@@ -50,54 +103,25 @@ class DefaultDataset(data.Dataset):
         if self.label_transform is not None:
             labelmap = self.label_transform(labelmap)
 
-        meta = dict(
-            ori_img_wh=img_size,
-            border_wh=border_size,
-            ori_target=ori_target
-        )
         return dict(
             img=DataContainer(img, stack=True),
             labelmap=DataContainer(labelmap, stack=True),
             meta=DataContainer(meta, stack=False, cpu_only=True),
         )
 
-    def _reduce_zero_label(self, labelmap):
-        if not self.configer.get('data', 'reduce_zero_label'):
-            return labelmap
-
-        labelmap = np.array(labelmap)
-        labelmap[labelmap == 0] = 255
-        labelmap = labelmap - 1
-        labelmap[labelmap == 254] = 255
-        if self.configer.get('data', 'image_tool') == 'pil':
-            labelmap = ImageHelper.to_img(labelmap.astype(np.uint8))
-
-        return labelmap
-
-    def _encode_label(self, labelmap):
-        labelmap = np.array(labelmap)
-        shape = labelmap.shape
-        encoded_labelmap = np.ones(shape=(shape[0], shape[1]), dtype=np.float32) * 255
-        for i in range(len(self.configer.get('data', 'label_list'))):
-            class_id = self.configer.get('data', 'label_list')[i]
-            encoded_labelmap[labelmap == class_id] = i
-
-        if self.configer.get('data', 'image_tool') == 'pil':
-            encoded_labelmap = ImageHelper.to_img(encoded_labelmap.astype(np.uint8))
-
-        return encoded_labelmap
-
     def __list_dirs(self, root_dir, dataset):
+        manifest_dir = self.configer.get('data.manifest_dir', default=None)
         img_list = list()
         label_list = list()
         image_dir = os.path.join(root_dir, dataset, 'image')
         label_dir = os.path.join(root_dir, dataset, 'label')
 
-        for file_name in os.listdir(label_dir):
+        image_manifest = Manifest.get(image_dir, cache_dir=manifest_dir)
+        for file_name in Manifest.get(label_dir, cache_dir=manifest_dir).list_files():
             image_name = '.'.join(file_name.split('.')[:-1])
             label_path = os.path.join(label_dir, file_name)
-            img_path = ImageHelper.imgpath(image_dir, image_name)
-            if not os.path.exists(label_path) or img_path is None:
+            img_path = image_manifest.imgpath(image_name)
+            if img_path is None:
                 Log.warn('Label Path: {} not exists.'.format(label_path))
                 continue
 
@@ -107,11 +131,12 @@ class DefaultDataset(data.Dataset):
         if dataset == 'train' and self.configer.get('data', 'include_val'):
             image_dir = os.path.join(root_dir, 'val/image')
             label_dir = os.path.join(root_dir, 'val/label')
-            for file_name in os.listdir(label_dir):
+            image_manifest = Manifest.get(image_dir, cache_dir=manifest_dir)
+            for file_name in Manifest.get(label_dir, cache_dir=manifest_dir).list_files():
                 image_name = '.'.join(file_name.split('.')[:-1])
                 label_path = os.path.join(label_dir, file_name)
-                img_path = ImageHelper.imgpath(image_dir, image_name)
-                if not os.path.exists(label_path) or img_path is None:
+                img_path = image_manifest.imgpath(image_name)
+                if img_path is None:
                     Log.warn('Label Path: {} not exists.'.format(label_path))
                     continue
 
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Semantic Segmentation dataset reading the packed shard files.
+
+
+import os
+
+from data.seg.datasets.default_dataset import DefaultDataset
+from lib.data.shard import ShardReader
+from lib.tools.helper.image_helper import ImageHelper
+
+
+class ShardDataset(DefaultDataset):
+    """The DefaultDataset of the samples in the shards, only the reads differ.
+
+    The images are decoded at the reduced resolution of the scale hint, and the samples are cached by the
+    sample cache with the keys of their blobs. The resize cache, keyed by the image paths, does not apply
+    to the shards.
+    """
+    def __init__(self, root_dir, dataset=None, aug_transform=None,
+                 img_transform=None, label_transform=None, configer=None):
+        super(ShardDataset, self).__init__(root_dir, dataset=dataset, aug_transform=aug_transform,
+                                           img_transform=img_transform, label_transform=label_transform,
+                                           configer=configer)
+        self.resize_cache = None
+
+    def __len__(self):
+        return len(self.item_list)
+
+    def list_items(self, root_dir, dataset):
+        self.reader_list, self.item_list = self.__list_shards(root_dir, dataset)
+
+    def get_cache_key(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        record_id = self.item_list[index][1]
+        return self.read_key, reader.get_blob_key(record_id, 'image'), reader.get_blob_key(record_id, 'label')
+
+    def read_sample(self, index):
+        img, img_size = self.read_image(index)
+        return dict(img=img, img_size=img_size, labelmap=self.read_labelmap(index))
+
+    def read_image(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        record_id = self.item_list[index][1]
+        content = reader.get_blob(record_id, 'image')
+        img = ImageHelper.read_image_from_bytes(content,
+                                                tool=self.configer.get('data', 'image_tool'),
+                                                mode=self.configer.get('data', 'input_mode'), scale=self.scale_hint)
+        if self.scale_hint is None:
+            img_size = ImageHelper.get_size(img)
+        else:
+            img_size = ImageHelper.read_size_from_bytes(content)
+
+        return img, img_size
+
+    def read_labelmap(self, index):
+        reader = self.reader_list[self.item_list[index][0]]
+        record_id = self.item_list[index][1]
+        return ImageHelper.read_image_from_bytes(reader.get_blob(record_id, 'label'),
+                                                 tool=self.configer.get('data', 'image_tool'), mode='P')
+
+    def __list_shards(self, root_dir, dataset):
+        reader_list = [ShardReader(os.path.join(root_dir, dataset))]
+        if dataset == 'train' and self.configer.get('data', 'include_val'):
+            reader_list.append(ShardReader(os.path.join(root_dir, 'val')))
+
+        item_list = list()
+        for reader_id, reader in enumerate(reader_list):
+            item_list += [(reader_id, record_id) for record_id in range(len(reader))
+                          if reader.has_blob(record_id, 'image') and reader.has_blob(record_id, 'label')]
+
+        return reader_list, item_list
+
+
+if __name__ == "__main__":
+    # Test shard loader.
+    pass
@@ -6,7 +6,8 @@
 
 import os
 import argparse
-import shutil
+
+from lib.data.generator import ParallelGenerator
 
 
 IMAGE_DIR = 'image'
@@ -25,87 +26,45 @@ def str2bool(v):
         raise argparse.ArgumentTypeError('Unsupported value encountered.')
 
 
-class CityscapesSegGenerator(object):
+class CityscapesSegGenerator(ParallelGenerator):
 
     def __init__(self, args, image_dir=IMAGE_DIR, label_dir=LABEL_DIR):
+        super(CityscapesSegGenerator, self).__init__(args.save_dir, nproc=args.nproc,
+                                                     packed=args.packed, shard_size=args.shard_size)
         self.args = args
-        self.train_label_dir = os.path.join(self.args.save_dir, 'train', label_dir)
-        self.val_label_dir = os.path.join(self.args.save_dir, 'val', label_dir)
-        if not os.path.exists(self.train_label_dir):
-            os.makedirs(self.train_label_dir)
-
-        if not os.path.exists(self.val_label_dir):
-            os.makedirs(self.val_label_dir)
-
-        self.train_image_dir = os.path.join(self.args.save_dir, 'train', image_dir)
-        self.val_image_dir = os.path.join(self.args.save_dir, 'val', image_dir)
-        if not os.path.exists(self.train_image_dir):
-            os.makedirs(self.train_image_dir)
-
-        if not os.path.exists(self.val_image_dir):
-            os.makedirs(self.val_image_dir)
-
-    def generate_label(self):
-        if not self.args.coarse:
-            ori_train_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit/train')
-            ori_train_label_dir = os.path.join(self.args.ori_root_dir, 'gtFine/train')
-            ori_val_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit/val')
-            ori_val_label_dir = os.path.join(self.args.ori_root_dir, 'gtFine/val')
-
-            for image_file in self.__list_dir(ori_train_img_dir):
-                image_name = '_'.join(image_file.split('_')[:-1])
-                label_file = '{}_gtFine_labelIds.png'.format(image_name)
-                shotname, extension = os.path.splitext(image_file.split('/')[-1])
-                shutil.copy(os.path.join(ori_train_img_dir, image_file),
-                            os.path.join(self.train_image_dir, '{}{}'.format(shotname, extension)))
-                shutil.copy(os.path.join(ori_train_label_dir, label_file),
-                            os.path.join(self.train_label_dir, '{}.png'.format(shotname)))
-
-            for image_file in self.__list_dir(ori_val_img_dir):
-                image_name = '_'.join(image_file.split('_')[:-1])
-                label_file = '{}_gtFine_labelIds.png'.format(image_name)
-                shotname, extension = os.path.splitext(image_file.split('/')[-1])
-                shutil.copy(os.path.join(ori_val_img_dir, image_file),
-                            os.path.join(self.val_image_dir, '{}{}'.format(shotname, extension)))
-                shutil.copy(os.path.join(ori_val_label_dir, label_file),
-                            os.path.join(self.val_label_dir, '{}.png'.format(shotname)))
-
-        else:
-
-            ori_train_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit/train')
-            ori_train_label_dir = os.path.join(self.args.ori_root_dir, 'gtCoarse/train')
-            ori_train_extra_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit/train_extra')
-            ori_train_extra_label_dir = os.path.join(self.args.ori_root_dir, 'gtCoarse/train_extra')
-            ori_val_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit/val')
-            ori_val_label_dir = os.path.join(self.args.ori_root_dir, 'gtCoarse/val')
-
-            for image_file in self.__list_dir(ori_train_img_dir):
-                image_name = '_'.join(image_file.split('_')[:-1])
-                label_file = '{}_gtCoarse_labelIds.png'.format(image_name)
-                shotname, extension = os.path.splitext(image_file.split('/')[-1])
-                shutil.copy(os.path.join(ori_train_img_dir, image_file),
-                            os.path.join(self.train_image_dir, '{}{}'.format(shotname, extension)))
-                shutil.copy(os.path.join(ori_train_label_dir, label_file),
-                            os.path.join(self.train_label_dir, '{}.png'.format(shotname)))
-
-            for image_file in self.__list_dir(ori_train_extra_img_dir):
+        self.image_dir = image_dir
+        self.label_dir = label_dir
+
+    def get_splits(self):
+        return ['train', 'val']
+
+    def get_items(self, split):
+        label_type = 'gtCoarse' if self.args.coarse else 'gtFine'
+        sub_dir_list = [split]
+        if split == 'train' and self.args.coarse:
+            sub_dir_list.append('train_extra')
+
+        item_list = list()
+        for sub_dir in sub_dir_list:
+            ori_img_dir = os.path.join(self.args.ori_root_dir, 'leftImg8bit', sub_dir)
+            ori_label_dir = os.path.join(self.args.ori_root_dir, label_type, sub_dir)
+            for image_file in self.__list_dir(ori_img_dir):
                 image_name = '_'.join(image_file.split('_')[:-1])
-                label_file = '{}_gtCoarse_labelIds.png'.format(image_name)
-                shotname, extension = os.path.splitext(image_file.split('/')[-1])
-                shutil.copy(os.path.join(ori_train_extra_img_dir, image_file),
-                            os.path.join(self.train_image_dir, '{}{}'.format(shotname, extension)))
-                shutil.copy(os.path.join(ori_train_extra_label_dir, label_file),
-                            os.path.join(self.train_label_dir, '{}.png'.format(shotname)))
-
-            for image_file in self.__list_dir(ori_val_img_dir):
-                image_name = '_'.join(image_file.split('_')[:-1])
-                label_file = '{}_gtCoarse_labelIds.png'.format(image_name)
-                shotname, extension = os.path.splitext(image_file.split('/')[-1])
-                shutil.copy(os.path.join(ori_val_img_dir, image_file),
-                            os.path.join(self.val_image_dir, '{}{}'.format(shotname, extension)))
-                shutil.copy(os.path.join(ori_val_label_dir, label_file),
-                            os.path.join(self.val_label_dir, '{}.png'.format(shotname)))
+                label_file = '{}_{}_labelIds.png'.format(image_name, label_type)
+                shotname = os.path.splitext(image_file.split('/')[-1])[0]
+                item_list.append((shotname, (os.path.join(ori_img_dir, image_file),
+                                             os.path.join(ori_label_dir, label_file))))
+
+        return item_list
+
+    def process_item(self, split, shotname, item):
+        img_path, label_path = item
+        with open(img_path, 'rb') as img_stream, open(label_path, 'rb') as label_stream:
+            img_content, label_content = img_stream.read(), label_stream.read()
 
+        extension = os.path.splitext(img_path)[1]
+        return dict(files=dict(image=(os.path.join(self.image_dir, '{}{}'.format(shotname, extension)), img_content),
+                               label=(os.path.join(self.label_dir, '{}.png'.format(shotname)), label_content)))
 
     def __list_dir(self, dir_name):
         filename_list = list()
@@ -128,8 +87,14 @@ if __name__ == "__main__":
                         dest='save_dir', help='The directory to save the data.')
     parser.add_argument('--ori_root_dir', default=None, type=str,
                         dest='ori_root_dir', help='The directory of the cityscapes data.')
+    parser.add_argument('--nproc', default=8, type=int,
+                        dest='nproc', help='The number of the processes.')
+    parser.add_argument('--packed', type=str2bool, nargs='?', const=True, default=False,
+                        dest='packed', help='Whether to write the shard files instead of the image & label files.')
+    parser.add_argument('--shard_size', default=1024, type=int,
+                        dest='shard_size', help='The max size(MB) of one shard file.')
 
     args = parser.parse_args()
 
     cityscapes_seg_generator = CityscapesSegGenerator(args)
-    cityscapes_seg_generator.generate_label()
+    cityscapes_seg_generator.generate()
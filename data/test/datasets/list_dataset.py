@@ -7,6 +7,8 @@
 import os
 import torch.utils.data as data
 
+from lib.data.manifest import Manifest
+from lib.data.sample_cache import SampleCache
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.image_helper import ImageHelper
 from lib.tools.util.logger import Logger as Log
@@ -17,14 +19,18 @@ class ListDataset(data.Dataset):
     def __init__(self, root_dir=None, list_path=None, aug_transform=None, img_transform=None, configer=None):
         super(ListDataset, self).__init__()
         self.configer = configer
+        self.sample_cache = SampleCache(**self.configer.get('test.sample_cache', default=dict()))
         self.aug_transform=aug_transform
         self.img_transform = img_transform
         self.item_list = self.__read_list(root_dir, list_path)
+        # The config of the reads & the stamps of the images, for the keys of the sample cache.
+        self.read_key = (self.configer.get('data', 'image_tool'), self.configer.get('data', 'input_mode'))
+        self.stamp_list = None if not self.sample_cache.enabled else Manifest.get_stamps(
+            [item[0] for item in self.item_list], cache_dir=self.configer.get('data.manifest_dir', default=None))
 
     def __getitem__(self, index):
-        img = ImageHelper.read_image(self.item_list[index][0],
-                                     tool=self.configer.get('data', 'image_tool'),
-                                     mode=self.configer.get('data', 'input_mode'))
+        img = self.sample_cache.get(None if self.stamp_list is None else (self.read_key, self.stamp_list[index]),
+                                    lambda: self.read_sample(index))['img']
 
         ori_img_size = ImageHelper.get_size(img)
         if self.aug_transform is not None:
@@ -45,6 +51,11 @@ class ListDataset(data.Dataset):
             meta=DataContainer(meta, stack=False, cpu_only=True, return_dc=True, samples_per_gpu=True)
         )
 
+    def read_sample(self, index):
+        return dict(img=ImageHelper.read_image(self.item_list[index][0],
+                                               tool=self.configer.get('data', 'image_tool'),
+                                               mode=self.configer.get('data', 'input_mode')))
+
     def __len__(self):
 
         return len(self.item_list)
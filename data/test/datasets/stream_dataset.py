@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Streaming test dataset over a lazy directory walk or list file.
+
+
+import os
+import itertools
+import threading
+import multiprocessing
+import torch.utils.data as data
+
+from lib.parallel.data_container import DataContainer
+from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.util.logger import Logger as Log
+
+
+class StreamDataset(data.IterableDataset):
+    """Test images streamed without listing the whole test set up front.
+
+    The images are walked lazily in a fixed order (sorted inside every directory), or read line by
+    line from list_path. The config test.stream has:
+        offset (int): The stream index to start from, the index of every image is in its meta.
+        skip_exists (str): The output path relative to out_dir, formatted with the filename,
+            e.g. 'label/{}.png'. The images whose output exists are skipped.
+
+    With several dataloader workers, the directory is walked once by a thread of the first worker, and
+    every worker takes the next image from a shared queue.
+    """
+    def __init__(self, test_dir=None, list_path=None, root_dir=None, out_dir=None,
+                 aug_transform=None, img_transform=None, configer=None):
+        super(StreamDataset, self).__init__()
+        self.configer = configer
+        self.aug_transform = aug_transform
+        self.img_transform = img_transform
+        self.test_dir = test_dir
+        self.list_path = list_path
+        self.root_dir = root_dir
+        self.out_dir = out_dir
+        self.offset = self.configer.get('test.stream.offset', default=0)
+        self.skip_exists = self.configer.get('test.stream.skip_exists', default=None)
+        if self.test_dir is None and self.list_path is None:
+            Log.error('Stream dataset needs test_dir or list_path.')
+            exit(1)
+
+        # Created before the workers, which inherit it.
+        self.item_queue = multiprocessing.Queue(maxsize=1024)
+
+    def __iter__(self):
+        worker_info = data.get_worker_info()
+        if worker_info is None or worker_info.num_workers == 1:
+            item_iter = itertools.islice(enumerate(self._walk()), self.offset, None)
+        else:
+            item_iter = self._get_dealt(worker_info)
+
+        for index, (img_path, filename) in item_iter:
+            if self._exists(filename):
+                continue
+
+            yield self._get_item(index, img_path, filename)
+
+    def _get_dealt(self, worker_info):
+        if worker_info.id == 0:
+            threading.Thread(target=self._deal, args=(worker_info.num_workers,), daemon=True).start()
+
+        while True:
+            item = self.item_queue.get()
+            if item is None:
+                return
+
+            yield item
+
+    def _deal(self, num_workers):
+        try:
+            for item in itertools.islice(enumerate(self._walk()), self.offset, None):
+                self.item_queue.put(item)
+
+        finally:
+            # One end of the stream for every worker, also if the walk fails.
+            for _ in range(num_workers):
+                self.item_queue.put(None)
+
+    def _walk(self):
+        if self.list_path is not None:
+            root_dir = self.test_dir if self.root_dir is None else self.root_dir
+            with open(self.list_path, 'r') as f:
+                for line in f:
+                    if len(line.strip()) == 0:
+                        continue
+
+                    filename = line.strip().split()[0]
+                    yield os.path.join(root_dir, filename), '.'.join(filename.split('.')[:-1])
+
+            return
+
+        for dir_path, dir_names, file_names in os.walk(self.test_dir):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if not ImageHelper.is_img(file_name):
+                    continue
+
+                rel_path = os.path.relpath(os.path.join(dir_path, file_name), self.test_dir).replace(os.sep, '/')
+                yield os.path.join(dir_path, file_name), '.'.join(rel_path.split('.')[:-1])
+
+    def _exists(self, filename):
+        if self.skip_exists is None or self.out_dir is None:
+            return False
+
+        return os.path.exists(os.path.join(self.out_dir, self.skip_exists.format(filename)))
+
+    def _get_item(self, index, img_path, filename):
+        img = ImageHelper.read_image(img_path,
+                                     tool=self.configer.get('data', 'image_tool'),
+                                     mode=self.configer.get('data', 'input_mode'))
+
+        ori_img_size = ImageHelper.get_size(img)
+        if self.aug_transform is not None:
+            img = self.aug_transform(img)
+
+        border_size = ImageHelper.get_size(img)
+        if self.img_transform is not None:
+            img = self.img_transform(img)
+
+        meta = dict(
+            ori_img_size=ori_img_size,
+            border_wh=border_size,
+            img_path=img_path,
+            filename=filename,
+            index=index
+        )
+        return dict(
+            img=DataContainer(img, stack=True, return_dc=True, samples_per_gpu=True),
+            meta=DataContainer(meta, stack=False, cpu_only=True, return_dc=True, samples_per_gpu=True)
+        )
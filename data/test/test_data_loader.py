@@ -9,12 +9,14 @@ from torch.utils import data
 import lib.data.pil_aug_transforms as pil_aug_trans
 import lib.data.cv2_aug_transforms as cv2_aug_trans
 from lib.data.collate import collate
+from lib.data.prefetch_loader import PrefetchLoader
 from lib.data.transforms import ToTensor, Normalize, Compose
 from lib.tools.util.logger import Logger as Log
 from data.test.datasets.default_dataset import DefaultDataset
 from data.test.datasets.facegan_dataset import FaceGANDataset
 from data.test.datasets.list_dataset import ListDataset
 from data.test.datasets.json_dataset import JsonDataset
+from data.test.datasets.stream_dataset import StreamDataset
 
 
 class TestDataLoader(object):
@@ -34,7 +36,7 @@ class TestDataLoader(object):
             ToTensor(),
             Normalize(**self.configer.get('data', 'normalize')), ])
 
-    def get_testloader(self, test_dir=None, list_path=None, json_path=None):
+    def get_testloader(self, test_dir=None, list_path=None, json_path=None, out_dir=None):
         if self.configer.get('test.dataset', default=None) in [None, 'default']:
             test_dir = test_dir if test_dir is not None else self.configer.get('test', 'test_dir')
             dataset = DefaultDataset(test_dir=test_dir,
@@ -58,6 +60,16 @@ class TestDataLoader(object):
                                   img_transform=self.img_transform,
                                   configer=self.configer)
 
+        elif self.configer.get('test.dataset') == 'stream':
+            test_dir = test_dir if test_dir is not None else self.configer.get('test.test_dir', default=None)
+            list_path = list_path if list_path is not None else self.configer.get('test.list_path', default=None)
+            dataset = StreamDataset(test_dir=test_dir, list_path=list_path,
+                                    root_dir=self.configer.get('test.root_dir', default=None),
+                                    out_dir=out_dir,
+                                    aug_transform=self.aug_test_transform,
+                                    img_transform=self.img_transform,
+                                    configer=self.configer)
+
         elif self.configer.get('test.dataset') == 'facegan':
             json_path = json_path if json_path is not None else self.configer.get('test', 'json_path')
             dataset = FaceGANDataset(root_dir=self.configer.get('test', 'root_dir'),
@@ -73,12 +85,13 @@ class TestDataLoader(object):
         testloader = data.DataLoader(
             dataset,
             batch_size=self.configer.get('test.batch_size', default=torch.cuda.device_count()), shuffle=False,
-            num_workers=self.configer.get('data', 'workers'), pin_memory=True,
+            pin_memory=True,
             collate_fn=lambda *args: collate(
                 *args, trans_dict=self.configer.get('test', 'data_transformer')
-            )
+            ),
+            **PrefetchLoader.get_worker_args(self.configer)
         )
 
-        return testloader
+        return PrefetchLoader.wrap(testloader, self.configer)
 
 
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Columnar binary store of the object annotations, replacing the json file of every image.
+
+
+import os
+import json
+import numpy as np
+
+from lib.data.manifest import Manifest
+from lib.tools.helper.json_helper import JsonHelper
+from lib.tools.util.logger import Logger as Log
+
+
+ANNO_DIR = 'anno'
+INDEX_FILE = 'index.json'
+JSON_DIR = 'json'
+
+
+class AnnoStore(object):
+    """The object annotations of a split, concatenated into flat arrays with the offsets of every sample.
+
+    The arrays are saved as .npy files under split_dir/anno, and memory-mapped lazily like ShardReader:
+        obj_offsets (N + 1): The objects of sample i are [obj_offsets[i], obj_offsets[i + 1]).
+        labels (M), difficult (M), bboxes (M x 4), has_bbox (M): The fields of every object.
+        kpts (M x K x 3): The keypoints of every object, saved if the objects have keypoints.
+        poly_offsets (M + 1), coord_offsets (P + 1), coords (C): The polygons of object j are
+            [poly_offsets[j], poly_offsets[j + 1]), and the coords of polygon k are
+            coords[coord_offsets[k]:coord_offsets[k + 1]], saved if the objects have segm.
+
+    So the objects of a sample are one contiguous slice of every array, read without any json parsing.
+    The store is built by the generators with --anno_store, from the same metas as the json files.
+    """
+    def __init__(self, store_dir):
+        index_path = os.path.join(store_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            Log.error('Anno Store Index: {} not exists.'.format(index_path))
+            exit(1)
+
+        with open(index_path, 'r') as read_stream:
+            index_dict = json.load(read_stream)
+
+        self.store_dir = store_dir
+        # The index is written last by build, so its mtime stamps the whole store.
+        self.stamp = os.stat(index_path).st_mtime_ns
+        self.names = index_dict['names']
+        self.fields = index_dict['fields']
+        self.array_dict = dict()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['array_dict'] = dict()
+        return state
+
+    def _get_array(self, key):
+        if key not in self.array_dict:
+            self.array_dict[key] = np.load(os.path.join(self.store_dir, '{}.npy'.format(key)), mmap_mode='r')
+
+        return self.array_dict[key]
+
+    def get_objects(self, index):
+        obj_offsets = self._get_array('obj_offsets')
+        start, end = int(obj_offsets[index]), int(obj_offsets[index + 1])
+        # The slices are copied, as the transforms modify the arrays in place.
+        objects = dict(
+            labels=np.array(self._get_array('labels')[start:end]),
+            difficult=np.array(self._get_array('difficult')[start:end]),
+            bboxes=np.array(self._get_array('bboxes')[start:end]),
+            has_bbox=np.array(self._get_array('has_bbox')[start:end]),
+            kpts=np.array(self._get_array('kpts')[start:end]) if 'kpts' in self.fields else None,
+            polygons=None
+        )
+        if 'polygons' in self.fields:
+            poly_offsets = np.array(self._get_array('poly_offsets')[start:end + 1])
+            coord_offsets = np.array(self._get_array('coord_offsets')[poly_offsets[0]:poly_offsets[-1] + 1])
+            coords = np.array(self._get_array('coords')[coord_offsets[0]:coord_offsets[-1]])
+            coord_offsets -= coord_offsets[0]
+            poly_offsets -= poly_offsets[0]
+            objects['polygons'] = [[coords[coord_offsets[k]:coord_offsets[k + 1]]
+                                    for k in range(poly_offsets[j], poly_offsets[j + 1])]
+                                   for j in range(end - start)]
+
+        return objects
+
+    @staticmethod
+    def parse_objects(object_list):
+        """Convert the objects of a json file to the arrays of AnnoStore.get_objects."""
+        # The RLE segm (e.g. the crowd objects of coco) is not supported by the transforms of the polygons.
+        rle_count = sum(1 for object in object_list if isinstance(object.get('segm', None), dict))
+        if rle_count > 0:
+            Log.warn('Skip {} objects with the RLE segm, only the polygons are supported.'.format(rle_count))
+            object_list = [object for object in object_list if not isinstance(object.get('segm', None), dict)]
+
+        kpt_list = [object.get('keypoints', object.get('kpts', None)) for object in object_list]
+        if any(kpts is None for kpts in kpt_list) and any(kpts is not None for kpts in kpt_list):
+            Log.error('Some objects have no keypoints.')
+            exit(1)
+
+        for object in object_list:
+            if 'segm' in object and not isinstance(object['segm'], list):
+                Log.error('Only the polygons are supported, but got segm: {}.'.format(type(object['segm'])))
+                exit(1)
+
+        return dict(
+            labels=np.array([object.get('label', -1) for object in object_list], dtype=np.int64),
+            difficult=np.array([bool(object.get('difficult', False)) for object in object_list], dtype=np.bool_),
+            bboxes=np.array([object.get('bbox', [0, 0, 0, 0]) for object in object_list],
+                            dtype=np.float32).reshape(-1, 4),
+            has_bbox=np.array(['bbox' in object for object in object_list], dtype=np.bool_),
+            kpts=np.array(kpt_list, dtype=np.float32).reshape(len(kpt_list), -1, 3)
+            if len(kpt_list) > 0 and kpt_list[0] is not None else None,
+            polygons=[[np.array(polygon, dtype=np.float32) for polygon in object['segm']] for object in object_list]
+            if any('segm' in object for object in object_list) else None
+        )
+
+    @staticmethod
+    def read_objects(anno):
+        """Read the objects of a sample listed by list_annos, from the store or the json file."""
+        if isinstance(anno, tuple):
+            anno_store, index = anno
+            return anno_store.get_objects(index)
+
+        return AnnoStore.parse_objects(JsonHelper.load_file(anno)['objects'])
+
+    @staticmethod
+    def get_stamps(anno_list, cache_dir=None):
+        """Return the stamps of the annos listed by list_annos, e.g. for the keys of SampleCache."""
+        if len(anno_list) == 0 or not isinstance(anno_list[0], tuple):
+            return Manifest.get_stamps(anno_list, cache_dir=cache_dir)
+
+        return [(anno_store.store_dir, anno_store.stamp, index) for anno_store, index in anno_list]
+
+    @staticmethod
+    def list_annos(split_dir, use_store=False, cache_dir=None):
+        """Return the (image name, anno) of a split, the anno is (store, index) with use_store, else the json path."""
+        if use_store:
+            anno_store = AnnoStore(os.path.join(split_dir, ANNO_DIR))
+            return [(name, (anno_store, i)) for i, name in enumerate(anno_store.names)]
+
+        json_dir = os.path.join(split_dir, JSON_DIR)
+        return [('.'.join(file_name.split('.')[:-1]), os.path.join(json_dir, file_name))
+                for file_name in Manifest.get(json_dir, cache_dir=cache_dir).list_files()]
+
+    @staticmethod
+    def build(store_dir, record_list):
+        """Write the store of the dict(name, meta) of the generators, the meta with the objects like the json file."""
+        name_list = list()
+        column_dict = dict(obj_counts=list(), labels=list(), difficult=list(), bboxes=list(), has_bbox=list(),
+                           kpts=list(), poly_counts=list(), coord_counts=list(), coords=list())
+        for record in record_list:
+            if record['meta'] is None:
+                continue
+
+            objects = AnnoStore.parse_objects(record['meta'].get('objects', list()))
+            name_list.append(record['name'])
+            num_objects = len(objects['labels'])
+            column_dict['obj_counts'].append(num_objects)
+            for key in ['labels', 'difficult', 'bboxes', 'has_bbox']:
+                column_dict[key].append(objects[key])
+
+            if objects['kpts'] is not None:
+                column_dict['kpts'].append(objects['kpts'])
+
+            for polygons in (objects['polygons'] or [[] for _ in range(num_objects)]):
+                column_dict['poly_counts'].append(len(polygons))
+                column_dict['coord_counts'].extend([len(polygon) for polygon in polygons])
+                column_dict['coords'].extend(polygons)
+
+        if len(column_dict['kpts']) > 0 and sum(len(kpts) for kpts in column_dict['kpts']) != sum(
+                column_dict['obj_counts']):
+            Log.error('Some objects have no keypoints.')
+            exit(1)
+
+        def offsets(counts):
+            return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+
+        def concat(array_list, dtype, shape):
+            return np.concatenate(array_list).astype(dtype) if len(array_list) > 0 else np.zeros(shape, dtype=dtype)
+
+        array_dict = dict(
+            obj_offsets=offsets(column_dict['obj_counts']),
+            labels=concat(column_dict['labels'], np.int64, (0,)),
+            difficult=concat(column_dict['difficult'], np.bool_, (0,)),
+            bboxes=concat(column_dict['bboxes'], np.float32, (0, 4)),
+            has_bbox=concat(column_dict['has_bbox'], np.bool_, (0,))
+        )
+        field_list = list()
+        if len(column_dict['kpts']) > 0:
+            field_list.append('kpts')
+            array_dict['kpts'] = concat(column_dict['kpts'], np.float32, (0, 0, 3))
+
+        if len(column_dict['coords']) > 0:
+            field_list.append('polygons')
+            array_dict['poly_offsets'] = offsets(column_dict['poly_counts'])
+            array_dict['coord_offsets'] = offsets(column_dict['coord_counts'])
+            array_dict['coords'] = concat(column_dict['coords'], np.float32, (0,))
+
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+
+        # The index is written last, so an interrupted build is never read.
+        if os.path.exists(os.path.join(store_dir, INDEX_FILE)):
+            os.remove(os.path.join(store_dir, INDEX_FILE))
+
+        for key, array in array_dict.items():
+            np.save(os.path.join(store_dir, '{}.npy'.format(key)), array)
+
+        JsonHelper.save_file(dict(names=name_list, fields=field_list), os.path.join(store_dir, INDEX_FILE))
+        Log.info('Stored the annotations of {} samples, {} objects in {}.'.format(
+            len(name_list), len(array_dict['labels']), store_dir))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Batch Augmentations implemented by torch ops, running on the collated batch instead of every sample.
+
+
+import math
+import torch
+import torch.nn.functional as F
+
+from lib.parallel.data_container import DataContainer
+from lib.tools.util.logger import Logger as Log
+
+
+def get_border(border, img):
+    """Return the (N, 4) regions [x0, y0, x1, y1) of the samples in the batch, the whole batch if None."""
+    if border is None:
+        return torch.LongTensor([[0, 0, img.size(3), img.size(2)]]).repeat(img.size(0), 1)
+
+    return border
+
+
+def get_border_mask(border, img):
+    """Return the (N, 1, H, W) bool mask of the regions of the samples, out of which are the pads."""
+    border = get_border(border, img).to(img.device).view(-1, 4, 1, 1)
+    xs = torch.arange(img.size(3), device=img.device).view(1, 1, 1, -1)
+    ys = torch.arange(img.size(2), device=img.device).view(1, 1, -1, 1)
+    return (xs >= border[:, 0:1]) & (xs < border[:, 2:3]) & (ys >= border[:, 1:2]) & (ys < border[:, 3:4])
+
+
+class RandomBrightness(object):
+    def __init__(self, shift_value=30, ratio=0.5):
+        self.shift_value = shift_value
+        self.ratio = ratio
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = (torch.rand(img.size(0)) <= self.ratio).float()
+        shift = torch.randint(-self.shift_value, self.shift_value + 1, (img.size(0),)).float() * apply_mask
+        img = (img + shift.view(-1, 1, 1, 1).to(img.device)).round().clamp(0, 255)
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+class RandomContrast(object):
+    def __init__(self, lower=0.5, upper=1.5, ratio=0.5):
+        self.lower = lower
+        self.upper = upper
+        self.ratio = ratio
+        assert self.upper >= self.lower, "contrast upper must be >= lower."
+        assert self.lower >= 0, "contrast lower must be non-negative."
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = torch.rand(img.size(0)) <= self.ratio
+        factor = torch.empty(img.size(0)).uniform_(self.lower, self.upper)
+        factor = torch.where(apply_mask, factor, torch.ones_like(factor))
+        img = (img * factor.view(-1, 1, 1, 1).to(img.device)).clamp(0, 255).floor()
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+class RandomSaturation(object):
+    """Scale the S channel of HSV, which keeps V (the max channel) and moves the others linearly."""
+    def __init__(self, lower=0.5, upper=1.5, ratio=0.5):
+        self.lower = lower
+        self.upper = upper
+        self.ratio = ratio
+        assert self.upper >= self.lower, "saturation upper must be >= lower."
+        assert self.lower >= 0, "saturation lower must be non-negative."
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = torch.rand(img.size(0)) <= self.ratio
+        factor = torch.empty(img.size(0)).uniform_(self.lower, self.upper)
+        factor = torch.where(apply_mask, factor, torch.ones_like(factor)).view(-1, 1, 1, 1).to(img.device)
+        max_val = img.max(dim=1, keepdim=True)[0]
+        img = (max_val - factor * (max_val - img)).clamp(0, 255).floor()
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+class RandomHue(object):
+    def __init__(self, delta=18, ratio=0.5, channel_order='BGR'):
+        assert 0 <= delta <= 360
+        self.delta = delta
+        self.ratio = ratio
+        self.channel_order = channel_order
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = (torch.rand(img.size(0)) <= self.ratio).float()
+        shift = torch.empty(img.size(0)).uniform_(-self.delta, self.delta) * apply_mask
+        rgb = img if self.channel_order == 'RGB' else img.flip(1)
+        max_val, max_idx = rgb.max(dim=1)
+        delta = max_val - rgb.min(dim=1)[0]
+        safe_delta = delta.clamp(min=1e-6)
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        hue = torch.where(max_idx == 0, ((g - b) / safe_delta) % 6,
+                          torch.where(max_idx == 1, (b - r) / safe_delta + 2, (r - g) / safe_delta + 4))
+        hue = (hue * 60 + shift.view(-1, 1, 1).to(img.device)) % 360
+        rgb = torch.stack([max_val - delta * torch.min((n + hue / 60) % 6, 4 - (n + hue / 60) % 6).clamp(0, 1)
+                           for n in (5, 3, 1)], dim=1)
+        img = rgb if self.channel_order == 'RGB' else rgb.flip(1)
+        return img.clamp(0, 255).floor(), labelmap, maskmap, kpts, bboxes
+
+
+class RandomPerm(object):
+    def __init__(self, ratio=0.5):
+        self.ratio = ratio
+        self.perms = torch.LongTensor([(0, 1, 2), (0, 2, 1),
+                                       (1, 0, 2), (1, 2, 0),
+                                       (2, 0, 1), (2, 1, 0)])
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = torch.rand(img.size(0)) <= self.ratio
+        perm_index = torch.randint(0, len(self.perms), (img.size(0),)) * apply_mask.long()
+        swap = self.perms[perm_index].view(-1, 3, 1, 1).to(img.device)
+        img = img.gather(1, swap.expand_as(img))
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+class RandomHFlip(object):
+    """Flip every sample inside its own region of the batch, the pads are kept."""
+    def __init__(self, swap_pair=None, ratio=0.5):
+        self.swap_pair = swap_pair
+        self.ratio = ratio
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        apply_mask = torch.rand(img.size(0)) <= self.ratio
+        index = apply_mask.nonzero()[:, 0]
+        if index.numel() == 0:
+            return img, labelmap, maskmap, kpts, bboxes
+
+        border = get_border(border, img)
+        # Every column in the region of a flipped sample reads its mirror in the region.
+        cols = torch.arange(img.size(3)).view(1, -1).expand(img.size(0), -1)
+        inside = apply_mask.view(-1, 1) & (cols >= border[:, 0:1]) & (cols < border[:, 2:3])
+        col_index = torch.where(inside, border[:, 0:1] + border[:, 2:3] - 1 - cols, cols).to(img.device)
+
+        def flip(data):
+            size = (data.size(0),) + (1,) * (data.dim() - 2) + (data.size(-1),)
+            return data.gather(-1, col_index.view(size).expand_as(data))
+
+        img = flip(img)
+        if labelmap is not None:
+            labelmap = flip(labelmap)
+            if self.swap_pair is not None:
+                flipped = labelmap[index]
+                for pair in self.swap_pair:
+                    a_mask = (flipped == pair[0])
+                    flipped[flipped == pair[1]] = pair[0]
+                    flipped[a_mask] = pair[1]
+
+                labelmap[index] = flipped
+
+        if maskmap is not None:
+            maskmap = flip(maskmap)
+
+        for i in index.tolist():
+            mirror = (border[i, 0] + border[i, 2] - 1).item()
+            if kpts is not None and kpts[i].numel() > 0:
+                kpts[i][:, :, 0] = mirror - kpts[i][:, :, 0]
+                for pair in ([] if self.swap_pair is None else self.swap_pair):
+                    temp_point = kpts[i][:, pair[0] - 1].clone()
+                    kpts[i][:, pair[0] - 1] = kpts[i][:, pair[1] - 1]
+                    kpts[i][:, pair[1] - 1] = temp_point
+
+            if bboxes is not None and bboxes[i].numel() > 0:
+                xmin = mirror - bboxes[i][:, 2]
+                xmax = mirror - bboxes[i][:, 0]
+                bboxes[i][:, 0] = xmin
+                bboxes[i][:, 2] = xmax
+
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+class RandomRotate(object):
+    """Rotate every sample around the center of its own region of the batch, the region size is kept.
+
+    mean is the border value, in the channel order of the input tensor. The pads out of the region are
+    read as the border, and kept in the output.
+    """
+    def __init__(self, max_degree, ratio=0.5, mean=(104, 117, 123)):
+        assert isinstance(max_degree, int)
+        self.max_degree = max_degree
+        self.ratio = ratio
+        self.mean = mean
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, border=None):
+        batch_size, _, height, width = img.size()
+        apply_mask = (torch.rand(batch_size) <= self.ratio).float()
+        if apply_mask.sum() == 0:
+            return img, labelmap, maskmap, kpts, bboxes
+
+        radian = torch.empty(batch_size).uniform_(-self.max_degree, self.max_degree) * apply_mask * math.pi / 180
+        cos_val, sin_val = torch.cos(radian), torch.sin(radian)
+        inside = get_border_mask(border, img)
+        border = get_border(border, img).float()
+        center_x, center_y = (border[:, 0] + border[:, 2]) / 2.0, (border[:, 1] + border[:, 3]) / 2.0
+        # The same matrix as cv2.getRotationMatrix2D, which maps the input points to the output.
+        rotate_mat = torch.zeros(batch_size, 3, 3)
+        rotate_mat[:, 0, 0], rotate_mat[:, 0, 1] = cos_val, sin_val
+        rotate_mat[:, 1, 0], rotate_mat[:, 1, 1] = -sin_val, cos_val
+        rotate_mat[:, 0, 2] = (1 - cos_val) * center_x - sin_val * center_y
+        rotate_mat[:, 1, 2] = sin_val * center_x + (1 - cos_val) * center_y
+        rotate_mat[:, 2, 2] = 1
+        norm_mat = torch.Tensor([[2.0 / (width - 1), 0, -1], [0, 2.0 / (height - 1), -1], [0, 0, 1]])
+        theta = norm_mat.matmul(torch.inverse(rotate_mat)).matmul(torch.inverse(norm_mat))[:, :2].to(img.device)
+        grid = F.affine_grid(theta, img.size(), align_corners=True)
+
+        fill = torch.Tensor(self.mean).view(1, -1, 1, 1).to(img.device)
+        rotated = F.grid_sample((img - fill) * inside, grid, mode='bilinear', align_corners=True) + fill
+        img = torch.where(inside, rotated, img)
+        if labelmap is not None:
+            rotated = F.grid_sample(((labelmap + 1).unsqueeze(1) * inside).float(), grid,
+                                    mode='nearest', align_corners=True).long() - 1
+            labelmap = torch.where(inside, rotated, labelmap.unsqueeze(1)).squeeze(1)
+
+        if maskmap is not None:
+            maskmap_dim = maskmap.dim()
+            maskmap = maskmap.unsqueeze(1).float() if maskmap_dim == 3 else maskmap.float()
+            rotated = F.grid_sample((maskmap - 1) * inside, grid, mode='nearest', align_corners=True) + 1
+            maskmap = torch.where(inside, rotated, maskmap)
+            maskmap = maskmap.squeeze(1) if maskmap_dim == 3 else maskmap
+
+        for i in apply_mask.nonzero()[:, 0].tolist():
+            if kpts is not None and kpts[i].numel() > 0:
+                kpts[i][:, :, :2] = kpts[i][:, :, :2].matmul(rotate_mat[i, :2, :2].t()) + rotate_mat[i, :2, 2]
+
+            if bboxes is not None and bboxes[i].numel() > 0:
+                corners = bboxes[i][:, [0, 1, 2, 1, 0, 3, 2, 3]].view(-1, 4, 2)
+                corners = corners.matmul(rotate_mat[i, :2, :2].t()) + rotate_mat[i, :2, 2]
+                bboxes[i][:, :2] = corners.min(dim=1)[0]
+                bboxes[i][:, 2:] = corners.max(dim=1)[0]
+                # The region size is kept, so the corners out of it are clipped.
+                bboxes[i][:, 0::2] = bboxes[i][:, 0::2].clamp(border[i, 0].item(), border[i, 2].item() - 1)
+                bboxes[i][:, 1::2] = bboxes[i][:, 1::2].clamp(border[i, 1].item(), border[i, 3].item() - 1)
+
+        return img, labelmap, maskmap, kpts, bboxes
+
+
+GEOMETRIC_AUGMENTATIONS = (RandomHFlip, RandomRotate)
+
+
+BATCH_AUGMENTATIONS_DICT = {
+    'random_saturation': RandomSaturation,
+    'random_hue': RandomHue,
+    'random_perm': RandomPerm,
+    'random_contrast': RandomContrast,
+    'random_brightness': RandomBrightness,
+    'random_hflip': RandomHFlip,
+    'random_rotate': RandomRotate
+}
+
+
+class BatchAugCompose(object):
+    """Run the transforms in aug_trans.batch_trans_seq on the collated batch.
+
+    The transforms take the same config keys as the per-sample ones, and run with vectorized torch
+    ops on the whole (normalized) img tensor. The img is mapped back to pixel values first, so the
+    transforms behave as their cv2 counterparts. The geometric transforms also update labelmap,
+    maskmap, kpts & bboxes, but not targets built inside the datasets (such as heatmaps).
+
+    Every sample is transformed inside its own region of the batch, border_xy & border_wh of its meta
+    (the whole batch without them), and the pads of img out of the regions are kept.
+
+    The compose runs on the batches moved to the device of the step, by PrefetchLoader (see wrap), so the
+    transforms run on the gpu instead of the cpu of the collate. The stacked img, labelmap & maskmap are moved
+    to the device, the kpts & bboxes of the samples stay on the cpu. With geometric False, e.g. for the tasks
+    whose targets are built inside the datasets (heatmaps, polygons), only the photometric transforms are
+    allowed.
+
+    Example:
+        "aug_trans": {
+            "trans_seq": ["random_resize", "random_crop"],
+            "batch_trans_seq": ["random_brightness", "random_hflip"],
+            ...
+        }
+    """
+    def __init__(self, configer, split='train', geometric=True):
+        self.configer = configer
+        self.split = split
+        self.trans_dict = self.configer.get(split, 'aug_trans')
+        self.trans_seq = self.trans_dict['batch_trans_seq'] if 'batch_trans_seq' in self.trans_dict else list()
+        self.transforms = dict()
+        for trans in self.trans_seq:
+            if 'func' in self.trans_dict[trans]:
+                trans_func, trans_params = self.trans_dict[trans]['func'], dict(self.trans_dict[trans]['params'])
+            else:
+                trans_func, trans_params = trans, dict(self.trans_dict[trans])
+
+            if trans_func == 'random_hue':
+                trans_params['channel_order'] = 'RGB' if self.configer.get('data', 'input_mode') == 'RGB' else 'BGR'
+
+            self.transforms[trans] = BATCH_AUGMENTATIONS_DICT[trans_func](**trans_params)
+            if not geometric and isinstance(self.transforms[trans], GEOMETRIC_AUGMENTATIONS):
+                Log.error('Geometric batch transform {} is not supported by the targets of the dataset.'.format(trans))
+                exit(1)
+
+        normalize = self.configer.get('data', 'normalize')
+        self.div_value = normalize['div_value']
+        self.mean = torch.Tensor(normalize['mean']).view(1, -1, 1, 1)
+        self.std = torch.Tensor(normalize['std']).view(1, -1, 1, 1)
+
+    @property
+    def enabled(self):
+        return len(self.trans_seq) > 0
+
+    @staticmethod
+    def get_chunks(value):
+        return value.data if isinstance(value, DataContainer) else [value]
+
+    @staticmethod
+    def get_meta_border(meta_list, img):
+        border_list = list()
+        for meta in meta_list:
+            x, y = meta.get('border_xy', [0, 0])
+            w, h = meta.get('border_wh', [img.size(3), img.size(2)])
+            border_list.append([x, y, x + w, y + h])
+
+        return torch.LongTensor(border_list)
+
+    @staticmethod
+    def set_chunk(data_dict, key, chunk_id, chunk):
+        if isinstance(data_dict[key], DataContainer):
+            data_dict[key].data[chunk_id] = chunk
+        else:
+            data_dict[key] = chunk
+
+    def __call__(self, data_dict, device=None):
+        if len(self.trans_seq) == 0:
+            return data_dict
+
+        if device is not None:
+            for key in ['img', 'labelmap', 'maskmap']:
+                if key in data_dict:
+                    for chunk_id, chunk in enumerate(self.get_chunks(data_dict[key])):
+                        self.set_chunk(data_dict, key, chunk_id, chunk.to(device, non_blocking=True))
+
+        keys = [key for key in ['labelmap', 'maskmap', 'kpts', 'bboxes'] if key in data_dict]
+        chunk_dict = {key: self.get_chunks(data_dict[key]) for key in ['img'] + keys}
+        meta_chunks = self.get_chunks(data_dict['meta']) if 'meta' in data_dict else None
+        for chunk_id in range(len(chunk_dict['img'])):
+            ori_img = img = chunk_dict['img'][chunk_id]
+            border = None if meta_chunks is None else self.get_meta_border(meta_chunks[chunk_id], img)
+            mean, std = self.mean.to(img.device), self.std.to(img.device)
+            img = (img * std + mean) * self.div_value
+            targets = [chunk_dict[key][chunk_id] if key in chunk_dict else None
+                       for key in ['labelmap', 'maskmap', 'kpts', 'bboxes']]
+            for trans_key in self.trans_seq:
+                img, *targets = self.transforms[trans_key](img, *targets, border=border)
+
+            img = torch.where(get_border_mask(border, img), (img / self.div_value - mean) / std, ori_img)
+            self.set_chunk(data_dict, 'img', chunk_id, img)
+            for key, target in zip(['labelmap', 'maskmap', 'kpts', 'bboxes'], targets):
+                if key in chunk_dict:
+                    self.set_chunk(data_dict, key, chunk_id, target)
+
+        return data_dict
@@ -9,13 +9,16 @@ import collections
 import torch
 import torch.nn.functional as F
 from torch.utils.data.dataloader import default_collate
-from torch._six import string_classes, int_classes
 
 from lib.parallel.data_container import DataContainer
 from lib.tools.helper.tensor_helper import TensorHelper
 from lib.tools.util.logger import Logger as Log
 
 
+# The classes of torch._six, which is removed since torch 2.0.
+string_classes, int_classes = (str, bytes), int
+
+
 def stack(batch, data_key=None, device_ids=None):
     if isinstance(batch[0][data_key], DataContainer):
         if batch[0][data_key].stack:
@@ -60,12 +63,86 @@ def stack(batch, data_key=None, device_ids=None):
         return default_collate([sample[data_key] for sample in batch])
 
 
+# The padding value of every map, which is written into the preallocated batch tensor.
+MAP_PAD_DICT = dict(img=0, labelmap=-1, maskmap=1)
+MAP_RESIZE_DICT = dict(img=dict(mode='bilinear', align_corners=True), labelmap=dict(mode='nearest'),
+                       maskmap=dict(mode='nearest'))
+
+
+def new_batch(sample, batch_size, target_hw, value):
+    size = (batch_size,) + tuple(sample.size()[:-2]) + tuple(target_hw)
+    if torch.utils.data.get_worker_info() is not None:
+        # Same as default_collate, write into shared memory to avoid a copy when sent to the main process.
+        # Unlike the ndarrays of SharedArrayPool, it is not reused: the views of a tensor in the main process
+        # do not keep the tensor alive, so the release of its storage is not known.
+        return sample.new_empty(size).share_memory_().fill_(value)
+
+    return sample.new_full(size, value)
+
+
+def stack_chunks(batch, data_key, chunk_list, device_ids=None):
+    if batch[0][data_key].samples_per_gpu and len(device_ids) > 1:
+        samples_per_gpu = (len(batch) - 1 + len(device_ids)) // len(device_ids)
+        stacked = [item for chunk in chunk_list for item in chunk.split(samples_per_gpu)]
+    else:
+        stacked = chunk_list[0] if len(chunk_list) == 1 else torch.cat(chunk_list, 0)
+
+    if batch[0][data_key].return_dc and len(device_ids) > 1:
+        return DataContainer(stacked, stack=batch[0][data_key].stack,
+                             samples_per_gpu=batch[0][data_key].samples_per_gpu,
+                             cpu_only=batch[0][data_key].cpu_only)
+    else:
+        return stacked
+
+
+def affine_coords(sample, data_keys, w_scale_ratio, h_scale_ratio, left_pad, up_pad):
+    if 'kpts' in data_keys and sample['kpts'].numel() > 0:
+        sample['kpts'].data[:, :, 0].mul_(w_scale_ratio).add_(left_pad)
+        sample['kpts'].data[:, :, 1].mul_(h_scale_ratio).add_(up_pad)
+
+    if 'bboxes' in data_keys and sample['bboxes'].numel() > 0:
+        sample['bboxes'].data[:, 0::2].mul_(w_scale_ratio).add_(left_pad)
+        sample['bboxes'].data[:, 1::2].mul_(h_scale_ratio).add_(up_pad)
+
+    if 'polygons' in data_keys:
+        for object_polygons in sample['polygons'].data:
+            for polygon in object_polygons:
+                polygon[0::2] *= w_scale_ratio
+                polygon[0::2] += left_pad
+                polygon[1::2] *= h_scale_ratio
+                polygon[1::2] += up_pad
+
+
+def share_samples(batch, data_keys):
+    # Called after the transforms of the coordinates in place, as the shared arrays are not ndarrays until sent.
+    share_keys = [key for key in data_keys if isinstance(batch[0][key], DataContainer) and not batch[0][key].stack]
+    if torch.utils.data.get_worker_info() is not None:
+        # The metas (e.g. ori_target) are sent to the main process through the reused shared buffers.
+        for sample in batch:
+            for key in share_keys:
+                sample[key].share_memory_()
+
+
 def collate(batch, trans_dict, device_ids=None):
+    """Collate the samples, and align the maps to the target size of every gpu.
+
+    The batch tensors of img, labelmap & maskmap are allocated once per gpu with the padding value,
+    every sample is copied (or resized) into its slice directly, and the coordinates are scaled & shifted
+    in one pass. In a dataloader worker, the large ndarrays of the unstacked fields are moved to the
+    shared memory, and only the small metadata is pickled.
+    """
     device_ids = list(range(torch.cuda.device_count())) if device_ids is None else device_ids
     data_keys = batch[0].keys()
     if trans_dict['size_mode'] == 'none':
+        share_samples(batch, data_keys)
         return dict({key: stack(batch, data_key=key, device_ids=device_ids) for key in data_keys})
 
+    map_keys = [key for key in MAP_PAD_DICT if key in data_keys and isinstance(batch[0][key], DataContainer)
+                and batch[0][key].stack and isinstance(batch[0][key].data, torch.Tensor)
+                and batch[0][key].size()[-2:] == batch[0]['img'].size()[-2:]]
+    # The maps not aligned with img are resized & padded per sample, then stacked.
+    sample_keys = [key for key in ['labelmap', 'maskmap'] if key in data_keys and key not in map_keys]
+    chunk_dict = {key: list() for key in map_keys}
     samples_per_gpu = (len(batch) - 1 + len(device_ids)) // len(device_ids)
     samples_per_gpu = samples_per_gpu if batch[0]['img'].samples_per_gpu else len(batch)
     for start in range(0, len(batch), samples_per_gpu):
@@ -91,104 +168,85 @@ def collate(batch, trans_dict, device_ids=None):
             target_width = target_width + pad_w
             target_height = target_height + pad_h
 
-        for i in range(start, min(len(batch), start + samples_per_gpu)):
+        end = min(len(batch), start + samples_per_gpu)
+        for key in map_keys:
+            chunk_dict[key].append(new_batch(batch[start][key].data, end - start,
+                                             (target_height, target_width), MAP_PAD_DICT[key]))
+
+        for i in range(start, end):
             if 'meta' in data_keys:
                 batch[i]['meta'].data['input_size'] = [target_width, target_height]
 
             channels, height, width = batch[i]['img'].size()
-            if height == target_height and width == target_width:
-                continue
-
             scaled_size = [width, height]
-            if trans_dict['align_method'] in ['only_scale', 'scale_and_pad']:
-                w_scale_ratio = target_width / width
-                h_scale_ratio = target_height / height
-                if trans_dict['align_method'] == 'scale_and_pad':
-                    w_scale_ratio = min(w_scale_ratio, h_scale_ratio)
-                    h_scale_ratio = w_scale_ratio
-
-                if 'kpts' in data_keys and batch[i]['kpts'].numel() > 0:
-                    batch[i]['kpts'].data[:, :, 0] *= w_scale_ratio
-                    batch[i]['kpts'].data[:, :, 1] *= h_scale_ratio
-
-                if 'bboxes' in data_keys and batch[i]['bboxes'].numel() > 0:
-                    batch[i]['bboxes'].data[:, 0::2] *= w_scale_ratio
-                    batch[i]['bboxes'].data[:, 1::2] *= h_scale_ratio
-
-                if 'polygons' in data_keys:
-                    for object_id in range(len(batch[i]['polygons'])):
-                        for polygon_id in range(len(batch[i]['polygons'][object_id])):
-                            batch[i]['polygons'].data[object_id][polygon_id][0::2] *= w_scale_ratio
-                            batch[i]['polygons'].data[object_id][polygon_id][1::2] *= h_scale_ratio
-
-                scaled_size = (int(round(width * w_scale_ratio)), int(round(height * h_scale_ratio)))
-                if 'meta' in data_keys and 'border_wh' in batch[i]['meta'].data:
-                    batch[i]['meta'].data['border_wh'] = scaled_size
-
-                scaled_size_hw = (scaled_size[1], scaled_size[0])
-
-                batch[i]['img']._data = TensorHelper.resize(batch[i]['img'].data,
-                                                            scaled_size_hw, mode='bilinear', align_corners=True)
-                if 'labelmap' in data_keys:
-                    batch[i]['labelmap']._data = TensorHelper.resize(batch[i]['labelmap'].data, scaled_size_hw, mode='nearest')
-
-                if 'maskmap' in data_keys:
-                    batch[i]['maskmap']._data = TensorHelper.resize(batch[i]['maskmap'].data, scaled_size_hw, mode='nearest')
-
-            pad_width = target_width - scaled_size[0]
-            pad_height = target_height - scaled_size[1]
-            assert pad_height >= 0 and pad_width >= 0
-            if pad_width > 0 or pad_height > 0:
-                assert trans_dict['align_method'] in ['only_pad', 'scale_and_pad']
-                left_pad, up_pad = None, None
-                if 'pad_mode' not in trans_dict or trans_dict['pad_mode'] == 'random':
-                    left_pad = random.randint(0, pad_width)  # pad_left
-                    up_pad = random.randint(0, pad_height)  # pad_up
-
-                elif trans_dict['pad_mode'] == 'pad_border':
-                    direction = random.randint(0, 1)
-                    left_pad = pad_width if direction == 0 else 0
-                    direction = random.randint(0, 1)
-                    up_pad = pad_height if direction == 0 else 0
-
-                elif trans_dict['pad_mode'] == 'pad_left_up':
-                    left_pad = pad_width
-                    up_pad = pad_height
-
-                elif trans_dict['pad_mode'] == 'pad_right_down':
-                    left_pad = 0
-                    up_pad = 0
-
-                elif trans_dict['pad_mode'] == 'pad_center':
-                    left_pad = pad_width // 2
-                    up_pad = pad_height // 2
-
-                else:
-                    Log.error('Invalid pad mode: {}'.format(trans_dict['pad_mode']))
-                    exit(1)
-
-                pad = [left_pad, pad_width-left_pad, up_pad, pad_height-up_pad]
-
-                batch[i]['img']._data = F.pad(batch[i]['img'].data, pad=pad, value=0)
-
-                if 'labelmap' in data_keys:
-                    batch[i]['labelmap']._data = F.pad(batch[i]['labelmap'].data, pad=pad, value=-1)
-
-                if 'maskmap' in data_keys:
-                    batch[i]['maskmap']._data = F.pad(batch[i]['maskmap'].data, pad=pad, value=1)
-
-                if 'polygons' in data_keys:
-                    for object_id in range(len(batch[i]['polygons'])):
-                        for polygon_id in range(len(batch[i]['polygons'][object_id])):
-                            batch[i]['polygons'].data[object_id][polygon_id][0::2] += left_pad
-                            batch[i]['polygons'].data[object_id][polygon_id][1::2] += up_pad
-
-                if 'kpts' in data_keys and batch[i]['kpts'].numel() > 0:
-                    batch[i]['kpts'].data[:, :, 0] += left_pad
-                    batch[i]['kpts'].data[:, :, 1] += up_pad
-
-                if 'bboxes' in data_keys and batch[i]['bboxes'].numel() > 0:
-                    batch[i]['bboxes'].data[:, 0::2] += left_pad
-                    batch[i]['bboxes'].data[:, 1::2] += up_pad
-
-    return dict({key: stack(batch, data_key=key, device_ids=device_ids) for key in data_keys})
+            w_scale_ratio, h_scale_ratio, left_pad, up_pad = 1.0, 1.0, 0, 0
+            pad_width, pad_height = 0, 0
+            if height != target_height or width != target_width:
+                if trans_dict['align_method'] in ['only_scale', 'scale_and_pad']:
+                    w_scale_ratio = target_width / width
+                    h_scale_ratio = target_height / height
+                    if trans_dict['align_method'] == 'scale_and_pad':
+                        w_scale_ratio = min(w_scale_ratio, h_scale_ratio)
+                        h_scale_ratio = w_scale_ratio
+
+                    scaled_size = (int(round(width * w_scale_ratio)), int(round(height * h_scale_ratio)))
+                    if 'meta' in data_keys and 'border_wh' in batch[i]['meta'].data:
+                        batch[i]['meta'].data['border_wh'] = scaled_size
+
+                pad_width = target_width - scaled_size[0]
+                pad_height = target_height - scaled_size[1]
+                assert pad_height >= 0 and pad_width >= 0
+                if pad_width > 0 or pad_height > 0:
+                    assert trans_dict['align_method'] in ['only_pad', 'scale_and_pad']
+                    if 'pad_mode' not in trans_dict or trans_dict['pad_mode'] == 'random':
+                        left_pad = random.randint(0, pad_width)  # pad_left
+                        up_pad = random.randint(0, pad_height)  # pad_up
+
+                    elif trans_dict['pad_mode'] == 'pad_border':
+                        direction = random.randint(0, 1)
+                        left_pad = pad_width if direction == 0 else 0
+                        direction = random.randint(0, 1)
+                        up_pad = pad_height if direction == 0 else 0
+
+                    elif trans_dict['pad_mode'] == 'pad_left_up':
+                        left_pad = pad_width
+                        up_pad = pad_height
+
+                    elif trans_dict['pad_mode'] == 'pad_right_down':
+                        left_pad = 0
+                        up_pad = 0
+
+                    elif trans_dict['pad_mode'] == 'pad_center':
+                        left_pad = pad_width // 2
+                        up_pad = pad_height // 2
+
+                    else:
+                        Log.error('Invalid pad mode: {}'.format(trans_dict['pad_mode']))
+                        exit(1)
+
+                affine_coords(batch[i], data_keys, w_scale_ratio, h_scale_ratio, left_pad, up_pad)
+
+            if 'meta' in data_keys and 'border_wh' in batch[i]['meta'].data:
+                # The left & up of the border_wh region in the batch, e.g. for the batch augmentations.
+                batch[i]['meta'].data['border_xy'] = [left_pad, up_pad]
+
+            for key in map_keys:
+                data = batch[i][key].data
+                if tuple(scaled_size) != (width, height):
+                    data = TensorHelper.resize(data, (scaled_size[1], scaled_size[0]), **MAP_RESIZE_DICT[key])
+
+                chunk_dict[key][-1][i - start, ..., up_pad:up_pad + scaled_size[1],
+                                    left_pad:left_pad + scaled_size[0]].copy_(data)
+
+            for key in sample_keys:
+                if tuple(scaled_size) != (width, height):
+                    batch[i][key]._data = TensorHelper.resize(batch[i][key].data, (scaled_size[1], scaled_size[0]),
+                                                              **MAP_RESIZE_DICT[key])
+
+                if pad_width > 0 or pad_height > 0:
+                    pad = [left_pad, pad_width - left_pad, up_pad, pad_height - up_pad]
+                    batch[i][key]._data = F.pad(batch[i][key].data, pad=pad, value=MAP_PAD_DICT[key])
+
+    share_samples(batch, data_keys)
+    return dict({key: stack_chunks(batch, key, chunk_dict[key], device_ids=device_ids) if key in chunk_dict
+                 else stack(batch, data_key=key, device_ids=device_ids) for key in data_keys})
@@ -7,6 +7,7 @@
 import collections
 import random
 import math
+import time
 import cv2
 import numpy as np
 import imgaug.augmenters as iaa
@@ -266,6 +267,25 @@ class RandomHFlip(object):
         self.swap_pair = swap_pair
         self.ratio = ratio
 
+    def get_matrix(self, width, height, bboxes=None):
+        if random.random() > self.ratio:
+            return None
+
+        return np.array([[-1.0, 0.0, width - 1], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]), (width, height)
+
+    def swap(self, labelmap=None, kpts=None):
+        if labelmap is not None:
+            for pair in self.swap_pair:
+                a_mask = (labelmap == pair[0])
+                labelmap[labelmap == pair[1]] = pair[0]
+                labelmap[a_mask] = pair[1]
+
+        if kpts is not None and kpts.size > 0:
+            for pair in self.swap_pair:
+                temp_point = np.copy(kpts[:, pair[0] - 1])
+                kpts[:, pair[0] - 1] = kpts[:, pair[1] - 1]
+                kpts[:, pair[1] - 1] = temp_point
+
     def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
         assert isinstance(img, (np.ndarray, list))
         assert labelmap is None or isinstance(labelmap, np.ndarray)
@@ -283,10 +303,6 @@ class RandomHFlip(object):
 
         if labelmap is not None:
             labelmap = cv2.flip(labelmap, 1)
-            for pair in self.swap_pair:
-                a_mask = (labelmap == pair[0])
-                labelmap[labelmap == pair[1]] = pair[0]
-                labelmap[a_mask] = pair[1]
 
         if maskmap is not None:
             maskmap = cv2.flip(maskmap, 1)
@@ -305,11 +321,7 @@ class RandomHFlip(object):
         if kpts is not None and kpts.size > 0:
             kpts[:, :, 0] = width - 1 - kpts[:, :, 0]
 
-            for pair in self.swap_pair:
-                temp_point = np.copy(kpts[:, pair[0] - 1])
-                kpts[:, pair[0] - 1] = kpts[:, pair[1] - 1]
-                kpts[:, pair[1] - 1] = temp_point
-
+        self.swap(labelmap, kpts)
         return img, labelmap, maskmap, kpts, bboxes, labels, polygons
 
 
@@ -543,6 +555,22 @@ class RandomResize(object):
         else:
             raise NotImplementedError('Resize method {} undefined!'.format(self.method))
 
+    def get_ratio(self, width, height, bboxes=None):
+        if random.random() < self.ratio:
+            scale_ratio = self.get_scale([width, height], bboxes)
+            aspect_ratio = random.uniform(*self.aspect_range)
+            w_scale_ratio = math.sqrt(aspect_ratio) * scale_ratio
+            h_scale_ratio = math.sqrt(1.0 / aspect_ratio) * scale_ratio
+        else:
+            w_scale_ratio, h_scale_ratio = 1.0, 1.0
+
+        return w_scale_ratio, h_scale_ratio
+
+    def get_matrix(self, width, height, bboxes=None):
+        w_scale_ratio, h_scale_ratio = self.get_ratio(width, height, bboxes)
+        converted_size = (int(width * w_scale_ratio), int(height * h_scale_ratio))
+        return np.array([[w_scale_ratio, 0.0, 0.0], [0.0, h_scale_ratio, 0.0], [0.0, 0.0, 1.0]]), converted_size
+
     def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
         """
         Args:
@@ -561,14 +589,7 @@ class RandomResize(object):
         assert labelmap is None or isinstance(labelmap, np.ndarray)
         assert maskmap is None or isinstance(maskmap, np.ndarray)
         height, width, _ = img.shape if isinstance(img, np.ndarray) else img[0].shape
-        if random.random() < self.ratio:
-            scale_ratio = self.get_scale([width, height], bboxes)
-            aspect_ratio = random.uniform(*self.aspect_range)
-            w_scale_ratio = math.sqrt(aspect_ratio) * scale_ratio
-            h_scale_ratio = math.sqrt(1.0 / aspect_ratio) * scale_ratio
-        else:
-            w_scale_ratio, h_scale_ratio = 1.0, 1.0
-
+        w_scale_ratio, h_scale_ratio = self.get_ratio(width, height, bboxes)
         if kpts is not None and kpts.size > 0:
             kpts[:, :, 0] *= w_scale_ratio
             kpts[:, :, 1] *= h_scale_ratio
@@ -610,6 +631,25 @@ class RandomRotate(object):
         self.ratio = ratio
         self.mean = mean
 
+    @staticmethod
+    def get_rotate_mat(rotate_degree, width, height):
+        img_center = (width / 2.0, height / 2.0)
+        rotate_mat = cv2.getRotationMatrix2D(img_center, rotate_degree, 1.0)
+        cos_val = np.abs(rotate_mat[0, 0])
+        sin_val = np.abs(rotate_mat[0, 1])
+        new_width = int(height * sin_val + width * cos_val)
+        new_height = int(height * cos_val + width * sin_val)
+        rotate_mat[0, 2] += (new_width / 2.) - img_center[0]
+        rotate_mat[1, 2] += (new_height / 2.) - img_center[1]
+        return rotate_mat, (new_width, new_height)
+
+    def get_matrix(self, width, height, bboxes=None):
+        if random.random() >= self.ratio:
+            return None
+
+        rotate_mat, new_size = self.get_rotate_mat(random.uniform(-self.max_degree, self.max_degree), width, height)
+        return np.vstack([rotate_mat, [0.0, 0.0, 1.0]]), new_size
+
     def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
         """
         Args:
@@ -631,14 +671,7 @@ class RandomRotate(object):
             return img, labelmap, maskmap, kpts, bboxes, labels, polygons
 
         height, width, _ = img.shape if isinstance(img, np.ndarray) else img[0].shape
-        img_center = (width / 2.0, height / 2.0)
-        rotate_mat = cv2.getRotationMatrix2D(img_center, rotate_degree, 1.0)
-        cos_val = np.abs(rotate_mat[0, 0])
-        sin_val = np.abs(rotate_mat[0, 1])
-        new_width = int(height * sin_val + width * cos_val)
-        new_height = int(height * cos_val + width * sin_val)
-        rotate_mat[0, 2] += (new_width / 2.) - img_center[0]
-        rotate_mat[1, 2] += (new_height / 2.) - img_center[1]
+        rotate_mat, (new_width, new_height) = self.get_rotate_mat(rotate_degree, width, height)
         if not isinstance(img, list):
             img = cv2.warpAffine(img, rotate_mat, (new_width, new_height), borderValue=self.mean).astype(np.uint8)
         else:
@@ -737,6 +770,14 @@ class RandomCrop(object):
         else:
             raise NotImplementedError('Random Crop Method {} Undefined!'.format(self.method))
 
+    def get_matrix(self, width, height, bboxes=None):
+        if random.random() > self.ratio:
+            return None
+
+        target_size = (min(self.size[0], width), min(self.size[1], height))
+        offset_left, offset_up = self.get_lefttop(target_size, [width, height])
+        return np.array([[1.0, 0.0, -offset_left], [0.0, 1.0, -offset_up], [0.0, 0.0, 1.0]]), target_size
+
     def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
         """
         Args:
@@ -1085,27 +1126,32 @@ class Resize(object):
         self.min_side_length = min_side_length
         self.max_side_length = max_side_length
 
-    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
-        assert isinstance(img, (np.ndarray, list))
-        assert labelmap is None or isinstance(labelmap, np.ndarray)
-        assert maskmap is None or isinstance(maskmap, np.ndarray)
-        height, width, _ = img.shape if isinstance(img, np.ndarray) else img[0].shape
+    def get_ratio(self, width, height):
         if self.target_size is not None:
-            w_scale_ratio = self.target_size[0] / width
-            h_scale_ratio = self.target_size[1] / height
+            return self.target_size[0] / width, self.target_size[1] / height
 
         elif self.min_side_length is not None and self.max_side_length is None:
             scale_ratio = self.min_side_length / min(width, height)
-            w_scale_ratio, h_scale_ratio = scale_ratio, scale_ratio
+            return scale_ratio, scale_ratio
 
         elif self.min_side_length is None and self.max_side_length is not None:
             scale_ratio = self.max_side_length / max(width, height)
-            w_scale_ratio, h_scale_ratio = scale_ratio, scale_ratio
+            return scale_ratio, scale_ratio
 
         else:
             scale1 = self.min_side_length / min(width, height)
             scale2 = self.max_side_length / max(width, height)
-            w_scale_ratio, h_scale_ratio = min(scale1, scale2), min(scale1, scale2)
+            return min(scale1, scale2), min(scale1, scale2)
+
+    def get_scale(self, width, height):
+        return min(self.get_ratio(width, height))
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
+        assert isinstance(img, (np.ndarray, list))
+        assert labelmap is None or isinstance(labelmap, np.ndarray)
+        assert maskmap is None or isinstance(maskmap, np.ndarray)
+        height, width, _ = img.shape if isinstance(img, np.ndarray) else img[0].shape
+        w_scale_ratio, h_scale_ratio = self.get_ratio(width, height)
 
         target_size = [int(round(width * w_scale_ratio)), int(round(height * h_scale_ratio))]
 
@@ -1158,6 +1204,20 @@ CV2_AUGMENTATIONS_DICT = {
 }
 
 
+AFFINE_AUGMENTATIONS = (RandomResize, RandomRotate, RandomCrop, RandomHFlip)
+
+
+def is_deterministic(transform):
+    """Whether the output of a transform only depends on its input: resize, center crop & border always applied."""
+    if isinstance(transform, Resize):
+        return True
+
+    if isinstance(transform, RandomCrop):
+        return transform.method == 'center' and transform.ratio >= 1.0
+
+    return isinstance(transform, RandomBorder) and transform.ratio >= 1.0
+
+
 class CV2AugCompose(object):
     """Composes several transforms together.
 
@@ -1168,12 +1228,24 @@ class CV2AugCompose(object):
         >>> CV2AugCompose([
         >>>     RandomCrop(),
         >>> ])
+
+    If aug_trans.fuse_affine is set, the consecutive random_resize, random_rotate, random_crop and
+    random_hflip are fused into one affine matrix, and every map is warped only once. The pixels are
+    interpolated once instead of after every transform, so the outputs differ slightly from the
+    sequential transforms. The pixels are mapped with the half-pixel centers of cv2.resize, the edges are
+    replicated, and the pixels moved out of the image by random_rotate get its border values. The boxes
+    are clipped & filtered on the final canvas.
+
+    If time_dict is set to a dict, the seconds spent in every transform are accumulated into it.
     """
     def __init__(self, configer, split='train'):
         self.configer = configer
         self.transforms = dict()
         self.split = split
         self.trans_dict = self.configer.get(split, 'aug_trans')
+        self.reduced_decode = 'reduced_decode' in self.trans_dict and self.trans_dict['reduced_decode']
+        self.fuse_affine = 'fuse_affine' in self.trans_dict and self.trans_dict['fuse_affine']
+        self.time_dict = None
         shuffle_train_trans = []
         if 'shuffle_trans_seq' in self.trans_dict:
             if isinstance(self.trans_dict['shuffle_trans_seq'][0], list):
@@ -1190,7 +1262,49 @@ class CV2AugCompose(object):
             else:
                 self.transforms[trans] = CV2_AUGMENTATIONS_DICT[trans](**self.trans_dict[trans])
 
-    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
+    def get_first_resize(self):
+        """Return the key of the resize run first on every image, None if the first transform is not a resize.
+
+        The first resize only depends on the size of the image, so its output could be decoded at a reduced
+        resolution.
+        """
+        if 'shuffle_trans_seq' in self.trans_dict or len(self.trans_dict['trans_seq']) == 0:
+            return None
+
+        first_key = self.trans_dict['trans_seq'][0]
+        return first_key if isinstance(self.transforms[first_key], Resize) else None
+
+    def get_cache_prefix(self):
+        """Return the keys of the deterministic transforms run first on every image, see is_deterministic.
+
+        Their outputs only depend on the inputs, so they could be cached offline, e.g. by ResizeCache, and
+        skipped with skip_prefix for the cached inputs.
+        """
+        if 'shuffle_trans_seq' in self.trans_dict:
+            return list()
+
+        prefix_list = list()
+        for trans_key in self.trans_dict['trans_seq']:
+            if not is_deterministic(self.transforms[trans_key]):
+                break
+
+            prefix_list.append(trans_key)
+
+        return prefix_list
+
+    def get_scale_hint(self):
+        """Return the function of the downscale ratio, if aug_trans.reduced_decode is set and resize runs first.
+
+        The images could be decoded at a reduced resolution (no smaller than the resized image), because
+        the resize only depends on the target size and the aspect ratio.
+        """
+        if not self.reduced_decode or self.get_first_resize() is None:
+            return None
+
+        return self.transforms[self.get_first_resize()].get_scale
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None,
+                 skip_prefix=False):
         shuffle_trans_seq = []
         if 'shuffle_trans_seq' in self.trans_dict:
             if isinstance(self.trans_dict['shuffle_trans_seq'][0], list):
@@ -1200,10 +1314,36 @@ class CV2AugCompose(object):
                 shuffle_trans_seq = self.trans_dict['shuffle_trans_seq']
                 random.shuffle(shuffle_trans_seq)
 
-        for trans_key in (shuffle_trans_seq + self.trans_dict['trans_seq']):
+        affine_list = list()
+        trans_seq = self.trans_dict['trans_seq']
+        if skip_prefix:
+            trans_seq = trans_seq[len(self.get_cache_prefix()):]
+
+        for trans_key in (shuffle_trans_seq + trans_seq):
+            if self.fuse_affine and isinstance(self.transforms[trans_key], AFFINE_AUGMENTATIONS):
+                affine_list.append(self.transforms[trans_key])
+                continue
+
+            if len(affine_list) > 0:
+                start_time = time.time()
+                (img, labelmap, maskmap, kpts,
+                 bboxes, labels, polygons) = self.warp_affine(affine_list, img, labelmap, maskmap,
+                                                              kpts, bboxes, labels, polygons)
+                self._add_time('warp_affine', start_time)
+                affine_list = list()
+
+            start_time = time.time()
             (img, labelmap, maskmap, kpts,
              bboxes, labels, polygons) = self.transforms[trans_key](img, labelmap, maskmap,
                                                                     kpts, bboxes, labels, polygons)
+            self._add_time(trans_key, start_time)
+
+        if len(affine_list) > 0:
+            start_time = time.time()
+            (img, labelmap, maskmap, kpts,
+             bboxes, labels, polygons) = self.warp_affine(affine_list, img, labelmap, maskmap,
+                                                          kpts, bboxes, labels, polygons)
+            self._add_time('warp_affine', start_time)
 
         if self.configer.get('data', 'input_mode') == 'RGB':
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -1217,3 +1357,123 @@ class CV2AugCompose(object):
                 out_list.append(elem)
 
         return out_list if len(out_list) > 1 else out_list[0]
+
+    def _add_time(self, key, start_time):
+        if self.time_dict is not None:
+            self.time_dict[key] = self.time_dict.get(key, 0.0) + time.time() - start_time
+
+    @staticmethod
+    def affine_bboxes(bboxes, matrix):
+        corners = bboxes[:, [0, 1, 2, 1, 0, 3, 2, 3]].reshape(-1, 4, 2)
+        corners = corners.dot(matrix[:2, :2].T) + matrix[:2, 2]
+        return np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1).astype(bboxes.dtype)
+
+    @staticmethod
+    def warp_affine(trans_list, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
+        assert isinstance(img, (np.ndarray, list))
+        assert labelmap is None or isinstance(labelmap, np.ndarray)
+        assert maskmap is None or isinstance(maskmap, np.ndarray)
+        height, width, _ = img.shape if isinstance(img, np.ndarray) else img[0].shape
+        has_bboxes = bboxes is not None and bboxes.size > 0
+        # matrix maps the points as the transforms do, the pixel matrices (of INTER_LINEAR & INTER_NEAREST) map
+        # the pixels as cv2.resize & cv2.warpAffine do.
+        matrix, linear_matrix, nearest_matrix, size = np.eye(3), np.eye(3), np.eye(3), (width, height)
+        flip_list, crop_list, border_values = list(), list(), None
+        for trans in trans_list:
+            cur_bboxes = CV2AugCompose.affine_bboxes(bboxes, matrix) if has_bboxes else None
+            affine = trans.get_matrix(size[0], size[1], bboxes=cur_bboxes)
+            if affine is None:
+                continue
+
+            linear_affine = nearest_affine = affine[0]
+            if isinstance(trans, RandomResize):
+                # With the scale s of the int sizes, cv2.resize maps the pixel centers x' = s * (x + 0.5) - 0.5
+                # with INTER_LINEAR, and reads floor(x' / s) with INTER_NEAREST, i.e. x' = s * (x + 0.5) rounded.
+                scale = np.array([affine[1][0] / size[0], affine[1][1] / size[1]])
+                linear_affine = np.array([[scale[0], 0.0, 0.5 * scale[0] - 0.5],
+                                          [0.0, scale[1], 0.5 * scale[1] - 0.5], [0.0, 0.0, 1.0]])
+                nearest_affine = linear_affine + np.array([[0.0, 0.0, 0.5], [0.0, 0.0, 0.5], [0.0, 0.0, 0.0]])
+
+            matrix, size = affine[0].dot(matrix), affine[1]
+            linear_matrix, nearest_matrix = linear_affine.dot(linear_matrix), nearest_affine.dot(nearest_matrix)
+            if isinstance(trans, RandomHFlip):
+                flip_list.append(trans)
+            elif isinstance(trans, RandomCrop):
+                crop_list.append(trans)
+            elif isinstance(trans, RandomRotate):
+                # The border values of the sequential RandomRotate.
+                border_values = (trans.mean, 255, 1)
+
+        # The edges are replicated as by cv2.resize, and only the pixels moved out of the source image by the
+        # rotations are set to their border values.
+        outside = None
+        if border_values is not None:
+            outside = cv2.warpAffine(np.ones((height, width), dtype=np.uint8), linear_matrix[:2], size,
+                                     flags=cv2.INTER_NEAREST, borderMode=cv2.BORDER_CONSTANT, borderValue=0) == 0
+
+        def warp(item, flags, value_id):
+            pixel_matrix = linear_matrix if flags == cv2.INTER_LINEAR else nearest_matrix
+            item = cv2.warpAffine(item, pixel_matrix[:2], size, flags=flags,
+                                  borderMode=cv2.BORDER_REPLICATE).astype(np.uint8)
+            if outside is not None:
+                item[outside] = border_values[value_id]
+
+            return item
+
+        if not isinstance(img, list):
+            img = warp(img, cv2.INTER_LINEAR, 0)
+        else:
+            img = [warp(item, cv2.INTER_LINEAR, 0) for item in img]
+
+        if labelmap is not None:
+            labelmap = warp(labelmap, cv2.INTER_NEAREST, 1)
+
+        if maskmap is not None:
+            maskmap = warp(maskmap, cv2.INTER_NEAREST, 2)
+
+        affine_mat = matrix[:2]
+        if kpts is not None and kpts.size > 0:
+            kpts[:, :, :2] = kpts[:, :, :2].dot(affine_mat[:, :2].T) + affine_mat[:, 2]
+
+        if polygons is not None:
+            for object_id in range(len(polygons)):
+                for polygon_id in range(len(polygons[object_id])):
+                    points = np.array(polygons[object_id][polygon_id]).reshape(-1, 2)
+                    points = points.dot(affine_mat[:, :2].T) + affine_mat[:, 2]
+                    polygons[object_id][polygon_id][0::2] = points[:, 0]
+                    polygons[object_id][polygon_id][1::2] = points[:, 1]
+
+        if has_bboxes:
+            bboxes = CV2AugCompose.affine_bboxes(bboxes, matrix)
+
+        if has_bboxes and len(crop_list) > 0:
+            mask = np.ones(bboxes.shape[0], dtype=bool)
+            if not all(crop.allow_outside_center for crop in crop_list):
+                center = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+                mask = np.logical_and(0 <= center, center < np.array(size)).all(axis=1)
+
+            bboxes[:, 0::2] = np.clip(bboxes[:, 0::2], 0, size[0] - 1)
+            bboxes[:, 1::2] = np.clip(bboxes[:, 1::2], 0, size[1] - 1)
+            mask = np.logical_and(mask, (bboxes[:, :2] < bboxes[:, 2:]).all(axis=1))
+            bboxes = bboxes[mask]
+            if labels is not None:
+                labels = labels[mask]
+
+            if polygons is not None:
+                new_polygons = list()
+                for object_id in range(len(polygons)):
+                    if mask[object_id] == 1:
+                        for polygon_id in range(len(polygons[object_id])):
+                            polygons[object_id][polygon_id][0::2] = np.clip(polygons[object_id][polygon_id][0::2],
+                                                                            0, size[0] - 1)
+                            polygons[object_id][polygon_id][1::2] = np.clip(polygons[object_id][polygon_id][1::2],
+                                                                            0, size[1] - 1)
+
+                        new_polygons.append(polygons[object_id])
+
+                polygons = new_polygons
+
+        for flip in flip_list:
+            flip.swap(labelmap, kpts)
+
+        return img, labelmap, maskmap, kpts, bboxes, labels, polygons
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Base of the dataset generators, converting the items in a process pool.
+
+
+import os
+import json
+
+from lib.data.anno_store import AnnoStore, ANNO_DIR
+from lib.data.shard import ShardWriter
+from lib.tools.util.logger import Logger as Log
+from lib.tools.util.progressbar import track_parallel_progress
+
+
+GENERATED_FILE = '.generated.jsonl'
+
+# The generator in every worker process, set by the initializer of the pool.
+GENERATOR = None
+
+
+def init_worker(generator):
+    global GENERATOR
+    GENERATOR = generator
+
+
+def run_item(task):
+    return GENERATOR.run_item(*task)
+
+
+class ParallelGenerator(object):
+    """Convert the items of every split in a process pool, and skip the items converted by a former run.
+
+    A subclass implements:
+        get_items(split): The list of (name, item) of the split, every name is unique in the split.
+        process_item(split, name, item): Convert an item in a worker, and return None to drop it, or a dict:
+            files (dict): The key -> (relative path, bytes) of the output files, e.g. image & label.
+            meta (dict): The json-serializable annotation, optional.
+            meta_path (str): The relative path of the json file of meta, optional.
+        finish_split(split, record_list): Optional, called with the dict(name, meta) of all the converted items,
+            e.g. to write one list file of the split.
+
+    The outputs of a split are written under save_dir/split (save_dir if split is None). The workers write the
+    files atomically, and the main process appends the converted names to .generated.jsonl every chunk_size
+    items. With packed, the files (by their keys) & metas are packed into the shard files of ShardWriter
+    instead, readable by the ShardDataset of det & seg. With anno_store, the AnnoStore of the metas of every split
+    is written under save_dir/split/anno after the conversion.
+
+    Args:
+        save_dir (str): The directory to save the data.
+        nproc (int): The number of the worker processes.
+        packed (bool): Whether to write the shard files instead of the files.
+        shard_size (int): The max size (MB) of one shard file.
+        chunk_size (int): The number of items between two flushes of the record of the converted items.
+        anno_store (bool): Whether to write the AnnoStore of the metas.
+    """
+    def __init__(self, save_dir, nproc=1, packed=False, shard_size=1024, chunk_size=1000, anno_store=False):
+        self.save_dir = save_dir
+        self.nproc = nproc
+        self.packed = packed
+        self.shard_size = shard_size
+        self.chunk_size = chunk_size
+        self.anno_store = anno_store
+
+    def get_splits(self):
+        return [None]
+
+    def get_items(self, split):
+        raise NotImplementedError('Not implemented!')
+
+    def process_item(self, split, name, item):
+        raise NotImplementedError('Not implemented!')
+
+    def finish_split(self, split, record_list):
+        pass
+
+    def get_split_dir(self, split):
+        return self.save_dir if split is None else os.path.join(self.save_dir, split)
+
+    def run_item(self, split, name, item):
+        out_dict = self.process_item(split, name, item)
+        if out_dict is None:
+            return name, None
+
+        if self.packed:
+            blobs = {key: content for key, (_, content) in out_dict.get('files', dict()).items()}
+            return name, dict(blobs=blobs, meta=out_dict.get('meta', None))
+
+        split_dir = self.get_split_dir(split)
+        for rel_path, content in out_dict.get('files', dict()).values():
+            self.write_file(os.path.join(split_dir, rel_path), content)
+
+        if out_dict.get('meta_path', None) is not None:
+            self.write_file(os.path.join(split_dir, out_dict['meta_path']),
+                            json.dumps(out_dict['meta']).encode('utf-8'))
+
+        return name, dict(meta=out_dict.get('meta', None))
+
+    @staticmethod
+    def write_file(file_path, content):
+        if not os.path.exists(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        tmp_path = '{}.{}.tmp'.format(file_path, os.getpid())
+        with open(tmp_path, 'wb') as write_stream:
+            write_stream.write(content)
+
+        os.replace(tmp_path, file_path)
+
+    def generate(self):
+        for split in self.get_splits():
+            split_dir = self.get_split_dir(split)
+            if not os.path.exists(split_dir):
+                os.makedirs(split_dir)
+
+            if self.packed:
+                writer = ShardWriter(split_dir, shard_size=self.shard_size << 20, resume=True)
+                record_list = writer.record_list
+            else:
+                writer = open(os.path.join(split_dir, GENERATED_FILE), 'a+')
+                record_list = self._load_records(writer)
+
+            done_set = set(record['name'] for record in record_list)
+            task_list = [(split, name, item) for name, item in self.get_items(split) if name not in done_set]
+            Log.info('Generating {}: {} items, {} converted items skipped.'.format(
+                split_dir, len(task_list) + len(done_set), len(done_set)))
+
+            def add_result(result):
+                name, out_dict = result
+                if out_dict is None:
+                    return
+
+                if self.packed:
+                    writer.add(name, blobs=out_dict['blobs'], meta=out_dict['meta'])
+                else:
+                    record_list.append(dict(name=name, meta=out_dict['meta']))
+                    writer.write('{}\n'.format(json.dumps(record_list[-1])))
+
+                if len(record_list) % self.chunk_size == 0:
+                    writer.flush()
+
+            if len(task_list) > 0:
+                track_parallel_progress(run_item, task_list, self.nproc, initializer=init_worker, initargs=(self,),
+                                        chunksize=max(min(len(task_list) // (self.nproc * 4), 64), 1),
+                                        result_fn=add_result)
+
+            writer.close()
+            if self.anno_store:
+                AnnoStore.build(os.path.join(split_dir, ANNO_DIR), record_list)
+
+            self.finish_split(split, record_list)
+
+    @staticmethod
+    def _load_records(log_stream):
+        log_stream.seek(0)
+        content = log_stream.read()
+        record_list = list()
+        for line in content.splitlines():
+            try:
+                record_list.append(json.loads(line))
+            except ValueError:
+                # The last line written partially by an interrupted run.
+                continue
+
+        if len(content) > 0 and not content.endswith('\n'):
+            log_stream.write('\n')
+
+        return record_list
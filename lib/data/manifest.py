@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Persistent directory manifest, instead of listing & probing the data dirs every time.
+
+
+import os
+import pickle
+import hashlib
+
+from lib.tools.helper.image_helper import ImageHelper, IMG_EXTENSIONS
+from lib.tools.util.logger import Logger as Log
+
+
+MANIFEST_CACHE_DIR = '~/.cache/torchcv/manifest'
+
+
+class Manifest(object):
+    """The cached listing of a directory.
+
+    The manifest keeps the relative path, size and mtime of every file, and the mtime of every
+    scanned directory. It is built once and saved into cache_dir. A directory's mtime changes
+    whenever an entry is added, removed or renamed in it, so checking the directory mtimes is
+    enough to find a stale listing without stating every file. A file rewritten in place does not
+    change its directory's mtime, so the file is stated again whenever its size is served. The image
+    sizes are read lazily from the file headers, and kept in the manifest with the size & mtime of
+    the file they were read from.
+
+    Args:
+        dir_path (str): The directory to list.
+        recursive (bool): Whether to list the sub directories.
+        cache_dir (str): The directory to save the manifest files.
+    """
+    _manifest_dict = dict()
+
+    def __init__(self, dir_path, recursive=False, cache_dir=None):
+        self.dir_path = os.path.abspath(os.path.expanduser(dir_path))
+        self.recursive = recursive
+        cache_dir = os.path.expanduser(MANIFEST_CACHE_DIR if cache_dir is None else cache_dir)
+        cache_key = hashlib.md5('{}:{}'.format(self.dir_path, recursive).encode('utf-8')).hexdigest()
+        self.cache_path = os.path.join(cache_dir, '{}.pkl'.format(cache_key))
+        self.dir_dict, self.file_dict, self.size_dict = self._load()
+        self.name_dict = None
+        self.size_changed = False
+
+    @staticmethod
+    def get(dir_path, recursive=False, cache_dir=None):
+        key = (os.path.abspath(os.path.expanduser(dir_path)), recursive,
+               None if cache_dir is None else os.path.abspath(os.path.expanduser(cache_dir)))
+        if key not in Manifest._manifest_dict or Manifest._manifest_dict[key].is_stale():
+            Manifest._manifest_dict[key] = Manifest(dir_path, recursive=recursive, cache_dir=cache_dir)
+
+        return Manifest._manifest_dict[key]
+
+    @staticmethod
+    def get_stamps(path_list, cache_dir=None):
+        """Return the (path, size, mtime) of the files, from the manifests of their listing instead of stating them.
+
+        The manifests loaded by the listing are looked up first, a directory not listed yet is listed
+        (non-recursively) once. The size & mtime are None for the files not in the manifests.
+        """
+        manifest_dict = dict()
+        stamp_list = list()
+        for path in path_list:
+            path = os.path.abspath(os.path.expanduser(path))
+            dir_path = os.path.dirname(path)
+            if dir_path not in manifest_dict:
+                manifest_dict[dir_path] = Manifest._find(dir_path, cache_dir)
+
+            manifest = manifest_dict[dir_path]
+            rel_path = None if manifest is None else Manifest._norm(os.path.relpath(path, manifest.dir_path))
+            size, mtime = (None, None) if manifest is None else manifest.file_dict.get(rel_path, (None, None))
+            stamp_list.append((path, size, mtime))
+
+        return stamp_list
+
+    @staticmethod
+    def _find(dir_path, cache_dir=None):
+        for manifest in Manifest._manifest_dict.values():
+            if manifest.dir_path == dir_path or (manifest.recursive and
+                                                 dir_path.startswith(os.path.join(manifest.dir_path, ''))):
+                return manifest
+
+        return Manifest.get(dir_path, cache_dir=cache_dir) if os.path.isdir(dir_path) else None
+
+    def is_stale(self, dir_dict=None):
+        dir_dict = self.dir_dict if dir_dict is None else dir_dict
+        for rel_dir, mtime in dir_dict.items():
+            try:
+                if os.stat(os.path.join(self.dir_path, rel_dir)).st_mtime_ns != mtime:
+                    return True
+
+            except OSError:
+                return True
+
+        return False
+
+    def _load(self):
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'rb') as read_stream:
+                    manifest = pickle.load(read_stream)
+
+                if not self.is_stale(manifest['dirs']):
+                    return manifest['dirs'], manifest['files'], manifest.get('sizes', dict())
+
+            except Exception:
+                Log.warn('Manifest: {} is broken.'.format(self.cache_path))
+
+        Log.info('Building manifest for {}...'.format(self.dir_path))
+        dir_dict, file_dict = self._scan()
+        self._save(dir_dict, file_dict, dict())
+        return dir_dict, file_dict, dict()
+
+    def _scan(self):
+        dir_dict = dict()
+        file_dict = dict()
+        rel_dir_list = ['']
+        while len(rel_dir_list) > 0:
+            rel_dir = rel_dir_list.pop()
+            abs_dir = os.path.join(self.dir_path, rel_dir)
+            dir_dict[rel_dir] = os.stat(abs_dir).st_mtime_ns
+            for entry in os.scandir(abs_dir):
+                rel_path = '{}/{}'.format(rel_dir, entry.name).lstrip('/')
+                if entry.is_dir():
+                    if self.recursive:
+                        rel_dir_list.append(rel_path)
+
+                    continue
+
+                stat = entry.stat()
+                file_dict[rel_path] = (stat.st_size, stat.st_mtime)
+
+        return dir_dict, file_dict
+
+    def _save(self, dir_dict, file_dict, size_dict):
+        try:
+            if not os.path.exists(os.path.dirname(self.cache_path)):
+                os.makedirs(os.path.dirname(self.cache_path))
+
+            tmp_path = '{}.{}.tmp'.format(self.cache_path, os.getpid())
+            with open(tmp_path, 'wb') as write_stream:
+                pickle.dump(dict(dirs=dir_dict, files=file_dict, sizes=size_dict),
+                            write_stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmp_path, self.cache_path)
+
+        except OSError:
+            Log.warn('Manifest: {} could not be saved.'.format(self.cache_path))
+
+    def list_files(self):
+        return sorted(self.file_dict.keys())
+
+    @staticmethod
+    def _norm(rel_path):
+        return os.path.normpath(rel_path).replace(os.sep, '/')
+
+    def exists(self, rel_path):
+        return self._norm(rel_path) in self.file_dict
+
+    def get_size(self, rel_path):
+        return self.file_dict[self._norm(rel_path)][0]
+
+    def get_mtime(self, rel_path):
+        return self.file_dict[self._norm(rel_path)][1]
+
+    def imgpath(self, image_name):
+        """Same as ImageHelper.imgpath, but looks up the manifest instead of probing every extension."""
+        if self.name_dict is None:
+            self.name_dict = dict()
+            for rel_path in self.file_dict:
+                shotname, extension = os.path.splitext(rel_path)
+                if extension in IMG_EXTENSIONS:
+                    self.name_dict.setdefault(shotname, list()).append(rel_path)
+
+        match_list = self.name_dict.get(image_name, list())
+        return None if len(match_list) != 1 else os.path.join(self.dir_path, match_list[0])
+
+    def get_img_size(self, rel_path):
+        """Return the [width, height] of an image, only the header is read when it is not cached."""
+        rel_path = self._norm(rel_path)
+        stat = os.stat(os.path.join(self.dir_path, rel_path))
+        stamp = (stat.st_size, stat.st_mtime)
+        if self.file_dict[rel_path] != stamp:
+            self.file_dict[rel_path] = stamp
+            self.size_changed = True
+
+        if rel_path not in self.size_dict or self.size_dict[rel_path][0] != stamp:
+            self.size_dict[rel_path] = (stamp, ImageHelper.read_size(os.path.join(self.dir_path, rel_path)))
+            self.size_changed = True
+
+        return self.size_dict[rel_path][1]
+
+    def flush(self):
+        """Save the image sizes read since the manifest was loaded."""
+        if self.size_changed:
+            self._save(self.dir_dict, self.file_dict, self.size_dict)
+            self.size_changed = False
@@ -7,6 +7,7 @@
 import collections
 import random
 import math
+import time
 import cv2
 import matplotlib
 import numpy as np
@@ -1067,29 +1068,34 @@ class Resize(object):
         self.min_side_length = min_side_length
         self.max_side_length = max_side_length
 
-    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
-        assert isinstance(img, (Image.Image, list))
-        assert labelmap is None or isinstance(labelmap, Image.Image)
-        assert maskmap is None or isinstance(maskmap, Image.Image)
-
-        # width, height = img.size
-        width, height = img.size if isinstance(img, Image.Image) else img[0].size
+    def get_ratio(self, width, height):
         if self.target_size is not None:
-            w_scale_ratio = self.target_size[0] / width
-            h_scale_ratio = self.target_size[1] / height
+            return self.target_size[0] / width, self.target_size[1] / height
 
         elif self.min_side_length is not None and self.max_side_length is None:
             scale_ratio = self.min_side_length / min(width, height)
-            w_scale_ratio, h_scale_ratio = scale_ratio, scale_ratio
+            return scale_ratio, scale_ratio
 
         elif self.min_side_length is None and self.max_side_length is not None:
             scale_ratio = self.max_side_length / max(width, height)
-            w_scale_ratio, h_scale_ratio = scale_ratio, scale_ratio
+            return scale_ratio, scale_ratio
 
         else:
             scale1 = self.min_side_length / min(width, height)
             scale2 = self.max_side_length / max(width, height)
-            w_scale_ratio, h_scale_ratio = min(scale1, scale2), min(scale1, scale2)
+            return min(scale1, scale2), min(scale1, scale2)
+
+    def get_scale(self, width, height):
+        return min(self.get_ratio(width, height))
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
+        assert isinstance(img, (Image.Image, list))
+        assert labelmap is None or isinstance(labelmap, Image.Image)
+        assert maskmap is None or isinstance(maskmap, Image.Image)
+
+        # width, height = img.size
+        width, height = img.size if isinstance(img, Image.Image) else img[0].size
+        w_scale_ratio, h_scale_ratio = self.get_ratio(width, height)
 
         target_size = [int(round(width * w_scale_ratio)), int(round(height * h_scale_ratio))]
         if kpts is not None and kpts.size > 0:
@@ -1140,6 +1146,17 @@ PIL_AUGMENTATIONS_DICT = {
 }
 
 
+def is_deterministic(transform):
+    """Whether the output of a transform only depends on its input: resize, center crop & border always applied."""
+    if isinstance(transform, Resize):
+        return True
+
+    if isinstance(transform, RandomCrop):
+        return transform.method == 'center' and transform.ratio >= 1.0
+
+    return isinstance(transform, RandomBorder) and transform.ratio >= 1.0
+
+
 class PILAugCompose(object):
     """Composes several transforms together.
 
@@ -1150,12 +1167,16 @@ class PILAugCompose(object):
         >>> PILAugCompose([
         >>>     RandomCrop(),
         >>> ])
+
+    If time_dict is set to a dict, the seconds spent in every transform are accumulated into it.
     """
     def __init__(self, configer, split='train'):
         self.configer = configer
         self.transforms = dict()
         self.split = split
         self.trans_dict = self.configer.get(split, 'aug_trans')
+        self.reduced_decode = 'reduced_decode' in self.trans_dict and self.trans_dict['reduced_decode']
+        self.time_dict = None
         shuffle_train_trans = []
         if 'shuffle_trans_seq' in self.trans_dict:
             if isinstance(self.trans_dict['shuffle_trans_seq'][0], list):
@@ -1172,7 +1193,53 @@ class PILAugCompose(object):
             else:
                 self.transforms[trans] = PIL_AUGMENTATIONS_DICT[trans](**self.trans_dict[trans])
 
-    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None):
+    def get_first_resize(self):
+        """Return the key of the resize run first on every image, None if the first transform is not a resize.
+
+        The first resize only depends on the size of the image, so its output could be decoded at a reduced
+        resolution.
+        """
+        if 'shuffle_trans_seq' in self.trans_dict or len(self.trans_dict['trans_seq']) == 0:
+            return None
+
+        first_key = self.trans_dict['trans_seq'][0]
+        return first_key if isinstance(self.transforms[first_key], Resize) else None
+
+    def get_cache_prefix(self):
+        """Return the keys of the deterministic transforms run first on every image, see is_deterministic.
+
+        Their outputs only depend on the inputs, so they could be cached offline, e.g. by ResizeCache, and
+        skipped with skip_prefix for the cached inputs.
+        """
+        if 'shuffle_trans_seq' in self.trans_dict:
+            return list()
+
+        prefix_list = list()
+        for trans_key in self.trans_dict['trans_seq']:
+            if not is_deterministic(self.transforms[trans_key]):
+                break
+
+            prefix_list.append(trans_key)
+
+        return prefix_list
+
+    def get_scale_hint(self):
+        """Return the function of the downscale ratio, if aug_trans.reduced_decode is set and resize runs first.
+
+        The images could be decoded at a reduced resolution (no smaller than the resized image), because
+        the resize only depends on the target size and the aspect ratio.
+        """
+        if not self.reduced_decode or self.get_first_resize() is None:
+            return None
+
+        return self.transforms[self.get_first_resize()].get_scale
+
+    def _add_time(self, key, start_time):
+        if self.time_dict is not None:
+            self.time_dict[key] = self.time_dict.get(key, 0.0) + time.time() - start_time
+
+    def __call__(self, img, labelmap=None, maskmap=None, kpts=None, bboxes=None, labels=None, polygons=None,
+                 skip_prefix=False):
         assert self.configer.get('data', 'input_mode') == 'RGB'
         shuffle_trans_seq = []
         if 'shuffle_trans_seq' in self.trans_dict:
@@ -1183,10 +1250,16 @@ class PILAugCompose(object):
                 shuffle_trans_seq = self.trans_dict['shuffle_trans_seq']
                 random.shuffle(shuffle_trans_seq)
 
-        for trans_key in (shuffle_trans_seq + self.trans_dict['trans_seq']):
+        trans_seq = self.trans_dict['trans_seq']
+        if skip_prefix:
+            trans_seq = trans_seq[len(self.get_cache_prefix()):]
+
+        for trans_key in (shuffle_trans_seq + trans_seq):
+            start_time = time.time()
             (img, labelmap, maskmap, kpts,
              bboxes, labels, polygons) = self.transforms[trans_key](img, labelmap, maskmap,
                                                                     kpts, bboxes, labels, polygons)
+            self._add_time(trans_key, start_time)
 
         out_list = [img]
         for elem in [labelmap, maskmap, kpts, bboxes, labels, polygons]:
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Loader wrapper with long-lived workers, moving the next batches to the device in background.
+
+
+import sys
+import queue
+import threading
+import torch
+
+from lib.tools.util.logger import Logger as Log
+
+
+class PrefetchLoader(object):
+    """Iterate a DataLoader in a background thread, and copy the batches to the device ahead of use.
+
+    The config data.workers is either the number of workers, or a dict:
+        num_workers (int): The number of the worker processes.
+        persistent (bool): Keep the workers alive between the epochs (and the val runs), default True.
+        prefetch_factor (int): The number of batches loaded in advance by each worker.
+        device_prefetch (int): The number of batches copied to the device in advance, 0 disables the thread.
+
+    The int --workers (data.num_workers) overrides num_workers of the dict.
+
+    The tensors (not the DataContainers, which are scattered by the parallel modules) are copied with
+    non_blocking on a side cuda stream, so the copy of the next batch overlaps the current step. The thread
+    does not wait for the copies: an event is recorded after them, the stream of the step waits for it when
+    the batch is used, and the tensors are recorded on that stream so their memory is not reused too early.
+
+    The batch transform (BatchAugCompose) runs on every batch after its copy, on the device of the step.
+    With depth 0, the batches are loaded, copied & transformed in the main thread.
+
+    Args:
+        loader (DataLoader): The wrapped loader.
+        device (torch.device): The target device, None keeps the batches on the cpu.
+        depth (int): The number of batches prepared in advance.
+        batch_transform (callable): The transform of the batches on the device, called with device.
+    """
+    def __init__(self, loader, device=None, depth=2, batch_transform=None):
+        self.loader = loader
+        self.device = device
+        self.depth = depth
+        self.batch_transform = batch_transform
+        self.thread = None
+        self.stop_event = None
+
+    @staticmethod
+    def get_workers(configer):
+        """Return data.workers as a dict, whose num_workers is overridden by data.num_workers (--workers)."""
+        workers = configer.get('data', 'workers')
+        if not isinstance(workers, dict):
+            # The int config keeps the workers of the plain DataLoader.
+            workers = dict(num_workers=workers, persistent=False)
+
+        workers = dict(workers)
+        if configer.get('data.num_workers', default=None) is not None:
+            workers['num_workers'] = configer.get('data.num_workers')
+
+        return workers
+
+    @staticmethod
+    def get_worker_args(configer):
+        workers = PrefetchLoader.get_workers(configer)
+        worker_args = dict(num_workers=workers['num_workers'])
+        if workers['num_workers'] > 0:
+            worker_args['persistent_workers'] = workers.get('persistent', True)
+            if workers.get('prefetch_factor', None) is not None:
+                worker_args['prefetch_factor'] = workers['prefetch_factor']
+
+        return worker_args
+
+    @staticmethod
+    def wrap(loader, configer, batch_transform=None):
+        depth = PrefetchLoader.get_workers(configer).get('device_prefetch', 0)
+        if batch_transform is not None and not batch_transform.enabled:
+            batch_transform = None
+
+        if depth <= 0 and batch_transform is None:
+            return loader
+
+        if configer.get('gpu') is None or not torch.cuda.is_available():
+            return PrefetchLoader(loader, device=None, depth=depth, batch_transform=batch_transform)
+
+        return PrefetchLoader(loader, device=torch.device('cuda'), depth=depth, batch_transform=batch_transform)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, name):
+        # dataset, sampler, batch_sampler... of the wrapped loader.
+        if name == 'loader':
+            raise AttributeError(name)
+
+        return getattr(self.loader, name)
+
+    def __iter__(self):
+        self._stop()
+        if self.device is not None and self.device.index is None:
+            self.device = torch.device('cuda', torch.cuda.current_device())
+
+        if self.depth <= 0:
+            for batch in self.loader:
+                yield self._transform(batch if self.device is None else self._to_device(batch))
+
+            return
+
+        batch_queue = queue.Queue(maxsize=self.depth)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._produce, args=(batch_queue, self.stop_event), daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                item = batch_queue.get()
+                if item is None:
+                    return
+
+                if isinstance(item, BaseException):
+                    raise item
+
+                batch, event = item
+                if event is not None:
+                    current_stream = torch.cuda.current_stream(self.device)
+                    current_stream.wait_event(event)
+                    self._record_stream(batch, current_stream)
+
+                yield self._transform(batch)
+
+        finally:
+            self._stop()
+
+    def _stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    @staticmethod
+    def _put(batch_queue, stop_event, item):
+        while not stop_event.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return True
+
+            except queue.Full:
+                continue
+
+        return False
+
+    def _produce(self, batch_queue, stop_event):
+        stream = None
+        if self.device is not None:
+            torch.cuda.set_device(self.device)
+            stream = torch.cuda.Stream(self.device)
+
+        try:
+            for batch in self.loader:
+                event = None
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        batch = self._to_device(batch)
+                        event = torch.cuda.Event()
+                        event.record(stream)
+
+                if not self._put(batch_queue, stop_event, (batch, event)):
+                    return
+
+        except Exception as e:
+            Log.error('PrefetchLoader: {}'.format(sys.exc_info()[1]))
+            self._put(batch_queue, stop_event, e)
+            return
+
+        self._put(batch_queue, stop_event, None)
+
+    def _transform(self, batch):
+        return batch if self.batch_transform is None else self.batch_transform(batch, device=self.device)
+
+    def _to_device(self, in_data):
+        if isinstance(in_data, tuple):
+            return tuple(self._to_device(item) for item in in_data)
+
+        if isinstance(in_data, list):
+            return [self._to_device(item) for item in in_data]
+
+        if isinstance(in_data, dict):
+            return {k: self._to_device(v) for k, v in in_data.items()}
+
+        return in_data.to(self.device, non_blocking=True) if isinstance(in_data, torch.Tensor) else in_data
+
+    def _record_stream(self, in_data, stream):
+        # The memory allocated on the side stream is not reused until the main stream is done with it.
+        if isinstance(in_data, (list, tuple)):
+            for item in in_data:
+                self._record_stream(item, stream)
+
+        elif isinstance(in_data, dict):
+            for item in in_data.values():
+                self._record_stream(item, stream)
+
+        elif isinstance(in_data, torch.Tensor) and in_data.is_cuda:
+            in_data.record_stream(stream)
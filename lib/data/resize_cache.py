@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Offline cache of the images & labelmaps after the deterministic prefix of aug_trans.
+
+
+import os
+import json
+import hashlib
+import numpy as np
+from PIL import Image
+
+from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.util.logger import Logger as Log
+
+
+META_FILE = 'meta.json'
+
+
+class ResizeCache(object):
+    """Store of the samples after the deterministic prefix of trans_seq, e.g. a resize and a center crop.
+
+    The cache is built by `python -m data.resize_cache`, under cache_root/<hash>/ with the relative paths
+    of the files in data.data_dir. The hash covers the image tool and the configs of the prefix transforms.
+    Every file is written as a lossless PNG, so a cached sample is exactly the output of the prefix, at the
+    cost of larger files than the JPEG sources. The datasets read the cached files of a sample (the image,
+    and the labelmap for seg) instead of the original ones, and the aug transform skips the prefix for them.
+
+    meta.json is written when the build finishes, with the cached files and the sizes of the original
+    images, so neither a stat nor a header read is needed for a cached sample. The samples missing in the
+    cache, or all of them if the prefix changes, are read from the original paths.
+
+    Args:
+        cache_root (str): The root directory of the caches, None disables the cache.
+        aug_transform (CV2AugCompose or PILAugCompose): The aug transform of the dataset.
+        configer (Configer): The configer.
+    """
+    def __init__(self, cache_root=None, aug_transform=None, configer=None):
+        # Only the picklable states are kept, the samples are built in a process pool.
+        self.tool = configer.get('data', 'image_tool')
+        self.data_dir = os.path.abspath(os.path.expanduser(configer.get('data', 'data_dir')))
+        self.transforms = list()
+        self.trans_configs = list()
+        self.cache_dir = None
+        self.file_set = set()
+        self.size_dict = dict()
+        self.ready = False
+        prefix_list = list() if aug_transform is None else aug_transform.get_cache_prefix()
+        if cache_root is None or len(prefix_list) == 0:
+            return
+
+        self.transforms = [aug_transform.transforms[trans_key] for trans_key in prefix_list]
+        self.trans_configs = [aug_transform.trans_dict[trans_key] for trans_key in prefix_list]
+        config_str = json.dumps(dict(tool=self.tool, format='png', transforms=self.trans_configs), sort_keys=True)
+        self.cache_dir = os.path.join(os.path.expanduser(cache_root),
+                                      hashlib.md5(config_str.encode('utf-8')).hexdigest()[:16])
+        meta_path = os.path.join(self.cache_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            Log.warn('Resize cache {} is not built, the original images are read.'.format(self.cache_dir))
+            return
+
+        with open(meta_path, 'r') as read_stream:
+            meta_dict = json.load(read_stream)
+
+        self.file_set = set(meta_dict['files'])
+        self.size_dict = meta_dict['sizes']
+        self.ready = True
+
+    @property
+    def enabled(self):
+        return self.cache_dir is not None
+
+    def _rel_path(self, file_path):
+        file_path = os.path.abspath(file_path)
+        rel_path = os.path.relpath(file_path, self.data_dir)
+        if rel_path.startswith(os.pardir):
+            rel_path = '{}{}'.format(hashlib.md5(file_path.encode('utf-8')).hexdigest(),
+                                     os.path.splitext(file_path)[1])
+
+        return rel_path.replace(os.sep, '/')
+
+    def _cache_path(self, rel_path):
+        # The extension of the source is kept in the name, so a.jpg & a.png are cached apart.
+        return os.path.join(self.cache_dir, '{}.png'.format(rel_path))
+
+    def get_paths(self, *path_list):
+        """Return the cached files of a sample and True if they are all cached, else the original files and False."""
+        if not self.ready:
+            return list(path_list), False
+
+        rel_list = [self._rel_path(path) for path in path_list]
+        if not all(rel_path in self.file_set for rel_path in rel_list):
+            return list(path_list), False
+
+        return [self._cache_path(rel_path) for rel_path in rel_list], True
+
+    def get_size(self, image_path):
+        """Return the [width, height] of the original image of a cached sample."""
+        return self.size_dict[self._rel_path(image_path)]
+
+    def build_item(self, path_list):
+        """Run the prefix on a sample (image path, optional labelmap path) and write its files.
+
+        Return the relative paths of the files and the size of the original image. The sample is skipped
+        if all its files exist, so an interrupted build could be resumed.
+        """
+        rel_list = [self._rel_path(path) for path in path_list]
+        if all(os.path.exists(self._cache_path(rel_path)) for rel_path in rel_list):
+            return rel_list, ImageHelper.read_size(path_list[0]), False
+
+        img = ImageHelper.read_image(path_list[0], tool=self.tool, mode='RGB' if self.tool == 'pil' else 'BGR')
+        img_size = ImageHelper.get_size(img)
+        labelmap = None
+        if len(path_list) > 1:
+            labelmap = ImageHelper.read_image(path_list[1], tool=self.tool, mode='P')
+
+        for transform in self.transforms:
+            img, labelmap = transform(img, labelmap=labelmap)[:2]
+
+        self._write(img, self._cache_path(rel_list[0]))
+        if labelmap is not None:
+            self._write(labelmap, self._cache_path(rel_list[1]))
+
+        return rel_list, img_size, True
+
+    @staticmethod
+    def _write(img, cache_path):
+        if not os.path.exists(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        # The files are written atomically, so an interrupted build could be resumed.
+        tmp_path = '{}.{}.tmp.png'.format(cache_path[:-4], os.getpid())
+        if isinstance(img, Image.Image):
+            img.save(tmp_path, format='PNG')
+        else:
+            ImageHelper.save(np.ascontiguousarray(img), tmp_path)
+
+        os.replace(tmp_path, cache_path)
+
+    def finish(self, result_list):
+        """Write meta.json of the results of build_item, merged with the built samples, e.g. of the other splits."""
+        self.file_set.update(rel_path for rel_list, _, _ in result_list for rel_path in rel_list)
+        self.size_dict.update({rel_list[0]: list(img_size) for rel_list, img_size, _ in result_list})
+        tmp_path = os.path.join(self.cache_dir, '{}.{}.tmp'.format(META_FILE, os.getpid()))
+        with open(tmp_path, 'w') as write_stream:
+            json.dump(dict(tool=self.tool, format='png', transforms=self.trans_configs,
+                           files=sorted(self.file_set), sizes=self.size_dict), write_stream)
+
+        os.replace(tmp_path, os.path.join(self.cache_dir, META_FILE))
+        self.ready = True
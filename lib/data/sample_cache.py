@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Cache of the read samples, so that the val & test samples are not decoded every epoch.
+
+
+import os
+import copy
+import pickle
+import hashlib
+import collections
+import numpy as np
+from PIL import Image
+
+
+class SampleCache(object):
+    """LRU cache of the samples read by a dataset before its augmentations, with an optional disk store.
+
+    A sample is the dict returned by the read function of the dataset, e.g. the decoded image, the labelmap,
+    the targets and the size of the original image. A PIL image is kept as its array with its mode & palette,
+    so a 'P' labelmap comes back with its palette. A sample evicted from the memory cache stays in the disk
+    store (as a pickle file, e.g. on a local SSD), and is loaded from there instead of read again. Every
+    dataloader worker owns its memory cache, so mem_size is the budget of one process.
+
+    The keys are built by the datasets from what is known after the listing, e.g. the stamps of the files in
+    the manifests or the blob keys of the shards, and the config of the decode. So a hit neither stats nor
+    parses any file.
+
+    Args:
+        mem_size (int): The memory budget in MB, 0 disables the memory cache.
+        disk_dir (str): The directory of the disk store, None disables the disk store.
+    """
+    def __init__(self, mem_size=0, disk_dir=None):
+        self.max_bytes = int(mem_size) << 20
+        self.disk_dir = None if disk_dir is None else os.path.expanduser(disk_dir)
+        self.cur_bytes = 0
+        self.entry_dict = collections.OrderedDict()
+        if self.disk_dir is not None and not os.path.exists(self.disk_dir):
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def get(self, key, read_func):
+        """Return the sample of key, read by read_func() and cached if it is missing."""
+        if not self.enabled:
+            return read_func()
+
+        key = hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+        entry = self._get(key)
+        if entry is None:
+            sample = read_func()
+            self._put(key, {name: self._pack(value) for name, value in sample.items()})
+            return sample
+
+        return {name: self._unpack(value) for name, value in entry.items()}
+
+    @staticmethod
+    def _pack(value):
+        if isinstance(value, Image.Image):
+            return 'pil', np.array(value), value.mode, value.getpalette()
+
+        # The copies, as the transforms modify the arrays in place.
+        return 'obj', copy.deepcopy(value)
+
+    @staticmethod
+    def _unpack(value):
+        if value[0] == 'obj':
+            return copy.deepcopy(value[1])
+
+        _, arr, mode, palette = value
+        img = Image.fromarray(arr.copy())
+        if palette is not None:
+            img.putpalette(palette)
+
+        return img if img.mode == mode else img.convert(mode)
+
+    @staticmethod
+    def _nbytes(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+
+        if isinstance(value, (list, tuple)):
+            return sum(SampleCache._nbytes(item) for item in value)
+
+        if isinstance(value, dict):
+            return sum(SampleCache._nbytes(item) for item in value.values())
+
+        return 8
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, '{}.pkl'.format(key))
+
+    def _get(self, key):
+        if key in self.entry_dict:
+            self.entry_dict.move_to_end(key)
+            return self.entry_dict[key][0]
+
+        if self.disk_dir is not None and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as read_stream:
+                entry = pickle.load(read_stream)
+
+            self._put_mem(key, entry)
+            return entry
+
+        return None
+
+    def _put(self, key, entry):
+        self._put_mem(key, entry)
+        if self.disk_dir is not None:
+            tmp_path = '{}.{}.tmp'.format(self._disk_path(key), os.getpid())
+            with open(tmp_path, 'wb') as write_stream:
+                pickle.dump(entry, write_stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmp_path, self._disk_path(key))
+
+    def _put_mem(self, key, entry):
+        nbytes = self._nbytes(entry)
+        if nbytes > self.max_bytes:
+            return
+
+        self.entry_dict[key] = (entry, nbytes)
+        self.cur_bytes += nbytes
+        while self.cur_bytes > self.max_bytes:
+            _, (_, old_nbytes) = self.entry_dict.popitem(last=False)
+            self.cur_bytes -= old_nbytes
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Samplers: resumable shuffle, and batches grouping the images of similar aspect ratio & size.
+
+
+import math
+import numpy as np
+import torch
+import torch.distributed as dist
+from torch.utils.data.sampler import BatchSampler, Sampler
+
+
+def get_group_ids(size_list, aspect_factor=3, size_bins=None):
+    """Bucket the images by aspect ratio and size.
+
+    The aspect ratios are quantized into 2 * aspect_factor bins spaced in log2 scale between 1/2 and 2
+    (the images beyond are in the two outer bins), and the max sides are quantized by size_bins.
+
+    Args:
+        size_list (list): The [width, height] of every image.
+        aspect_factor (int): The number of aspect ratio bins on each side of 1.0, 0 groups all the ratios.
+        size_bins (list): The thresholds of the max side, None or [] groups all the sizes.
+
+    Returns:
+        list: The group id of every image.
+    """
+    size_arr = np.array(size_list, dtype=np.float32).reshape(-1, 2)
+    aspect_bins = 2.0 ** np.linspace(-1, 1, 2 * aspect_factor + 1)[1:-1] if aspect_factor > 0 else []
+    aspect_ids = np.digitize(size_arr[:, 0] / np.maximum(size_arr[:, 1], 1), aspect_bins)
+    size_ids = np.digitize(size_arr.max(axis=1), sorted(size_bins or []))
+    return (size_ids * (len(aspect_bins) + 1) + aspect_ids).tolist()
+
+
+class GroupedBatchSampler(BatchSampler):
+    """Yield the batches of the images in the same group, in the order of the wrapped sampler.
+
+    The indices of every group are buffered until a batch is full. The indices left at the end are
+    yielded in mixed batches, so the number of batches is the same as the BatchSampler, and every
+    replica of a DistributedSampler runs the same number of iterations.
+
+    Args:
+        sampler (Sampler): The base sampler, e.g. RandomSampler or DistributedSampler.
+        group_ids (list): The group id of every image in the dataset.
+        batch_size (int): The size of the batch.
+        drop_last (bool): Whether to drop the last batch smaller than batch_size.
+    """
+    def __init__(self, sampler, group_ids, batch_size, drop_last=False):
+        if not isinstance(sampler, Sampler):
+            raise ValueError('sampler should be an instance of torch.utils.data.Sampler, '
+                             'but got sampler={}'.format(sampler))
+
+        super(GroupedBatchSampler, self).__init__(sampler, batch_size, drop_last)
+        self.group_ids = group_ids
+
+    def __iter__(self):
+        buffer_dict = dict()
+        for index in self.sampler:
+            group_buffer = buffer_dict.setdefault(self.group_ids[index], list())
+            group_buffer.append(index)
+            if len(group_buffer) == self.batch_size:
+                yield group_buffer
+                del buffer_dict[self.group_ids[index]]
+
+        batch = list()
+        for group_buffer in buffer_dict.values():
+            for index in group_buffer:
+                batch.append(index)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = list()
+
+        if len(batch) > 0 and not self.drop_last:
+            yield batch
+
+
+class ResumableSampler(Sampler):
+    """Seeded sampler, which could start from the middle of an epoch.
+
+    The order of an epoch only depends on (seed, epoch), so a resumed run recovers it from the checkpoint,
+    and skips the samples already trained without reading them. With num_replicas > 1, the indices are
+    padded and split across the replicas in the same way as DistributedSampler.
+
+    Args:
+        dataset (Dataset): The dataset to sample.
+        shuffle (bool): Whether to shuffle the indices every epoch.
+        seed (int): The seed of the shuffle, None draws one from the torch RNG (0 for the distributed replicas,
+            which must shuffle in the same way).
+        distributed (bool): Whether to split the indices across the distributed replicas.
+    """
+    def __init__(self, dataset, shuffle=True, seed=None, distributed=False):
+        self.dataset = dataset
+        self.shuffle = shuffle
+        self.num_replicas, self.rank = 1, 0
+        if distributed:
+            self.num_replicas, self.rank = dist.get_world_size(), dist.get_rank()
+
+        if seed is None:
+            seed = 0 if distributed else int(torch.randint(0, 1 << 31, (1,)).item())
+
+        self.seed = seed
+
+        self.num_samples = int(math.ceil(len(self.dataset) / self.num_replicas))
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = start
+
+    def __iter__(self):
+        if self.shuffle:
+            generator = torch.Generator()
+            generator.manual_seed(self.seed + self.epoch)
+            indices = torch.randperm(len(self.dataset), generator=generator).tolist()
+        else:
+            indices = list(range(len(self.dataset)))
+
+        total_size = self.num_samples * self.num_replicas
+        indices += indices[:(total_size - len(indices))]
+        return iter(indices[self.rank:total_size:self.num_replicas][self.start:])
+
+    def __len__(self):
+        return max(self.num_samples - self.start, 0)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Packed shard format. Many small files are packed into a few large indexed shard files.
+
+
+import os
+import json
+import mmap
+
+from lib.tools.util.logger import Logger as Log
+
+
+INDEX_FILE = 'index.json'
+JOURNAL_FILE = 'index.journal'
+SHARD_FILE = 'shard_{:05d}.bin'
+
+
+class ShardWriter(object):
+    """Write samples into large shard files with one json index.
+
+    Every sample is a record with a name, some encoded blobs (image bytes, label png bytes...)
+    and a json-serializable meta dict (bboxes, labels...). Blobs are appended to the current
+    shard until it is larger than shard_size, then a new shard is opened.
+
+    The index is written once by close(). Every flush() appends the shards & records added since the
+    former flush to a journal (one json line per flush), so the samples added before the last flush are
+    kept if the writing is interrupted. With resume, the samples in the existing index and journal are
+    kept, and the new samples are written into new shards.
+
+    Args:
+        save_dir (str): The directory of the shard files and the index file.
+        shard_size (int): The max bytes of one shard file.
+        resume (bool): Whether to append to the existing index.
+    """
+    def __init__(self, save_dir, shard_size=1 << 30, resume=False):
+        self.save_dir = save_dir
+        self.shard_size = shard_size
+        self.shard_list = list()
+        self.record_list = list()
+        self.shard_stream = None
+        self.offset = 0
+        if not os.path.exists(self.save_dir):
+            os.makedirs(self.save_dir)
+
+        if resume and os.path.exists(os.path.join(self.save_dir, INDEX_FILE)):
+            with open(os.path.join(self.save_dir, INDEX_FILE), 'r') as read_stream:
+                index_dict = json.load(read_stream)
+
+            self.shard_list = index_dict['shards']
+            self.record_list = index_dict['records']
+
+        elif os.path.exists(os.path.join(self.save_dir, INDEX_FILE)):
+            # The index of a former writing, whose shards are overwritten.
+            os.remove(os.path.join(self.save_dir, INDEX_FILE))
+
+        self.journal_stream = open(os.path.join(self.save_dir, JOURNAL_FILE), 'a+' if resume else 'w')
+        if resume:
+            self._load_journal()
+
+        # The numbers of the shards & records in the index or the journal.
+        self.num_shards = len(self.shard_list)
+        self.num_records = len(self.record_list)
+
+    def _load_journal(self):
+        self.journal_stream.seek(0)
+        content = self.journal_stream.read()
+        for line in content.splitlines():
+            try:
+                journal_dict = json.loads(line)
+            except ValueError:
+                # The last line written partially by an interrupted run.
+                continue
+
+            self.shard_list += journal_dict['shards']
+            self.record_list += journal_dict['records']
+
+        if len(content) > 0 and not content.endswith('\n'):
+            self.journal_stream.write('\n')
+
+    def _next_shard(self):
+        if self.shard_stream is not None:
+            self.shard_stream.close()
+
+        shard_name = SHARD_FILE.format(len(self.shard_list))
+        self.shard_list.append(shard_name)
+        self.shard_stream = open(os.path.join(self.save_dir, shard_name), 'wb')
+        self.offset = 0
+
+    def add(self, name, blobs=None, meta=None):
+        if self.shard_stream is None or self.offset >= self.shard_size:
+            self._next_shard()
+
+        blob_dict = dict()
+        for key, content in (blobs or dict()).items():
+            self.shard_stream.write(content)
+            blob_dict[key] = [self.offset, len(content)]
+            self.offset += len(content)
+
+        self.record_list.append(dict(name=name, shard=len(self.shard_list) - 1,
+                                     blobs=blob_dict, meta=meta or dict()))
+
+    def flush(self):
+        """Append the shards & records added since the former flush to the journal, after their blobs."""
+        if self.shard_stream is not None:
+            self.shard_stream.flush()
+
+        if self.num_records == len(self.record_list) and self.num_shards == len(self.shard_list):
+            return
+
+        self.journal_stream.write('{}\n'.format(json.dumps(dict(shards=self.shard_list[self.num_shards:],
+                                                                records=self.record_list[self.num_records:]))))
+        self.journal_stream.flush()
+        self.num_shards = len(self.shard_list)
+        self.num_records = len(self.record_list)
+
+    def close(self):
+        """Write the index of all the samples, then remove the journal."""
+        self.flush()
+        if self.shard_stream is not None:
+            self.shard_stream.close()
+            self.shard_stream = None
+
+        tmp_path = os.path.join(self.save_dir, '{}.tmp'.format(INDEX_FILE))
+        with open(tmp_path, 'w') as write_stream:
+            write_stream.write(json.dumps(dict(shards=self.shard_list, records=self.record_list)))
+
+        os.replace(tmp_path, os.path.join(self.save_dir, INDEX_FILE))
+        self.journal_stream.close()
+        os.remove(os.path.join(self.save_dir, JOURNAL_FILE))
+
+        Log.info('Packed {} samples into {} shards.'.format(len(self.record_list), len(self.shard_list)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ShardReader(object):
+    """Read the samples written by ShardWriter.
+
+    The shard files are memory-mapped lazily, so that every dataloader worker maps its own view
+    after fork and the OS page cache is shared between them.
+    """
+    def __init__(self, shard_dir):
+        index_path = os.path.join(shard_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            Log.error('Shard Index: {} not exists.'.format(index_path))
+            exit(1)
+
+        with open(index_path, 'r') as read_stream:
+            index_dict = json.load(read_stream)
+
+        self.shard_dir = shard_dir
+        # The shards are only appended before the index is written, so the mtime of the index stamps them all.
+        self.stamp = os.stat(index_path).st_mtime_ns
+        self.shard_list = index_dict['shards']
+        self.record_list = index_dict['records']
+        self.mmap_dict = dict()
+
+    def __len__(self):
+        return len(self.record_list)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['mmap_dict'] = dict()
+        return state
+
+    def _get_mmap(self, shard_id):
+        if shard_id not in self.mmap_dict:
+            with open(os.path.join(self.shard_dir, self.shard_list[shard_id]), 'rb') as read_stream:
+                self.mmap_dict[shard_id] = mmap.mmap(read_stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self.mmap_dict[shard_id]
+
+    def get_name(self, index):
+        return self.record_list[index]['name']
+
+    def get_meta(self, index):
+        return self.record_list[index]['meta']
+
+    def has_blob(self, index, key):
+        return key in self.record_list[index]['blobs']
+
+    def get_blob_key(self, index, key):
+        """Return the key of a blob, with the mtime of the index, e.g. for the key of SampleCache."""
+        record = self.record_list[index]
+        shard_path = os.path.abspath(os.path.join(self.shard_dir, self.shard_list[record['shard']]))
+        offset, length = record['blobs'][key]
+        return '{}:{}:{}:{}'.format(shard_path, self.stamp, offset, length)
+
+    def get_blob(self, index, key):
+        record = self.record_list[index]
+        offset, length = record['blobs'][key]
+        return self._get_mmap(record['shard'])[offset:offset + length]
@@ -1,5 +1,6 @@
 import torch
 from torch.autograd import Function
+from torch.cuda.amp import custom_bwd, custom_fwd
 from torch.nn.modules.utils import _pair
 
 from .. import deform_conv_cuda
@@ -8,6 +9,7 @@ from .. import deform_conv_cuda
 class DeformConvFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx,
                 input,
                 offset,
@@ -52,6 +54,7 @@ class DeformConvFunction(Function):
         return output
 
     @staticmethod
+    @custom_bwd
     def backward(ctx, grad_output):
         input, offset, weight = ctx.saved_tensors
 
@@ -108,6 +111,7 @@ class DeformConvFunction(Function):
 class ModulatedDeformConvFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx,
                 input,
                 offset,
@@ -143,6 +147,7 @@ class ModulatedDeformConvFunction(Function):
         return output
 
     @staticmethod
+    @custom_bwd
     def backward(ctx, grad_output):
         if not grad_output.is_cuda:
             raise NotImplementedError
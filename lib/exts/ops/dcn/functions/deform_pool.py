@@ -1,5 +1,6 @@
 import torch
 from torch.autograd import Function
+from torch.cuda.amp import custom_bwd, custom_fwd
 
 from .. import deform_pool_cuda
 
@@ -7,6 +8,7 @@ from .. import deform_pool_cuda
 class DeformRoIPoolingFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx,
                 data,
                 rois,
@@ -47,6 +49,7 @@ class DeformRoIPoolingFunction(Function):
         return output
 
     @staticmethod
+    @custom_bwd
     def backward(ctx, grad_output):
         if not grad_output.is_cuda:
             raise NotImplementedError
@@ -39,10 +39,11 @@ def nms(dets, iou_thr, device_id=None):
     if dets_th.shape[0] == 0:
         inds = dets_th.new_zeros(0, dtype=torch.long)
     else:
+        # The kernels only take float32, the dets could be half under autocast.
         if dets_th.is_cuda:
-            inds = nms_cuda.nms(dets_th, iou_thr)
+            inds = nms_cuda.nms(dets_th.float(), iou_thr)
         else:
-            inds = nms_cpu.nms(dets_th, iou_thr)
+            inds = nms_cpu.nms(dets_th.float(), iou_thr)
 
     if is_numpy:
         inds = inds.cpu().numpy()
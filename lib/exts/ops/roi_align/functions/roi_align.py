@@ -1,4 +1,6 @@
+import torch
 from torch.autograd import Function
+from torch.cuda.amp import custom_bwd, custom_fwd
 
 from .. import roi_align_cuda
 
@@ -6,6 +8,7 @@ from .. import roi_align_cuda
 class RoIAlignFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx, features, rois, out_size, spatial_scale, sample_num=0):
         if isinstance(out_size, int):
             out_h = out_size
@@ -36,6 +39,7 @@ class RoIAlignFunction(Function):
         return output
 
     @staticmethod
+    @custom_bwd
     def backward(ctx, grad_output):
         feature_size = ctx.feature_size
         spatial_scale = ctx.spatial_scale
@@ -1,5 +1,6 @@
 import torch
 from torch.autograd import Function
+from torch.cuda.amp import custom_bwd, custom_fwd
 
 from .. import roi_pool_cuda
 
@@ -7,6 +8,7 @@ from .. import roi_pool_cuda
 class RoIPoolFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx, features, rois, out_size, spatial_scale):
         if isinstance(out_size, int):
             out_h = out_size
@@ -35,6 +37,7 @@ class RoIPoolFunction(Function):
         return output
 
     @staticmethod
+    @custom_bwd
     def backward(ctx, grad_output):
         assert grad_output.is_cuda
         spatial_scale = ctx.spatial_scale
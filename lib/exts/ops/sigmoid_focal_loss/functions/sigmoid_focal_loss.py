@@ -1,5 +1,7 @@
+import torch
 import torch.nn.functional as F
 from torch.autograd import Function
+from torch.cuda.amp import custom_bwd, custom_fwd
 from torch.autograd.function import once_differentiable
 
 from .. import sigmoid_focal_loss_cuda
@@ -8,6 +10,7 @@ from .. import sigmoid_focal_loss_cuda
 class SigmoidFocalLossFunction(Function):
 
     @staticmethod
+    @custom_fwd(cast_inputs=torch.float32)
     def forward(ctx, input, target, gamma=2.0, alpha=0.25, reduction='mean'):
         ctx.save_for_backward(input, target)
         num_classes = input.shape[1]
@@ -28,6 +31,7 @@ class SigmoidFocalLossFunction(Function):
 
     @staticmethod
     @once_differentiable
+    @custom_bwd
     def backward(ctx, d_loss):
         input, target = ctx.saved_tensors
         num_classes = ctx.num_classes
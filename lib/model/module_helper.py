@@ -13,6 +13,7 @@ except ImportError:
     from urllib.request import urlretrieve
 
 import lib.model.base as base
+from lib.tools.helper.checkpoint_helper import CheckpointHelper
 from lib.tools.util.logger import Logger as Log
 
 
@@ -122,31 +123,15 @@ class ModuleHelper(object):
             return model
 
         Log.info('Loading pretrained model:{}'.format(pretrained))
+        # The tensors are memory-mapped, and copied into the model one by one.
+        pretrained_dict = CheckpointHelper.load(pretrained, map_location=map_location)
         if all_match:
-            pretrained_dict = torch.load(pretrained, map_location=map_location)
-            model_dict = model.state_dict()
-            load_dict = dict()
-            for k, v in pretrained_dict.items():
-                if 'prefix.{}'.format(k) in model_dict:
-                    load_dict['prefix.{}'.format(k)] = v
-                else:
-                    load_dict[k] = v
-
-            model.load_state_dict(load_dict)
+            CheckpointHelper.load_state_dict(model, pretrained_dict, strict=True)
 
         else:
-            pretrained_dict = torch.load(pretrained, map_location=map_location)
-            model_dict = model.state_dict()
-            load_dict = dict()
-            for k, v in pretrained_dict.items():
-                if 'prefix.{}'.format(k) in model_dict:
-                    load_dict['prefix.{}'.format(k)] = v
-                elif k in model_dict:
-                    load_dict[k] = v
-
-            Log.info('Matched Keys: {}'.format(load_dict.keys()))
-            model_dict.update(load_dict)
-            model.load_state_dict(model_dict)
+            # The keys not in the model, and the ones of other shapes, are skipped with a warning.
+            load_keys = CheckpointHelper.load_state_dict(model, pretrained_dict)
+            Log.info('Matched Keys: {}'.format(load_keys))
 
         return model
 
@@ -1,5 +1,8 @@
+import os
+import weakref
 import functools
 
+import numpy as np
 import torch
 
 
@@ -15,6 +18,110 @@ def assert_tensor_type(func):
     return wrapper
 
 
+# The ndarrays smaller than this are pickled with the metadata.
+SHARE_MIN_BYTES = 64 * 1024
+# The max number of the shared buffers of a dataloader worker.
+SHARE_POOL_SIZE = 64
+
+
+class SharedArray(object):
+    """An ndarray copied into a shared buffer of SharedArrayPool.
+
+    It is pickled (by the multiprocessing queues of torch) as the handle of the shared memory,
+    and unpickled as an ndarray view of it, so the payload is not serialized. The buffer is handed
+    back to the worker once the ndarray (and every view of it) is garbage collected.
+    """
+    def __init__(self, tensor, flags, slot):
+        self.tensor = tensor
+        self.flags = flags
+        self.slot = slot
+
+    def __reduce__(self):
+        return SharedArray.rebuild, (self.tensor, self.flags, self.slot)
+
+    @staticmethod
+    def rebuild(tensor, flags, slot):
+        arr = tensor.numpy()
+        weakref.finalize(arr, SharedArray.release, flags, slot)
+        return arr
+
+    @staticmethod
+    def release(flags, slot):
+        flags[slot] = 0
+
+    @staticmethod
+    def share(in_data, min_bytes=SHARE_MIN_BYTES):
+        if isinstance(in_data, dict):
+            return {k: SharedArray.share(v, min_bytes) for k, v in in_data.items()}
+
+        if isinstance(in_data, (list, tuple)):
+            return type(in_data)(SharedArray.share(item, min_bytes) for item in in_data)
+
+        if not isinstance(in_data, np.ndarray) or in_data.nbytes < min_bytes:
+            return in_data
+
+        return SharedArrayPool.get().share(in_data)
+
+
+class SharedArrayPool(object):
+    """The shared buffers of a dataloader worker, reused across the batches.
+
+    Every buffer has a flag in a shared tensor, set by the worker when the buffer is sent, and cleared
+    by the main process when the ndarray rebuilt from it is collected. A free buffer of the same shape &
+    dtype is reused, else a free slot is (re)allocated. So a worker holds at most pool_size segments,
+    and the ndarrays are pickled as usual while all the buffers are in use.
+    """
+    _instance = None
+
+    def __init__(self, pool_size=SHARE_POOL_SIZE):
+        self.pid = os.getpid()
+        self.flags = torch.zeros(pool_size, dtype=torch.uint8).share_memory_()
+        self.flag_arr = self.flags.numpy()
+        self.buffer_list = [None] * pool_size
+
+    @staticmethod
+    def get():
+        # One pool per process, never inherited by a forked worker.
+        if SharedArrayPool._instance is None or SharedArrayPool._instance.pid != os.getpid():
+            SharedArrayPool._instance = SharedArrayPool()
+
+        return SharedArrayPool._instance
+
+    def share(self, arr):
+        try:
+            dtype = torch.from_numpy(np.empty(0, dtype=arr.dtype)).dtype
+        except TypeError:
+            # The dtypes unsupported by torch, e.g. object.
+            return arr
+
+        slot = self._acquire(arr.shape, dtype)
+        if slot is None:
+            return arr
+
+        self.buffer_list[slot].numpy()[...] = arr
+        self.flag_arr[slot] = 1
+        return SharedArray(self.buffer_list[slot], self.flags, slot)
+
+    def _acquire(self, shape, dtype):
+        free_slot = None
+        for slot, buffer in enumerate(self.buffer_list):
+            if self.flag_arr[slot] != 0:
+                continue
+
+            if buffer is not None and buffer.size() == shape and buffer.dtype == dtype:
+                return slot
+
+            # The empty slots first, then the buffers of the other shapes.
+            if free_slot is None or (buffer is None and self.buffer_list[free_slot] is not None):
+                free_slot = slot
+
+        if free_slot is not None:
+            self.buffer_list[free_slot] = None
+            self.buffer_list[free_slot] = torch.empty(shape, dtype=dtype).share_memory_()
+
+        return free_slot
+
+
 class DataContainer(object):
     """A container for any type of objects.
 
@@ -73,6 +180,14 @@ class DataContainer(object):
     def padding_value(self):
         return self._padding_value
 
+    def share_memory_(self, min_bytes=SHARE_MIN_BYTES):
+        """Copy the large ndarrays in the data to the shared buffers of the worker, before they are sent.
+
+        The tensors are already sent through the shared memory by torch.
+        """
+        self._data = SharedArray.share(self._data, min_bytes)
+        return self
+
     @assert_tensor_type
     def size(self, *args, **kwargs):
         return self.data.size(*args, **kwargs)
@@ -14,10 +14,7 @@ from torch.nn.parallel._functions import Broadcast
 from torch.nn.parallel.data_parallel import DataParallel
 from torch.nn.parallel.parallel_apply import get_a_var
 from torch.nn.parallel.scatter_gather import gather
-try:
-    from torch._six import container_abcs
-except:
-    print("torch._six ImportError: Lower version of pytorch.")
+from collections import abc as container_abcs
 
 from .scatter_gather import scatter_kwargs
 
@@ -92,6 +89,17 @@ class ParallelCriterion(DataParallel):
             return Reduce.apply(*outputs) / len(outputs)
 
 
+def _get_autocast_state(device_type):
+    # torch.get_autocast_dtype replaces the per-device getters since torch 2.4.
+    if hasattr(torch, 'get_autocast_dtype'):
+        return torch.is_autocast_enabled(device_type), torch.get_autocast_dtype(device_type)
+
+    if device_type == 'cpu':
+        return torch.is_autocast_cpu_enabled(), torch.get_autocast_cpu_dtype()
+
+    return torch.is_autocast_enabled(), torch.get_autocast_gpu_dtype()
+
+
 def _criterion_parallel_apply(modules, inputs, kwargs_tup=None, devices=None):
     assert len(modules) == len(inputs)
     if kwargs_tup:
@@ -106,13 +114,18 @@ def _criterion_parallel_apply(modules, inputs, kwargs_tup=None, devices=None):
     lock = threading.Lock()
     results = {}
     grad_enabled = torch.is_grad_enabled()
+    # The autocast state is thread local, the threads run the losses in the same precision as the caller.
+    cuda_enabled, cuda_dtype = _get_autocast_state('cuda')
+    cpu_enabled, cpu_dtype = _get_autocast_state('cpu')
 
     def _worker(i, module, input, kwargs, device=None):
         torch.set_grad_enabled(grad_enabled)
         if device is None:
             device = get_a_var(input).get_device()
         try:
-            with torch.cuda.device(device):
+            with torch.cuda.device(device), \
+                    torch.autocast(device_type='cuda', enabled=cuda_enabled, dtype=cuda_dtype), \
+                    torch.autocast(device_type='cpu', enabled=cpu_enabled, dtype=cpu_dtype):
                 output = module(input, **kwargs)
             with lock:
                 results[i] = output
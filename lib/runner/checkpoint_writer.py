@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Checkpoint writer in background, writing the state once for all the names of a save.
+
+
+import os
+import re
+import copy
+import atexit
+import queue
+import shutil
+import threading
+import torch
+
+from lib.tools.util.logger import Logger as Log
+
+
+class CheckpointWriter(object):
+    """Write the checkpoints of RunnerHelper.save_net in a background thread.
+
+    A save snapshots the state to the cpu once (the train goes on modifying the parameters in place), writes
+    it to the first path, and hardlinks it to the other paths (copied if the links are not supported). Every
+    file is written to a temp file and renamed, so an interrupted write never leaves a broken checkpoint, and
+    the links of the former saves still point to their own files. At most one save waits behind the one being
+    written, so the snapshots in memory stay bounded.
+
+    The config:
+        network.async_save (bool): Write in the background thread, default True.
+        network.keep_iters (int): The number of the latest _iters checkpoints kept, None keeps all.
+    """
+    _instance = None
+
+    def __init__(self, async_save=True):
+        self.async_save = async_save
+        self.save_queue = None
+        self.thread = None
+        self.error = None
+
+    @staticmethod
+    def get(configer):
+        if CheckpointWriter._instance is None:
+            CheckpointWriter._instance = CheckpointWriter(configer.get('network.async_save', default=True))
+            atexit.register(CheckpointWriter._instance.flush)
+
+        return CheckpointWriter._instance
+
+    @staticmethod
+    def snapshot(state):
+        """Copy the tensors of the state to the cpu, and the other items, detached from the train."""
+        def to_cpu(data):
+            if isinstance(data, torch.Tensor):
+                return data.detach().to('cpu', non_blocking=True, copy=True)
+
+            if isinstance(data, dict):
+                out = type(data)((k, to_cpu(v)) for k, v in data.items())
+                if hasattr(data, '_metadata'):
+                    # The versions of the modules in a state_dict.
+                    out._metadata = copy.deepcopy(data._metadata)
+
+                return out
+
+            if isinstance(data, (list, tuple)):
+                return type(data)(to_cpu(item) for item in data)
+
+            return copy.deepcopy(data)
+
+        state = to_cpu(state)
+        if torch.cuda.is_available():
+            # The non_blocking copies of all the tensors are waited once.
+            torch.cuda.synchronize()
+
+        return state
+
+    def save(self, state, path_list, prune_pattern=None, keep=None):
+        """Save the state to all the paths, then prune the files matching prune_pattern except the keep latest.
+
+        Args:
+            state (dict): The checkpoint, snapshotted before the return.
+            path_list (list): The paths of the checkpoint.
+            prune_pattern (str): The regex of the pruned file names, with the number to sort as the first group.
+            keep (int): The number of the kept files of prune_pattern, None keeps all.
+        """
+        self._check_error()
+        task = (self.snapshot(state), list(path_list), prune_pattern, keep)
+        if not self.async_save:
+            self._write(*task)
+            return
+
+        if self.thread is None:
+            self.save_queue = queue.Queue(maxsize=1)
+            self.thread = threading.Thread(target=self._consume, daemon=True)
+            self.thread.start()
+
+        self.save_queue.put(task)
+
+    def flush(self):
+        """Wait for the saves in the queue."""
+        if self.save_queue is not None:
+            self.save_queue.join()
+
+        self._check_error()
+
+    def _check_error(self):
+        if self.error is not None:
+            Log.error('Checkpoint writing failed: {}'.format(self.error))
+            exit(1)
+
+    def _consume(self):
+        while True:
+            task = self.save_queue.get()
+            try:
+                self._write(*task)
+
+            except Exception as e:
+                self.error = e
+
+            finally:
+                self.save_queue.task_done()
+
+    @staticmethod
+    def _write(state, path_list, prune_pattern, keep):
+        tmp_path = '{}.{}.tmp'.format(path_list[0], os.getpid())
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path_list[0])
+        for path in path_list[1:]:
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            try:
+                os.link(path_list[0], tmp_path)
+            except OSError:
+                shutil.copyfile(path_list[0], tmp_path)
+
+            os.replace(tmp_path, path)
+
+        if prune_pattern is not None and keep is not None:
+            CheckpointWriter._prune(os.path.dirname(path_list[0]), prune_pattern, keep)
+
+    @staticmethod
+    def _prune(checkpoints_dir, prune_pattern, keep):
+        matched_list = list()
+        for file_name in os.listdir(checkpoints_dir):
+            matched = re.fullmatch(prune_pattern, file_name)
+            if matched is not None:
+                matched_list.append((int(matched.group(1)), file_name))
+
+        for _, file_name in sorted(matched_list)[:max(len(matched_list) - keep, 0)]:
+            Log.info('Remove the old checkpoint {}.'.format(file_name))
+            os.remove(os.path.join(checkpoints_dir, file_name))
@@ -6,6 +6,8 @@
 
 import os
 
+from lib.data.sampler import ResumableSampler
+from lib.runner.checkpoint_writer import CheckpointWriter
 from lib.tools.helper.file_helper import FileHelper
 from lib.tools.util.logger import Logger as Log
 
@@ -23,31 +25,57 @@ class Controller(object):
         runner.runner_state['max_performance'] = 0
         runner.runner_state['min_val_loss'] = 0
 
+    @staticmethod
+    def _set_epoch(runner):
+        # Restart the sampler at the position saved in runner_state, so a resumed epoch skips the trained samples.
+        sampler = runner.train_loader.batch_sampler.sampler
+        if not hasattr(sampler, 'set_epoch'):
+            return
+
+        if not isinstance(sampler, ResumableSampler):
+            sampler.set_epoch(runner.runner_state['epoch'])
+            return
+
+        if 'sampler_seed' in runner.runner_state:
+            sampler.seed = runner.runner_state['sampler_seed']
+        else:
+            runner.runner_state['sampler_seed'] = sampler.seed
+
+        if runner.runner_state.get('sampler_epoch', None) != runner.runner_state['epoch']:
+            runner.runner_state['sampler_epoch'] = runner.runner_state['epoch']
+            runner.runner_state['epoch_start_iters'] = runner.runner_state['iters']
+
+        # Every iter is one optimizer step over accum_steps micro-batches of the loader.
+        batch_size = runner.train_loader.batch_sampler.batch_size * runner.configer.get('solver.accum_steps', default=1)
+        start = (runner.runner_state['iters'] - runner.runner_state['epoch_start_iters']) * batch_size
+        if start > 0:
+            Log.info('Skip {} samples of epoch {}.'.format(start, runner.runner_state['epoch']))
+
+        sampler.set_epoch(runner.runner_state['epoch'], start=start)
+
     @staticmethod
     def train(runner):
         Log.info('Training start...')
         if runner.configer.get('network', 'resume') is not None and runner.configer.get('network', 'resume_val'):
-            runner.val()
+            runner.engine.val()
 
         if runner.configer.get('solver', 'lr')['metric'] == 'epoch':
             while runner.runner_state['epoch'] < runner.configer.get('solver', 'max_epoch'):
-                if runner.configer.get('network.distributed'):
-                    runner.train_loader.sampler.set_epoch(runner.runner_state['epoch'])
-
+                Controller._set_epoch(runner)
                 runner.train()
                 if runner.runner_state['epoch'] == runner.configer.get('solver', 'max_epoch'):
-                    runner.val()
+                    runner.engine.val()
                     break
         else:
             while runner.runner_state['iters'] < runner.configer.get('solver', 'max_iters'):
-                if runner.configer.get('network.distributed'):
-                    runner.train_loader.sampler.set_epoch(runner.runner_state['epoch'])
-
+                Controller._set_epoch(runner)
                 runner.train()
                 if runner.runner_state['iters'] == runner.configer.get('solver', 'max_iters'):
-                    runner.val()
+                    runner.engine.val()
                     break
 
+        # Wait for the checkpoints written in background.
+        CheckpointWriter.get(runner.configer).flush()
         Log.info('Training end...')
 
     @staticmethod
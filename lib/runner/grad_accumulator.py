@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Gradient accumulation: one optimizer step over several micro-batches.
+
+
+import contextlib
+
+from lib.tools.util.logger import Logger as Log
+
+
+class GradAccumulator(object):
+    """Accumulate the gradients of solver.accum_steps micro-batches before every optimizer step.
+
+    train.batch_size stays the batch size of an optimizer step: the train loaders yield the micro-batches of
+    train.batch_size / accum_steps, so a config keeps its lr & schedule on a smaller device. The iters of
+    runner_state (warmup, display_iter, save_iters, max_iters) count the optimizer steps.
+
+    Usage:
+        for data_list in runner.accum.group(runner.train_loader):
+            Trainer.update(...)
+            optimizer.zero_grad()
+            for data_dict, loss_scale in runner.accum.micro_steps(net, data_list):
+                loss = ...
+                runner.amp.backward(loss * loss_scale)
+
+            runner.amp.step(optimizer)
+    """
+    def __init__(self, configer):
+        self.accum_steps = configer.get('solver.accum_steps', default=1)
+
+    @staticmethod
+    def get_micro_batch_size(configer):
+        batch_size = configer.get('train', 'batch_size')
+        accum_steps = configer.get('solver.accum_steps', default=1)
+        if batch_size % accum_steps != 0:
+            Log.error('Batch size {} is not divisible by accum_steps {}.'.format(batch_size, accum_steps))
+            exit(1)
+
+        return batch_size // accum_steps
+
+    def group(self, data_loader):
+        # The micro-batches left at the end of an epoch make a smaller step.
+        data_list = list()
+        for data_dict in data_loader:
+            data_list.append(data_dict)
+            if len(data_list) == self.accum_steps:
+                yield data_list
+                data_list = list()
+
+        if len(data_list) > 0:
+            yield data_list
+
+    @staticmethod
+    def micro_steps(net, data_list):
+        """Yield every micro-batch with the scale of its loss, the mean over the micro-batches of the step.
+
+        The backward of the caller runs inside the loop, so the DistributedDataParallel net skips the
+        allreduce of the gradients by no_sync on all but the last micro-batch.
+        """
+        for i, data_dict in enumerate(data_list):
+            if i < len(data_list) - 1 and hasattr(net, 'no_sync'):
+                sync_context = net.no_sync()
+            else:
+                sync_context = contextlib.suppress()
+
+            with sync_context:
+                yield data_dict, 1.0 / len(data_list)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Hooks of the train engine: lr update, async logging, checkpoints & val.
+
+
+import queue
+import threading
+import torch
+
+from lib.runner.runner_helper import RunnerHelper
+from lib.runner.trainer import Trainer
+from lib.tools.util.average_meter import TensorDictAverageMeter
+from lib.tools.util.logger import Logger as Log
+
+
+class Hook(object):
+    """The base of the hooks of TrainEngine, every method is called with the engine:
+        before_epoch, after_epoch: Around the train loop of an epoch.
+        before_step, after_step: Around every optimizer step, runner_state['iters'] is increased before after_step.
+        before_val, after_val: Around every val of the runner.
+    """
+    def before_epoch(self, engine):
+        pass
+
+    def after_epoch(self, engine):
+        pass
+
+    def before_step(self, engine):
+        pass
+
+    def after_step(self, engine):
+        pass
+
+    def before_val(self, engine):
+        pass
+
+    def after_val(self, engine):
+        pass
+
+
+class LrUpdateHook(Hook):
+    """Update the lr (scheduler & warmup) by Trainer.update before every step."""
+    def __init__(self, warm_list=(), warm_lr_list=None):
+        self.warm_list = warm_list
+        self.warm_lr_list = warm_lr_list
+
+    def before_step(self, engine):
+        Trainer.update(engine.runner, warm_list=self.warm_list, warm_lr_list=self.warm_lr_list,
+                       solver_dict=engine.runner.configer.get('solver'))
+
+
+class LoggerHook(Hook):
+    """Log the train states every solver.display_iter iters in a background thread.
+
+    The averages of the losses stay on the device until the log, then they are copied to the host with
+    non_blocking and an event, which only the thread waits for. So the train loop never waits for the device
+    to log, and the times of the log are the times of the host between the logs.
+    """
+    def __init__(self):
+        self.log_queue = None
+        self.thread = None
+
+    def _consume(self):
+        while True:
+            prefix, key_list, avg, norm_keys, norms, event = self.log_queue.get()
+            try:
+                if event is not None:
+                    event.synchronize()
+
+                avg_list = list() if avg is None else avg.tolist()
+                norm_msg = '' if norms is None else '\tGrad Norm = {}'.format(
+                    TensorDictAverageMeter.info(norm_keys, norms.tolist()))
+                Log.info('{}Loss = {}{}\n'.format(prefix, TensorDictAverageMeter.info(key_list, avg_list), norm_msg))
+
+            finally:
+                self.log_queue.task_done()
+
+    def flush(self):
+        if self.log_queue is not None:
+            self.log_queue.join()
+
+    def after_step(self, engine):
+        runner = engine.runner
+        display_iter = runner.configer.get('solver', 'display_iter')
+        if runner.runner_state['iters'] % display_iter != 0:
+            return
+
+        key_list, avg = engine.train_losses.avg_tensor()
+        # The norms of the gradients of the last step, with solver.grad_norm_depth.
+        norm_keys, norms = list(), None
+        if engine.grad_norms is not None:
+            norm_keys = list(engine.grad_norms.keys())
+            norms = torch.stack(list(engine.grad_norms.values()))
+
+        event = None
+        if any(item is not None and item.is_cuda for item in (avg, norms)):
+            avg = None if avg is None else avg.to('cpu', non_blocking=True)
+            norms = None if norms is None else norms.to('cpu', non_blocking=True)
+            event = torch.cuda.Event()
+            event.record()
+
+        lr_list = [RunnerHelper.get_lr(optimizer) for optimizer in engine.optimizers]
+        prefix = 'Train Epoch: {0}\tTrain Iteration: {1}\t' \
+                 'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t' \
+                 'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n' \
+                 'Learning rate = {3}\t'.format(runner.runner_state['epoch'], runner.runner_state['iters'],
+                                                display_iter, lr_list[0] if len(lr_list) == 1 else lr_list,
+                                                batch_time=engine.batch_time, data_time=engine.data_time)
+        if self.thread is None:
+            self.log_queue = queue.Queue()
+            self.thread = threading.Thread(target=self._consume, daemon=True)
+            self.thread.start()
+
+        self.log_queue.put((prefix, key_list, avg, norm_keys, norms, event))
+        engine.batch_time.reset()
+        engine.data_time.reset()
+        engine.train_losses.reset()
+
+    def after_epoch(self, engine):
+        self.flush()
+
+    def before_val(self, engine):
+        self.flush()
+
+
+class CheckpointHook(Hook):
+    """Save the checkpoint every solver.save_iters iters on the first rank."""
+    def after_step(self, engine):
+        configer = engine.runner.configer
+        save_iters = configer.get('solver.save_iters', default=None)
+        if save_iters is not None and engine.runner.runner_state['iters'] % save_iters == 0 \
+                and configer.get('local_rank') == 0:
+            RunnerHelper.save_net(engine.runner, engine.net)
+
+
+class EvalHook(Hook):
+    """Val the current model every solver.test_interval iters.
+
+    Args:
+        skip_distributed (bool): Skip the val with network.distributed, as every rank would val the model.
+    """
+    def __init__(self, skip_distributed=False):
+        self.skip_distributed = skip_distributed
+
+    def after_step(self, engine):
+        configer = engine.runner.configer
+        if engine.max_iters_reached():
+            # The last val is run by Controller.train.
+            return
+
+        if self.skip_distributed and configer.get('network.distributed', default=False):
+            return
+
+        if engine.runner.runner_state['iters'] % configer.get('solver', 'test_interval') == 0:
+            engine.val()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Mixed precision training: autocast of the forward & loss, and the scaled backward.
+
+
+import contextlib
+import torch
+
+from lib.tools.util.logger import Logger as Log
+
+
+class MixedPrecision(object):
+    """The precision policy of the train step, set by solver.amp.
+
+    solver.amp is false (fp32), true (fp16 on cuda, bf16 on cpu), 'fp16' or 'bf16'. The forward and the loss
+    run in autocast, and with fp16 the loss is scaled by a GradScaler before the backward. bf16 has the range
+    of fp32, so its gradients are not scaled. torch.autocast of the device type needs torch 1.10 or later.
+
+    Usage:
+        with runner.amp.autocast():
+            out = net(data_dict)
+            loss_dict = criterion(out)
+
+        optimizer.zero_grad()
+        runner.amp.backward(loss_dict['loss'])
+        runner.amp.unscale_(optimizer)  # Only before clipping the gradients.
+        runner.amp.step(optimizer)
+    """
+    def __init__(self, configer):
+        amp = configer.get('solver.amp', default=False)
+        self.device_type = 'cpu' if configer.get('gpu') is None else 'cuda'
+        self.enabled = amp not in (None, False)
+        self.dtype = None
+        if self.enabled:
+            if amp is True:
+                amp = 'fp16' if self.device_type == 'cuda' else 'bf16'
+
+            if amp not in ('fp16', 'bf16'):
+                Log.error('Amp mode: {} is not valid.'.format(amp))
+                exit(1)
+
+            if amp == 'fp16' and self.device_type == 'cpu':
+                Log.warn('Autocast of fp16 is not supported on cpu, bf16 is used instead.')
+                amp = 'bf16'
+
+            self.dtype = torch.float16 if amp == 'fp16' else torch.bfloat16
+            Log.info('Mixed precision training with {} on {}.'.format(amp, self.device_type))
+
+        self.scaler = None
+        if self.dtype == torch.float16:
+            self.scaler = torch.cuda.amp.GradScaler()
+
+    def autocast(self):
+        if not self.enabled:
+            return contextlib.suppress()
+
+        return torch.autocast(device_type=self.device_type, dtype=self.dtype)
+
+    def backward(self, loss, inputs=None):
+        # inputs limits the accumulated gradients to some parameters, e.g. of one of the G & D optimizers.
+        if self.scaler is None:
+            loss.backward(inputs=inputs)
+        else:
+            self.scaler.scale(loss).backward(inputs=inputs)
+
+    def unscale_(self, optimizer):
+        # Unscale the gradients in place, e.g. before RunnerHelper.clip_grad.
+        if self.scaler is not None:
+            self.scaler.unscale_(optimizer)
+
+    def step(self, optimizer, update=True):
+        # With several optimizers (e.g. G & D), only the last step updates the scale.
+        if self.scaler is None:
+            optimizer.step()
+            return
+
+        self.scaler.step(optimizer)
+        if update:
+            self.scaler.update()
+
+    def state_dict(self):
+        return None if self.scaler is None else self.scaler.state_dict()
+
+    def load_state_dict(self, state_dict):
+        if self.scaler is not None and state_dict is not None:
+            self.scaler.load_state_dict(state_dict)
@@ -4,13 +4,17 @@
 # Some runner used by main runner.
 
 
-import math
 import os
+import random
+import re
 from collections import OrderedDict
+import numpy as np
 import torch
 import torch.nn as nn
 from torch.nn.parallel.scatter_gather import gather as torch_gather
 
+from lib.runner.checkpoint_writer import CheckpointWriter
+from lib.tools.helper.checkpoint_helper import CheckpointHelper, ShardedStateDict
 from lib.tools.helper.dist_helper import DistHelper
 from lib.tools.util.logger import Logger as Log
 
@@ -18,15 +22,15 @@ from lib.tools.util.logger import Logger as Log
 class RunnerHelper(object):
 
     @staticmethod
-    def to_device(runner, in_data):
+    def to_device(runner, in_data, non_blocking=False):
         device = torch.device('cpu' if runner.configer.get('gpu') is None else 'cuda')
         if isinstance(in_data, (list, tuple)):
-            return [RunnerHelper.to_device(runner, item) for item in in_data]
+            return [RunnerHelper.to_device(runner, item, non_blocking=non_blocking) for item in in_data]
 
         if isinstance(in_data, dict):
-            return {k: RunnerHelper.to_device(runner, v) for k, v in in_data.items()}
+            return {k: RunnerHelper.to_device(runner, v, non_blocking=non_blocking) for k, v in in_data.items()}
 
-        return in_data.to(device) if isinstance(in_data, torch.Tensor) else in_data
+        return in_data.to(device, non_blocking=non_blocking) if isinstance(in_data, torch.Tensor) else in_data
 
     @staticmethod
     def _make_parallel(runner, net):
@@ -58,14 +62,15 @@ class RunnerHelper(object):
             resume_path = runner.configer.get('network', 'resume')
             resume_path = model_path if model_path is not None else resume_path
             Log.info('Resuming from {}'.format(resume_path))
-            resume_dict = torch.load(resume_path, map_location=map_location)
+            # The tensors are memory-mapped, and copied into the net one by one.
+            resume_dict = CheckpointHelper.load(resume_path, map_location=map_location)
             if 'state_dict' in resume_dict:
                 checkpoint_dict = resume_dict['state_dict']
 
             elif 'model' in resume_dict:
                 checkpoint_dict = resume_dict['model']
 
-            elif isinstance(resume_dict, OrderedDict):
+            elif isinstance(resume_dict, (OrderedDict, ShardedStateDict)):
                 checkpoint_dict = resume_dict
 
             else:
@@ -82,6 +87,11 @@ class RunnerHelper(object):
             if runner.configer.get('network', 'resume_continue'):
                 # runner.configer.resume(resume_dict['config_dict'])
                 runner.runner_state = resume_dict['runner_state']
+                if 'rng_state' in resume_dict:
+                    RunnerHelper.set_rng_state(resume_dict['rng_state'])
+
+                if getattr(runner, 'amp', None) is not None:
+                    runner.amp.load_state_dict(resume_dict.get('amp_state', None))
 
         net = RunnerHelper._make_parallel(runner, net)
         return net
@@ -94,61 +104,36 @@ class RunnerHelper(object):
         param mismatch will be shown even if strict is False.
         Args:
             module (Module): Module that receives the state_dict.
-            state_dict (OrderedDict): Weights.
+            state_dict (OrderedDict or ShardedStateDict): Weights, streamed into the module tensor by tensor.
             strict (bool): whether to strictly enforce that the keys
                 in :attr:`state_dict` match the keys returned by this module's
                 :meth:`~torch.nn.Module.state_dict` function. Default: ``False``.
         """
+        return CheckpointHelper.load_state_dict(module, state_dict, strict=strict)
 
-        if list(state_dict.keys())[0].startswith('module.'):
-            state_dict = {k[7:]: v for k, v in state_dict.items()}
-
-        unexpected_keys = []
-        unmatched_keys = []
-        own_state = module.state_dict()
-        for name, param in state_dict.items():
-            if name not in own_state:
-                unexpected_keys.append(name)
-                continue
-            if isinstance(param, torch.nn.Parameter):
-                # backwards compatibility for serialized parameters
-                param = param.data
+    @staticmethod
+    def get_rng_state():
+        # The worker seeds are drawn from the torch RNG, so the augmentation of a resumed run is reproducible.
+        return dict(
+            python=random.getstate(),
+            numpy=np.random.get_state(),
+            torch=torch.get_rng_state(),
+            cuda=torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None
+        )
 
-            try:
-                own_state[name].copy_(param)
-            except Exception:
-                if strict:
-                    raise RuntimeError('While copying the parameter named {}, '
-                                       'whose dimensions in the model are {} and '
-                                       'whose dimensions in the checkpoint are {}.'
-                                       .format(name, own_state[name].size(),
-                                               param.size()))
-                else:
-                    unmatched_keys.append(name)
-
-        missing_keys = set(own_state.keys()) - set(state_dict.keys())
-
-        err_msg = []
-        if unexpected_keys:
-            err_msg.append('unexpected key in source state_dict: {}\n'.format(', '.join(unexpected_keys)))
-        if missing_keys:
-            err_msg.append('missing keys in source state_dict: {}\n'.format(', '.join(missing_keys)))
-        if unexpected_keys:
-            err_msg.append('unmatched keys in source state_dict: {}\n'.format(', '.join(unmatched_keys)))
-        err_msg = '\n'.join(err_msg)
-        if err_msg:
-            if strict:
-                raise RuntimeError(err_msg)
+    @staticmethod
+    def set_rng_state(rng_state):
+        random.setstate(rng_state['python'])
+        np.random.set_state(rng_state['numpy'])
+        torch.set_rng_state(rng_state['torch'].cpu())
+        if rng_state['cuda'] is not None and torch.cuda.is_available():
+            if len(rng_state['cuda']) == torch.cuda.device_count():
+                torch.cuda.set_rng_state_all([state.cpu() for state in rng_state['cuda']])
             else:
-                Log.warn(err_msg)
+                Log.warn('The cuda rng states of {} devices are not restored.'.format(len(rng_state['cuda'])))
 
     @staticmethod
     def save_net(runner, net, performance=None, val_loss=None, iters=None, epoch=None):
-        state = {
-            'config_dict': runner.configer.to_dict(),
-            'state_dict': net.state_dict(),
-            'runner_state': runner.runner_state
-        }
         if runner.configer.get('network', 'checkpoints_root') is None:
             checkpoints_dir = os.path.join(runner.configer.get('project_dir'),
                                            runner.configer.get('network', 'checkpoints_dir'))
@@ -159,27 +144,36 @@ class RunnerHelper(object):
         if not os.path.exists(checkpoints_dir):
             os.makedirs(checkpoints_dir)
 
-        latest_name = '{}_latest.pth'.format(runner.configer.get('network', 'checkpoints_name'))
-        torch.save(state, os.path.join(checkpoints_dir, latest_name))
+        # The names of the same state, written once by the CheckpointWriter.
+        checkpoints_name = runner.configer.get('network', 'checkpoints_name')
+        name_list = ['{}_latest.pth'.format(checkpoints_name)]
         if performance is not None:
             if performance > runner.runner_state['max_performance']:
-                latest_name = '{}_max_performance.pth'.format(runner.configer.get('network', 'checkpoints_name'))
-                torch.save(state, os.path.join(checkpoints_dir, latest_name))
+                name_list.append('{}_max_performance.pth'.format(checkpoints_name))
                 runner.runner_state['max_performance'] = performance
 
         if val_loss is not None:
             if val_loss < runner.runner_state['min_val_loss']:
-                latest_name = '{}_min_loss.pth'.format(runner.configer.get('network', 'checkpoints_name'))
-                torch.save(state, os.path.join(checkpoints_dir, latest_name))
+                name_list.append('{}_min_loss.pth'.format(checkpoints_name))
                 runner.runner_state['min_val_loss'] = val_loss
 
         if iters is not None:
-            latest_name = '{}_iters{}.pth'.format(runner.configer.get('network', 'checkpoints_name'), iters)
-            torch.save(state, os.path.join(checkpoints_dir, latest_name))
+            name_list.append('{}_iters{}.pth'.format(checkpoints_name, iters))
 
         if epoch is not None:
-            latest_name = '{}_epoch{}.pth'.format(runner.configer.get('network', 'checkpoints_name'), epoch)
-            torch.save(state, os.path.join(checkpoints_dir, latest_name))
+            name_list.append('{}_epoch{}.pth'.format(checkpoints_name, epoch))
+
+        state = {
+            'config_dict': runner.configer.to_dict(),
+            'state_dict': net.state_dict(),
+            'runner_state': runner.runner_state,
+            'rng_state': RunnerHelper.get_rng_state(),
+            'amp_state': runner.amp.state_dict() if getattr(runner, 'amp', None) is not None else None
+        }
+        CheckpointWriter.get(runner.configer).save(
+            state, [os.path.join(checkpoints_dir, name) for name in name_list],
+            prune_pattern=r'{}_iters(\d+)\.pth'.format(re.escape(checkpoints_name)),
+            keep=runner.configer.get('network.keep_iters', default=None))
 
     @staticmethod
     def freeze_bn(net, norm_type=None):
@@ -195,20 +189,64 @@ class RunnerHelper(object):
                     m.eval()
 
     @staticmethod
-    def clip_grad(net, max_grad=10.):
-        """Computes a gradient clipping coefficient based on gradient norm."""
-        total_norm = 0
-        for p in net.parameters():
-            if p.requires_grad:
-                modulenorm = p.grad.data.norm()
-                total_norm += modulenorm ** 2
+    def grad_norm(net, group_depth=None):
+        """Compute the global l2 norm of the gradients, with one batched kernel of torch._foreach_norm per group.
 
-        total_norm = math.sqrt(total_norm)
+        The norms are tensors on the device, so there is no sync of the host unless they are read. With
+        group_depth, also return the OrderedDict of the norms of the parameter groups, named by the first
+        group_depth levels of the parameter names (without module.), e.g. 1 for backbone, decoder...
+        """
+        # The gradients grouped by name, without group_depth all in one group.
+        group_depth = group_depth if group_depth is not None and group_depth > 0 else 0
+        group_dict = OrderedDict()
+        for name, p in net.named_parameters():
+            if p.grad is not None:
+                name = name[len('module.'):] if name.startswith('module.') else name
+                group = '.'.join(name.split('.')[:group_depth])
+                group_dict.setdefault(group, []).append(p.grad.detach())
+
+        if len(group_dict) == 0:
+            return torch.zeros(()), OrderedDict()
+
+        device = next(iter(group_dict.values()))[0].device
+        group_norms = OrderedDict()
+        for group, grad_list in group_dict.items():
+            if hasattr(torch, '_foreach_norm'):
+                norm_list = torch._foreach_norm(grad_list)
+            else:
+                norm_list = [grad.norm() for grad in grad_list]
 
-        norm = max_grad / max(total_norm, max_grad)
+            group_norms[group] = torch.stack([norm.float().to(device) for norm in norm_list]).norm()
+
+        total_norm = torch.stack(list(group_norms.values())).norm()
+        return total_norm, group_norms if group_depth > 0 else OrderedDict()
+
+    @staticmethod
+    def clip_grad(net, max_grad=10., total_norm=None):
+        """Clip the gradients by their global norm, in place with the batched kernels of torch._foreach_mul_.
+
+        The coef of the clip is a tensor (max_grad / total_norm, at most 1), so the clip never syncs the host.
+        Return the global norm before the clip, computed by grad_norm if total_norm is None.
+        """
+        if total_norm is None:
+            total_norm, _ = RunnerHelper.grad_norm(net)
+
+        coef = torch.clamp(max_grad / (total_norm + 1e-6), max=1.0)
+        grad_dict = dict()
         for p in net.parameters():
-            if p.requires_grad:
-                p.grad.mul_(norm)
+            if p.grad is not None:
+                grad_dict.setdefault(p.grad.device, []).append(p.grad.detach())
+
+        for device, grad_list in grad_dict.items():
+            device_coef = coef.to(device)
+            try:
+                torch._foreach_mul_(grad_list, device_coef)
+            except (AttributeError, TypeError, RuntimeError):
+                # The torch without the foreach ops of a tensor scalar.
+                for grad in grad_list:
+                    grad.mul_(device_coef)
+
+        return total_norm
 
     @staticmethod
     def gather(runner, outputs, target_device=None, dim=0):
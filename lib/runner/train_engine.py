@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# The train loop shared by the runners, extended by the hooks.
+
+
+import time
+from collections import OrderedDict
+
+from lib.runner.runner_helper import RunnerHelper
+from lib.tools.helper.dc_helper import DCHelper
+from lib.tools.util.average_meter import AverageMeter, TensorDictAverageMeter
+
+
+class TrainEngine(object):
+    """Run the train epochs of a runner, which is the adapter of a task:
+        train_step(data_dict): The forward & loss of a micro-batch, return the dict of the scalar loss tensors.
+        val(**kwargs): The val of the task, called by the engine between before_val & after_val.
+
+    Every optimizer step of the engine:
+        1. The hooks before_step, e.g. LrUpdateHook.
+        2. For every micro-batch of runner.accum (GradAccumulator): to_device, train_step in the autocast of
+           runner.amp (MixedPrecision), and the backward of the scaled loss.
+        3. The clip of the gradients, and the step of every optimizer.
+        4. runner_state['iters'] += 1, and the hooks after_step, e.g. LoggerHook, CheckpointHook, EvalHook.
+    So the precision & accumulation policies are the amp & accum of the runner.
+
+    The losses are accumulated on the device and read by the hooks, so the step has no sync of the host. The
+    tensors of the pinned batches are copied with non_blocking, and with data.workers.device_prefetch the
+    PrefetchLoader already copies the next batches on a side stream during the step.
+
+    Args:
+        runner (object): The task runner, with configer, runner_state, train_loader, amp & accum.
+        net (nn.Module): The trained net.
+        optimizers (Optimizer or list): The optimizers stepped after the micro-batches.
+        hooks (list): The hooks, called in order.
+        clip_grad (float): The max norm of the gradients, None disables the clip.
+            With solver.grad_norm_depth, the norms of the gradients of the logged steps (global & of the groups
+            of RunnerHelper.grad_norm) are kept in grad_norms, and logged by LoggerHook.
+        loss_params (dict): The loss key -> the parameters its backward accumulates, e.g. for the G & D of
+            the gans. None backwards the 'loss' to all the parameters.
+    """
+    def __init__(self, runner, net, optimizers, hooks=(), clip_grad=None, loss_params=None):
+        self.runner = runner
+        self.net = net
+        self.optimizers = list(optimizers) if isinstance(optimizers, (list, tuple)) else [optimizers]
+        self.hooks = list(hooks)
+        self.clip_grad = clip_grad
+        self.loss_params = loss_params
+        self.batch_time = AverageMeter()
+        self.data_time = AverageMeter()
+        self.train_losses = TensorDictAverageMeter()
+        self.grad_norms = None
+
+    def call_hooks(self, name):
+        for hook in self.hooks:
+            getattr(hook, name)(self)
+
+    def max_iters_reached(self):
+        configer = self.runner.configer
+        return configer.get('solver', 'lr')['metric'] == 'iters' \
+            and self.runner.runner_state['iters'] == configer.get('solver', 'max_iters')
+
+    def train(self):
+        """
+          Train function of every epoch during train phase.
+        """
+        self.net.train()
+        self.call_hooks('before_epoch')
+        start_time = time.time()
+        for data_list in self.runner.accum.group(self.runner.train_loader):
+            self.call_hooks('before_step')
+            self.data_time.update(time.time() - start_time)
+            self.run_step(data_list)
+
+            # Update the vars of the train phase.
+            self.batch_time.update(time.time() - start_time)
+            start_time = time.time()
+            self.runner.runner_state['iters'] += 1
+            self.call_hooks('after_step')
+            if self.max_iters_reached():
+                break
+
+        self.call_hooks('after_epoch')
+
+    def run_step(self, data_list):
+        runner = self.runner
+        for optimizer in self.optimizers:
+            optimizer.zero_grad()
+
+        for data_dict, loss_scale in runner.accum.micro_steps(self.net, data_list):
+            data_dict = RunnerHelper.to_device(runner, data_dict, non_blocking=True)
+            with runner.amp.autocast():
+                loss_dict = runner.train_step(data_dict)
+
+            self.train_losses.update(loss_dict, self._get_batch_size(data_dict))
+            if self.loss_params is None:
+                runner.amp.backward(loss_dict['loss'] * loss_scale)
+            else:
+                # Every loss only accumulates the gradients of its own optimizer.
+                for key, params in self.loss_params.items():
+                    runner.amp.backward(loss_dict[key] * loss_scale, inputs=params)
+
+        # The norms of the groups are only computed for the steps logged by LoggerHook (iters is increased later).
+        group_depth = runner.configer.get('solver.grad_norm_depth', default=None)
+        if (runner.runner_state['iters'] + 1) % runner.configer.get('solver', 'display_iter') != 0:
+            group_depth = None
+
+        if self.clip_grad is not None or group_depth is not None:
+            for optimizer in self.optimizers:
+                runner.amp.unscale_(optimizer)
+
+            total_norm, group_norms = RunnerHelper.grad_norm(self.net, group_depth=group_depth)
+            if self.clip_grad is not None:
+                RunnerHelper.clip_grad(self.net, self.clip_grad, total_norm=total_norm)
+
+            if group_depth is not None:
+                self.grad_norms = OrderedDict([('total', total_norm)] + list(group_norms.items()))
+
+        # With several optimizers, only the last step updates the scale of the loss.
+        for i, optimizer in enumerate(self.optimizers):
+            runner.amp.step(optimizer, update=i == len(self.optimizers) - 1)
+
+    def val(self, **kwargs):
+        self.call_hooks('before_val')
+        self.runner.val(**kwargs)
+        self.call_hooks('after_val')
+
+    @staticmethod
+    def _get_batch_size(data_dict):
+        if 'meta' in data_dict:
+            return len(DCHelper.tolist(data_dict['meta']))
+
+        return data_dict['img'].size(0)
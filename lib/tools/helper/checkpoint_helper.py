@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Lazy loading of the checkpoints, streamed into the modules parameter by parameter.
+
+
+import os
+import json
+import torch
+
+from lib.tools.util.logger import Logger as Log
+
+
+INDEX_SUFFIX = '.index.json'
+
+
+class ShardedStateDict(object):
+    """The state_dict of a sharded checkpoint, read from its index file lazily.
+
+    The index file (*.index.json) maps every key to its shard file, relative to the directory of the index:
+        {"weight_map": {"backbone.conv1.weight": "model-00001.pth", ...}}
+    The keys are known without reading the shards, and items() reads the shards one by one, so at most
+    one shard is mapped at a time.
+    """
+    def __init__(self, index_path, map_location='cpu'):
+        with open(index_path, 'r') as read_stream:
+            self.weight_map = json.load(read_stream)['weight_map']
+
+        self.shard_dir = os.path.dirname(index_path)
+        self.map_location = map_location
+        self.shard_cache = (None, None)
+
+    def __len__(self):
+        return len(self.weight_map)
+
+    def __contains__(self, key):
+        return key in self.weight_map
+
+    def __iter__(self):
+        return iter(self.weight_map)
+
+    def keys(self):
+        return self.weight_map.keys()
+
+    def _get_shard(self, shard_file):
+        if self.shard_cache[0] != shard_file:
+            self.shard_cache = (None, None)
+            self.shard_cache = (shard_file, CheckpointHelper.load(os.path.join(self.shard_dir, shard_file),
+                                                                  map_location=self.map_location))
+
+        return self.shard_cache[1]
+
+    def __getitem__(self, key):
+        return self._get_shard(self.weight_map[key])[key]
+
+    def items(self):
+        shard_dict = dict()
+        for key, shard_file in self.weight_map.items():
+            shard_dict.setdefault(shard_file, list()).append(key)
+
+        for shard_file, key_list in shard_dict.items():
+            shard = self._get_shard(shard_file)
+            for key in key_list:
+                yield key, shard[key]
+
+        self.shard_cache = (None, None)
+
+
+class CheckpointHelper(object):
+
+    @staticmethod
+    def load(checkpoint_path, map_location='cpu'):
+        """Load a checkpoint with the storages of the tensors memory-mapped, read only when they are copied.
+
+        The index file of a sharded checkpoint returns a ShardedStateDict. The checkpoints of the legacy format
+        (or an old torch without mmap), and the ones mapped to a device, are loaded fully.
+        """
+        if checkpoint_path.endswith(INDEX_SUFFIX):
+            return ShardedStateDict(checkpoint_path, map_location=map_location)
+
+        if map_location is None or (isinstance(map_location, (str, torch.device))
+                                     and torch.device(map_location).type == 'cpu'):
+            try:
+                return torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=False)
+            except (TypeError, RuntimeError):
+                Log.info('Checkpoint {} is not memory-mapped, loaded fully.'.format(checkpoint_path))
+
+        return torch.load(checkpoint_path, map_location=map_location)
+
+    @staticmethod
+    def map_key(name, own_state):
+        # The keys saved by the parallel wrappers (module.), or without the prefix of the model (prefix.).
+        if name not in own_state and name.startswith('module.'):
+            name = name[len('module.'):]
+
+        if name not in own_state and 'prefix.{}'.format(name) in own_state:
+            name = 'prefix.{}'.format(name)
+
+        return name
+
+    @staticmethod
+    def load_state_dict(module, state_dict, strict=False, report=True):
+        """Copy the state_dict into the module in place, one tensor after another.
+
+        The state_dict is a dict (e.g. of the mmaped tensors of CheckpointHelper.load) or a ShardedStateDict,
+        its keys are mapped by map_key. The unexpected, missing & unmatched keys are raised with strict, else
+        warned if report. Return the list of the loaded keys.
+        """
+        unexpected_keys = []
+        unmatched_keys = []
+        loaded_keys = []
+        own_state = module.state_dict()
+        for name, param in state_dict.items():
+            name = CheckpointHelper.map_key(name, own_state)
+            if name not in own_state:
+                unexpected_keys.append(name)
+                continue
+
+            if isinstance(param, torch.nn.Parameter):
+                # backwards compatibility for serialized parameters
+                param = param.data
+
+            try:
+                own_state[name].copy_(param)
+                loaded_keys.append(name)
+            except Exception:
+                if strict:
+                    raise RuntimeError('While copying the parameter named {}, '
+                                       'whose dimensions in the model are {} and '
+                                       'whose dimensions in the checkpoint are {}.'
+                                       .format(name, own_state[name].size(), param.size()))
+                else:
+                    unmatched_keys.append(name)
+
+        missing_keys = set(own_state.keys()) - set(loaded_keys) - set(unmatched_keys)
+
+        err_msg = []
+        if unexpected_keys:
+            err_msg.append('unexpected key in source state_dict: {}\n'.format(', '.join(unexpected_keys)))
+        if missing_keys:
+            err_msg.append('missing keys in source state_dict: {}\n'.format(', '.join(missing_keys)))
+        if unmatched_keys:
+            err_msg.append('unmatched keys in source state_dict: {}\n'.format(', '.join(unmatched_keys)))
+        err_msg = '\n'.join(err_msg)
+        if err_msg:
+            if strict:
+                raise RuntimeError(err_msg)
+            elif report:
+                Log.warn(err_msg)
+
+        return loaded_keys
@@ -4,8 +4,10 @@
 # Repackage some image operations.
 
 
+import io
 import os
 import cv2
+import struct
 import numpy as np
 from PIL import Image
 
@@ -25,6 +27,12 @@ CV2_INTER_DICT = {
     'cubic': cv2.INTER_CUBIC
 }
 
+CV2_REDUCED_DICT = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
 IMG_EXTENSIONS = [
     '.jpg', '.JPG', '.jpeg', '.JPEG',
     '.png', '.PNG', '.ppm', '.PPM', '.bmp', '.BMP',
@@ -34,18 +42,40 @@ IMG_EXTENSIONS = [
 class ImageHelper(object):
 
     @staticmethod
-    def read_image(image_path, tool='pil', mode='RGB'):
+    def read_image(image_path, tool='pil', mode='RGB', scale=None):
+        """Read an image.
+
+        Args:
+            scale (float or callable): The downscale ratio applied right after the read, or the function of
+                (width, height) returning it. The JPEG images are decoded at 1/2, 1/4 or 1/8 resolution
+                by DCT scaling if the decoded image is still no smaller than the downscaled one.
+        """
         if tool == 'pil':
-            return ImageHelper.pil_read_image(image_path, mode=mode)
+            return ImageHelper.pil_read_image(image_path, mode=mode, scale=scale)
         elif tool == 'cv2':
-            return ImageHelper.cv2_read_image(image_path, mode=mode)
+            return ImageHelper.cv2_read_image(image_path, mode=mode, scale=scale)
         else:
             Log.error('Not support mode {}'.format(mode))
             exit(1)
 
     @staticmethod
-    def cv2_read_image(image_path, mode='RGB'):
-        img_bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    def get_reduce_factor(scale, width, height):
+        scale = scale(width, height) if callable(scale) else scale
+        for factor in (8, 4, 2):
+            if scale * factor <= 1.0:
+                return factor
+
+        return 1
+
+    @staticmethod
+    def cv2_read_image(image_path, mode='RGB', scale=None):
+        flag = cv2.IMREAD_COLOR
+        if scale is not None and mode in ['BGR', 'RGB', 'GRAY'] \
+                and os.path.splitext(image_path)[1].lower() in ['.jpg', '.jpeg']:
+            factor = ImageHelper.get_reduce_factor(scale, *ImageHelper.read_size(image_path))
+            flag = CV2_REDUCED_DICT.get(factor, flag)
+
+        img_bgr = cv2.imread(image_path, flag)
         if mode in ['BGR', 'RGB', 'GRAY']:
             return img_bgr
 
@@ -57,9 +87,35 @@ class ImageHelper(object):
             exit(1)
 
     @staticmethod
-    def pil_read_image(image_path, mode='RGB'):
+    def pil_read_image(image_path, mode='RGB', scale=None):
         with open(image_path, 'rb') as f:
             img = Image.open(f)
+            if scale is not None and img.format == 'JPEG':
+                factor = ImageHelper.get_reduce_factor(scale, *img.size)
+                if factor > 1:
+                    # draft picks the DCT scaling from the integer ratios of the original size to the requested size.
+                    img.draft(img.mode, (max(img.size[0] // factor, 1), max(img.size[1] // factor, 1)))
+
+            if mode == 'RGB':
+                return img.convert('RGB')
+
+            elif mode == 'P':
+                return img.convert('P')
+
+            else:
+                Log.error('Not support mode {}'.format(mode))
+                exit(1)
+
+    @staticmethod
+    def read_image_from_bytes(content, tool='pil', mode='RGB', scale=None):
+        """Decode an image from its encoded bytes, with the reduced decode of scale as read_image."""
+        if tool == 'pil':
+            img = Image.open(io.BytesIO(content))
+            if scale is not None and img.format == 'JPEG':
+                factor = ImageHelper.get_reduce_factor(scale, *img.size)
+                if factor > 1:
+                    img.draft(img.mode, (max(img.size[0] // factor, 1), max(img.size[1] // factor, 1)))
+
             if mode == 'RGB':
                 return img.convert('RGB')
 
@@ -70,6 +126,98 @@ class ImageHelper(object):
                 Log.error('Not support mode {}'.format(mode))
                 exit(1)
 
+        elif tool == 'cv2':
+            if mode in ['BGR', 'RGB', 'GRAY']:
+                flag = cv2.IMREAD_COLOR
+                if scale is not None and bytes(content[:2]) == b'\xff\xd8':
+                    factor = ImageHelper.get_reduce_factor(scale, *ImageHelper.read_size_from_bytes(content))
+                    flag = CV2_REDUCED_DICT.get(factor, flag)
+
+                return cv2.imdecode(np.frombuffer(content, dtype=np.uint8), flag)
+
+            elif mode == 'P':
+                return ImageHelper.to_np(Image.open(io.BytesIO(content)).convert('P'))
+
+            else:
+                Log.error('Not support mode {}'.format(mode))
+                exit(1)
+
+        else:
+            Log.error('Not support tool {}'.format(tool))
+            exit(1)
+
+    @staticmethod
+    def _parse_size(stream):
+        """Parse the [width, height] from the JPEG/PNG header, return None for other formats."""
+        header = stream.read(24)
+        if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+            return list(struct.unpack('>II', header[16:24]))
+
+        if header[:2] != b'\xff\xd8':
+            return None
+
+        stream.seek(2)
+        while True:
+            if stream.read(1) != b'\xff':
+                return None
+
+            marker = stream.read(1)
+            while marker == b'\xff':
+                marker = stream.read(1)
+
+            # Markers without a segment: TEM, RST0-7.
+            if marker == b'\x01' or b'\xd0' <= marker <= b'\xd7':
+                continue
+
+            length_bytes = stream.read(2)
+            if len(length_bytes) != 2:
+                return None
+
+            # SOF0-15, except DHT (C4), JPG (C8) and DAC (CC).
+            if b'\xc0' <= marker <= b'\xcf' and marker not in (b'\xc4', b'\xc8', b'\xcc'):
+                height, width = struct.unpack('>xHH', stream.read(5))
+                return [width, height]
+
+            stream.seek(struct.unpack('>H', length_bytes)[0] - 2, io.SEEK_CUR)
+
+    @staticmethod
+    def read_size(image_path):
+        """Return the [width, height] of an image without decoding it."""
+        with open(image_path, 'rb') as f:
+            size = ImageHelper._parse_size(f)
+            if size is None:
+                f.seek(0)
+                size = list(Image.open(f).size)
+
+        return size
+
+    @staticmethod
+    def read_size_from_bytes(content):
+        stream = io.BytesIO(content)
+        size = ImageHelper._parse_size(stream)
+        if size is None:
+            stream.seek(0)
+            size = list(Image.open(stream).size)
+
+        return size
+
+    @staticmethod
+    def read_sizes(image_path_list, cache_dir=None):
+        """Return the [width, height] of the images, cached in the manifests of their directories."""
+        from lib.data.manifest import Manifest
+
+        size_list = list()
+        manifest_set = set()
+        for image_path in image_path_list:
+            manifest = Manifest.get(os.path.dirname(image_path), cache_dir=cache_dir)
+            size_list.append(manifest.get_img_size(os.path.basename(image_path)))
+            manifest_set.add(manifest)
+
+        for manifest in manifest_set:
+            manifest.flush()
+
+        return size_list
+
     @staticmethod
     def rgb2bgr(img_rgb):
         assert isinstance(img_rgb, np.ndarray)
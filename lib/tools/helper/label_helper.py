@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You (youansheng@gmail.com)
+# Lookup tables mapping the label ids of uint8 labelmaps.
+
+
+import numpy as np
+
+from lib.tools.helper.image_helper import ImageHelper
+
+
+class LabelHelper(object):
+    """Every mapping of the label ids is a 256-entry uint8 table, applied to a labelmap in one indexing."""
+
+    @staticmethod
+    def encode_lut(label_list):
+        # The ids in label_list -> their indices, the others -> 255 (ignored).
+        lut = np.full(256, 255, dtype=np.uint8)
+        for i, class_id in enumerate(label_list):
+            if 0 <= class_id < 256:
+                lut[class_id] = i
+
+        return lut
+
+    @staticmethod
+    def decode_lut(label_list, num_classes):
+        # The indices -> their ids in label_list, the others -> 0.
+        lut = np.zeros(256, dtype=np.uint8)
+        for i in range(min(num_classes, 256)):
+            lut[i] = label_list[i]
+
+        return lut
+
+    @staticmethod
+    def reduce_zero_lut():
+        # 0 -> 255 (ignored), 255 kept, and the others shifted down by one.
+        lut = (np.arange(256) - 1).astype(np.uint8)
+        lut[0] = 255
+        lut[255] = 255
+        return lut
+
+    @staticmethod
+    def restore_zero_lut():
+        return (np.arange(256) + 1).astype(np.uint8)
+
+    @staticmethod
+    def compose(*lut_list):
+        # The tables are applied from left to right, None is skipped.
+        lut_list = [lut for lut in lut_list if lut is not None]
+        if len(lut_list) == 0:
+            return None
+
+        out_lut = lut_list[0]
+        for lut in lut_list[1:]:
+            out_lut = lut[out_lut]
+
+        return out_lut
+
+    @staticmethod
+    def get_encode_lut(configer):
+        # The mapping of the gt labelmaps in the datasets: label_list, then reduce_zero_label.
+        label_list = configer.get('data.label_list', default=None)
+        return LabelHelper.compose(LabelHelper.encode_lut(label_list) if label_list else None,
+                                   LabelHelper.reduce_zero_lut()
+                                   if configer.get('data.reduce_zero_label', default=False) else None)
+
+    @staticmethod
+    def apply(labelmap, lut):
+        if lut is None:
+            return labelmap
+
+        is_img = not isinstance(labelmap, np.ndarray)
+        labelmap = np.take(lut, np.asarray(labelmap, dtype=np.uint8))
+        return ImageHelper.to_img(labelmap) if is_img else labelmap
@@ -4,6 +4,9 @@
 # Utils to store the average and current value.
 
 
+import torch
+
+
 class AverageMeter(object):
     """ Computes ans stores the average and current value"""
     def __init__(self):
@@ -84,3 +87,31 @@ class ListAverageMeter(object):
 
     def info(self):
         return "[" + ', '.join(['{:.4f}'.format(x) for x in self.avg]) + "]"
+
+
+class TensorDictAverageMeter(object):
+    """ Computes ans stores the average of the loss tensors, without copying them to the host every update"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.sum = dict()
+        self.count = 0
+
+    def update(self, val_dict, n=1):
+        for k, v in val_dict.items():
+            v = v.detach().float() * n
+            self.sum[k] = v if k not in self.sum else self.sum[k] + v
+
+        self.count += n
+
+    def avg_tensor(self):
+        # One stacked tensor of the averages, copied to the host by the caller at once.
+        if self.count == 0:
+            return list(), None
+
+        return list(self.sum.keys()), torch.stack(list(self.sum.values())) / self.count
+
+    @staticmethod
+    def info(key_list, avg_list):
+        return '{' + ', '.join(['{}: {:.4f}'.format(k, v) for k, v in zip(key_list, avg_list)]) + '}'
@@ -3,7 +3,7 @@ import sys
 from multiprocessing import Pool
 from shutil import get_terminal_size
 
-from tools.util.timer import Timer
+from lib.tools.util.timer import Timer
 
 
 class ProgressBar(object):
@@ -112,7 +112,8 @@ def track_parallel_progress(func,
                             bar_width=50,
                             chunksize=1,
                             skip_first=False,
-                            keep_order=True):
+                            keep_order=True,
+                            result_fn=None):
     """Track the progress of parallel task execution with a progress bar.
 
     The built-in :mod:`multiprocessing` module is used for process pools and
@@ -134,6 +135,8 @@ def track_parallel_progress(func,
             longer.
         keep_order (bool): If True, :func:`Pool.imap` is used, otherwise
             :func:`Pool.imap_unordered` is used.
+        result_fn (None or callable): If given, every result is passed to it
+            as soon as it is done, instead of being kept in the returned list.
 
     Returns:
         list: The task results.
@@ -154,16 +157,21 @@ def track_parallel_progress(func,
     task_num -= nproc * chunksize * int(skip_first)
     prog_bar = ProgressBar(task_num, bar_width, start)
     results = []
+    num_results = 0
     if keep_order:
         gen = pool.imap(func, tasks, chunksize)
     else:
         gen = pool.imap_unordered(func, tasks, chunksize)
     for result in gen:
-        results.append(result)
+        num_results += 1
+        if result_fn is None:
+            results.append(result)
+        else:
+            result_fn(result)
         if skip_first:
-            if len(results) < nproc * chunksize:
+            if num_results < nproc * chunksize:
                 continue
-            elif len(results) == nproc * chunksize:
+            elif num_results == nproc * chunksize:
                 prog_bar.start()
                 continue
         prog_bar.update()
@@ -50,7 +50,7 @@ if __name__ == "__main__":
     parser.add_argument('--drop_last', type=str2bool, nargs='?', default=False,
                         dest='data.drop_last', help='Fix bug for syncbn.')
     parser.add_argument('--workers', default=None, type=int,
-                        dest='data.workers', help='The number of workers to load data.')
+                        dest='data.num_workers', help='The number of workers to load data.')
     parser.add_argument('--train_batch_size', default=None, type=int,
                         dest='train.batch_size', help='The batch size of training.')
     parser.add_argument('--val_batch_size', default=None, type=int,
@@ -8,6 +8,7 @@ import numpy as np
 import argparse
 
 from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.helper.label_helper import LabelHelper
 from lib.tools.util.logger import Logger as Log
 from lib.tools.util.configer import Configer
 from metric.seg.seg_running_score import SegRunningScore
@@ -17,23 +18,15 @@ class SegEvaluator(object):
     def __init__(self, configer):
         self.configer = configer
         self.seg_running_score = SegRunningScore(configer)
+        label_list = self.configer.get('data.label_list', default=None)
+        # reduce_zero_label, then label_list.
+        self.label_lut = LabelHelper.compose(
+            LabelHelper.reduce_zero_lut() if self.configer.get('data.reduce_zero_label', default=False) else None,
+            LabelHelper.encode_lut(label_list) if label_list is not None else None
+        )
 
     def relabel(self, labelmap):
-        if self.configer.get('data.reduce_zero_label', default=False):
-            labelmap[labelmap == 0] = 255
-            labelmap = (labelmap - 1).astype(np.uint8)
-            labelmap[labelmap == 254] = 255
-
-        if self.configer.get('data.label_list', default=None) is not None:
-            shape = labelmap.shape
-            encoded_labelmap = np.ones(shape=(shape[0], shape[1]), dtype=np.uint8) * 255
-            for i in range(len(self.configer.get('data', 'label_list'))):
-                class_id = self.configer.get('data', 'label_list')[i]
-                encoded_labelmap[labelmap == class_id] = i
-
-            labelmap = encoded_labelmap
-
-        return labelmap
+        return LabelHelper.apply(labelmap, self.label_lut)
 
     def evaluate(self, pred_dir, gt_dir):
         img_cnt = 0
@@ -42,8 +35,8 @@ class SegEvaluator(object):
             gt_path = os.path.join(gt_dir, filename)
             predmap = ImageHelper.to_np(ImageHelper.read_image(pred_path, tool='pil', mode='P'))
             gtmap = ImageHelper.to_np(ImageHelper.read_image(gt_path, tool='pil', mode='P'))
-            predmap = self.relabel(np.copy(predmap))
-            gtmap = self.relabel(np.copy(gtmap))
+            predmap = self.relabel(predmap)
+            gtmap = self.relabel(gtmap)
 
             self.seg_running_score.update(predmap[np.newaxis, :, :], gtmap[np.newaxis, :, :])
             img_cnt += 1
@@ -7,7 +7,11 @@
 import time
 import torch
 
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import CheckpointHook, EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from lib.tools.util.average_meter import AverageMeter, DictAverageMeter
 from lib.tools.util.logger import Logger as Log
@@ -23,10 +27,11 @@ class ImageClassifier(object):
     def __init__(self, configer):
         self.configer = configer
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = DictAverageMeter()
         self.val_losses = DictAverageMeter()
         self.cls_model_manager = ModelManager(configer)
         self.cls_data_loader = DataLoader(configer)
@@ -39,6 +44,12 @@ class ImageClassifier(object):
         self.train_loader = self.cls_data_loader.get_trainloader()
         self.val_loader = self.cls_data_loader.get_valloader()
         self.loss = self.cls_model_manager.get_cls_loss()
+        base_lr = self.solver_dict['lr']['base_lr']
+        lr_hook = LrUpdateHook(warm_list=(0, 1),
+                               warm_lr_list=(base_lr * self.configer.get('solver.lr.bb_lr_scale'), base_lr))
+        self.engine = TrainEngine(self, self.cls_net, self.optimizer,
+                                  clip_grad=10. if self.configer.get('network', 'clip_grad', default=False) else None,
+                                  hooks=[lr_hook, LoggerHook(), CheckpointHook(), EvalHook()])
 
     def _init_model(self):
         self.cls_net = self.cls_model_manager.get_cls_model()
@@ -97,60 +108,14 @@ class ImageClassifier(object):
         """
           Train function of every epoch during train phase.
         """
-        self.cls_net.train()
-        start_time = time.time()
         # Adjust the learning rate after every epoch.
         self.runner_state['epoch'] += 1
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, warm_list=(0, 1),
-                           warm_lr_list=(self.solver_dict['lr']['base_lr']*self.configer.get('solver.lr.bb_lr_scale'),
-                                         self.solver_dict['lr']['base_lr']),
-                           solver_dict=self.solver_dict)
-            self.data_time.update(time.time() - start_time)
-            data_dict = RunnerHelper.to_device(self, data_dict)
-            # Forward pass.
-            out = self.cls_net(data_dict)
-            loss_dict = self.loss(out)
-            # Compute the loss of the train batch & backward.
-
-            loss = loss_dict['loss']
-            self.train_losses.update({key: loss.item() for key, loss in loss_dict.items()}, data_dict['img'].size(0))
-            self.optimizer.zero_grad()
-            loss.backward()
-            if self.configer.get('network', 'clip_grad', default=False):
-                RunnerHelper.clip_grad(self.cls_net, 10.)
-
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
+        self.engine.train()
 
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.solver_dict['display_iter'] == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {4}\tLoss = {3}\n'.format(
-                             self.runner_state['epoch'], self.runner_state['iters'],
-                             self.solver_dict['display_iter'], self.train_losses.info(),
-                             RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time,
-                             data_time=self.data_time))
-
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.solver_dict['lr']['metric'] == 'iters' and self.runner_state['iters'] == self.solver_dict['max_iters']:
-                break
-
-            if self.runner_state['iters'] % self.solver_dict['save_iters'] == 0 and self.configer.get('local_rank') == 0:
-                RunnerHelper.save_net(self, self.cls_net)
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.solver_dict['test_interval'] == 0:
-                self.val()
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out = self.cls_net(data_dict)
+        return self.loss(out)
 
     def val(self):
         """
@@ -9,7 +9,11 @@ import torch
 
 from data.det.data_loader import DataLoader
 from runner.det.faster_rcnn_test import FastRCNNTest
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from model.det.model_manager import ModelManager
 from model.det.layers.fr_priorbox_layer import FRPriorBoxLayer
@@ -27,8 +31,6 @@ class FasterRCNN(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = AverageMeter()
         self.val_losses = AverageMeter()
         self.det_visualizer = DetVisualizer(configer)
         self.det_model_manager = ModelManager(configer)
@@ -42,6 +44,9 @@ class FasterRCNN(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -54,6 +59,8 @@ class FasterRCNN(object):
         self.train_loader = self.det_data_loader.get_trainloader()
         self.val_loader = self.det_data_loader.get_valloader()
         self.det_loss = self.det_model_manager.get_det_loss()
+        self.engine = TrainEngine(self, self.det_net, self.optimizer, clip_grad=10., hooks=[
+            LrUpdateHook(), LoggerHook(), EvalHook()])
 
     def _get_parameters(self):
         lr_1 = []
@@ -74,52 +81,15 @@ class FasterRCNN(object):
         """
           Train function of every epoch during train phase.
         """
-        self.det_net.train()
-        start_time = time.time()
         # Adjust the learning rate after every epoch.
         self.runner_state['epoch'] += 1
+        self.engine.train()
 
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, solver_dict=self.configer.get('solver'))
-            self.data_time.update(time.time() - start_time)
-            # Forward pass.
-            data_dict = RunnerHelper.to_device(self, data_dict)
-            out = self.det_net(data_dict)
-            loss_dict = self.det_loss(out)
-            loss = loss_dict['loss'].mean()
-            self.train_losses.update(loss.item(), len(DCHelper.tolist(data_dict['meta'])))
-
-            self.optimizer.zero_grad()
-            loss.backward()
-            RunnerHelper.clip_grad(self.det_net, 10.)
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {3}\tLoss = {loss.val:.8f} (ave = {loss.avg:.8f})\n'.format(
-                    self.runner_state['epoch'], self.runner_state['iters'],
-                    self.configer.get('solver', 'display_iter'),
-                    RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time,
-                    data_time=self.data_time, loss=self.train_losses))
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0:
-                self.val()
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out = self.det_net(data_dict)
+        loss_dict = self.det_loss(out)
+        return dict(loss=loss_dict['loss'].mean())
 
     def val(self):
         """
@@ -48,7 +48,7 @@ class FastRCNNTest(object):
         self.det_net.eval()
 
     def test(self, test_dir, out_dir):
-        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir)):
+        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir, out_dir=out_dir)):
             data_dict['testing'] = True
             data_dict = RunnerHelper.to_device(self, data_dict)
             out_dict = self.det_net(data_dict)
@@ -9,7 +9,11 @@ import torch
 
 from data.det.data_loader import DataLoader
 from runner.det.single_shot_detector_test import SingleShotDetectorTest
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from model.det.model_manager import ModelManager
 from lib.tools.util.average_meter import AverageMeter
@@ -26,8 +30,6 @@ class SingleShotDetector(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = AverageMeter()
         self.val_losses = AverageMeter()
         self.det_visualizer = DetVisualizer(configer)
         self.det_model_manager = ModelManager(configer)
@@ -40,6 +42,9 @@ class SingleShotDetector(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -51,6 +56,9 @@ class SingleShotDetector(object):
         self.train_loader = self.det_data_loader.get_trainloader()
         self.val_loader = self.det_data_loader.get_valloader()
         self.det_loss = self.det_model_manager.get_det_loss()
+        self.engine = TrainEngine(self, self.det_net, self.optimizer, clip_grad=10., hooks=[
+            LrUpdateHook(warm_list=(0,), warm_lr_list=(self.configer.get('solver', 'lr')['base_lr'],)),
+            LoggerHook(), EvalHook()])
 
     def _get_parameters(self):
         lr_1 = []
@@ -71,55 +79,15 @@ class SingleShotDetector(object):
         """
           Train function of every epoch during train phase.
         """
-        self.det_net.train()
-        start_time = time.time()
         # Adjust the learning rate after every epoch.
         self.runner_state['epoch'] += 1
+        self.engine.train()
 
-        # data_tuple: (inputs, heatmap, maskmap, vecmap)
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, warm_list=(0,),
-                           warm_lr_list=(self.configer.get('solver', 'lr')['base_lr'],),
-                           solver_dict=self.configer.get('solver'))
-            self.data_time.update(time.time() - start_time)
-            # Forward pass.
-            data_dict = RunnerHelper.to_device(self, data_dict)
-            out = self.det_net(data_dict)
-            loss_dict = self.det_loss(out)
-            loss = loss_dict['loss']
-            self.train_losses.update(loss.item(), len(DCHelper.tolist(data_dict['meta'])))
-
-            self.optimizer.zero_grad()
-            loss.backward()
-            RunnerHelper.clip_grad(self.det_net, 10.)
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {3}\tLoss = {loss.val:.8f} (ave = {loss.avg:.8f})\n'.format(
-                    self.runner_state['epoch'], self.runner_state['iters'],
-                    self.configer.get('solver', 'display_iter'),
-                    RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time,
-                    data_time=self.data_time, loss=self.train_losses))
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0:
-                self.val()
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out = self.det_net(data_dict)
+        loss_dict = self.det_loss(out)
+        return dict(loss=loss_dict['loss'])
 
     def val(self):
         """
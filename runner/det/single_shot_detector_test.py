@@ -39,7 +39,7 @@ class SingleShotDetectorTest(object):
         self.det_net.eval()
 
     def test(self, test_dir, out_dir):
-        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir)):
+        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir, out_dir=out_dir)):
             data_dict['testing'] = True
             out_dict = self.det_net(data_dict)
             meta_list = DCHelper.tolist(data_dict['meta'])
@@ -37,7 +37,7 @@ class YOLOv3Test(object):
         self.det_net.eval()
 
     def test(self, test_dir, out_dir):
-        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir)):
+        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir, out_dir=out_dir)):
             data_dict['testing'] = True
             detections = self.det_net(data_dict)
             meta_list = DCHelper.tolist(data_dict['meta'])
@@ -8,7 +8,11 @@ import time
 import torch
 
 from data.gan.data_loader import DataLoader
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from runner.gan.face_gan_test import FaceGANTest
 from model.gan.model_manager import ModelManager
@@ -24,8 +28,6 @@ class FaceGAN(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = AverageMeter()
         self.val_losses = AverageMeter()
         self.model_manager = ModelManager(configer)
         self.seg_data_loader = DataLoader(configer)
@@ -36,6 +38,9 @@ class FaceGAN(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -47,6 +52,8 @@ class FaceGAN(object):
 
         self.train_loader = self.seg_data_loader.get_trainloader()
         self.val_loader = self.seg_data_loader.get_valloader()
+        self.engine = TrainEngine(self, self.gan_net, self.optimizer, hooks=[
+            LrUpdateHook(), LoggerHook(), EvalHook()])
 
     def _get_parameters(self):
 
@@ -56,51 +63,14 @@ class FaceGAN(object):
         """
           Train function of every epoch during train phase.
         """
-        self.gan_net.train()
-        start_time = time.time()
-        # Adjust the learning rate after every epoch.
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, solver_dict=self.configer.get('solver'))
-            self.data_time.update(time.time() - start_time)
-
-            # Forward pass.
-            out_dict = self.gan_net(data_dict)
-            # outputs = self.module_utilizer.gather(outputs)
-            loss = out_dict['loss'].mean()
-            self.train_losses.update(loss.item(), len(DCHelper.tolist(data_dict['meta'])))
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {3}\tLoss = {loss.val:.8f} (ave = {loss.avg:.8f})\n'.format(
-                         self.runner_state['epoch'], self.runner_state['iters'],
-                         self.configer.get('solver', 'display_iter'),
-                         RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time,
-                         data_time=self.data_time, loss=self.train_losses))
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0:
-                self.val()
-
+        self.engine.train()
         self.runner_state['epoch'] += 1
 
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out_dict = self.gan_net(data_dict)
+        return dict(loss=out_dict['loss'].mean())
+
     def val(self, data_loader=None):
         """
           Validation function during the train phase.
@@ -8,7 +8,11 @@ import time
 import torch
 
 from data.gan.data_loader import DataLoader
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import EvalHook, LoggerHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from model.gan.model_manager import ModelManager
 from lib.tools.util.average_meter import AverageMeter
@@ -23,8 +27,6 @@ class ImageTranslator(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = AverageMeter()
         self.val_losses = AverageMeter()
         self.model_manager = ModelManager(configer)
         self.seg_data_loader = DataLoader(configer)
@@ -35,6 +37,9 @@ class ImageTranslator(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -42,11 +47,15 @@ class ImageTranslator(object):
         self.gan_net = self.model_manager.gan_model()
         self.gan_net = RunnerHelper.load_net(self, self.gan_net)
 
-        self.optimizer_G, self.scheduler_G = Trainer.init(self._get_parameters()[0], self.configer.get('solver'))
-        self.optimizer_D, self.scheduler_D = Trainer.init(self._get_parameters()[1], self.configer.get('solver'))
+        self.params_G, self.params_D = self._get_parameters()
+        self.optimizer_G, self.scheduler_G = Trainer.init(self.params_G, self.configer.get('solver'))
+        self.optimizer_D, self.scheduler_D = Trainer.init(self.params_D, self.configer.get('solver'))
 
         self.train_loader = self.seg_data_loader.get_trainloader()
         self.val_loader = self.seg_data_loader.get_valloader()
+        self.engine = TrainEngine(self, self.gan_net, [self.optimizer_G, self.optimizer_D],
+                                  loss_params=dict(loss_G=self.params_G, loss_D=self.params_D),
+                                  hooks=[LoggerHook(), EvalHook()])
 
     def _get_parameters(self):
         params_G = []
@@ -64,58 +73,19 @@ class ImageTranslator(object):
         """
           Train function of every epoch during train phase.
         """
-        self.gan_net.train()
-        start_time = time.time()
         # Adjust the learning rate after every epoch.
         self.scheduler_G.step(self.runner_state['epoch'])
         self.scheduler_D.step(self.runner_state['epoch'])
-        for i, data_dict in enumerate(self.train_loader):
-            self.data_time.update(time.time() - start_time)
-
-            # Forward pass.
-            out_dict = self.gan_net(data_dict)
-            # outputs = self.module_utilizer.gather(outputs)
-            self.optimizer_G.zero_grad()
-            loss_G = out_dict['loss_G'].mean()
-            loss_G.backward()
-            self.optimizer_G.step()
-
-            self.optimizer_D.zero_grad()
-            loss_D = out_dict['loss_D'].mean()
-            loss_D.backward()
-            self.optimizer_D.step()
-            loss = loss_G + loss_D
-            self.train_losses.update(loss.item(), len(DCHelper.tolist(data_dict['meta'])))
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {3}\tLoss = {loss.val:.8f} (ave = {loss.avg:.8f})\n'.format(
-                         self.runner_state['epoch'], self.runner_state['iters'],
-                         self.configer.get('solver', 'display_iter'),
-                         [RunnerHelper.get_lr(self.optimizer_G), RunnerHelper.get_lr(self.optimizer_D)],
-                         batch_time=self.batch_time, data_time=self.data_time, loss=self.train_losses))
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0:
-                self.val()
-
+        self.engine.train()
         self.runner_state['epoch'] += 1
 
+    def train_step(self, data_dict):
+        # Forward pass & the losses of the train batch.
+        out_dict = self.gan_net(data_dict)
+        loss_G = out_dict['loss_G'].mean()
+        loss_D = out_dict['loss_D'].mean()
+        return dict(loss_G=loss_G, loss_D=loss_D, loss=loss_G + loss_D)
+
     def val(self):
         """
           Validation function during the train phase.
@@ -8,10 +8,13 @@ import time
 import torch
 
 from data.pose.data_loader import DataLoader
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from model.pose.model_manager import ModelManager
-from lib.tools.helper.dc_helper import DCHelper
 from lib.tools.util.average_meter import AverageMeter, DictAverageMeter
 from lib.tools.util.logger import Logger as Log
 from lib.tools.vis.pose_visualizer import PoseVisualizer
@@ -24,8 +27,6 @@ class PoseEstimator(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = DictAverageMeter()
         self.val_losses = DictAverageMeter()
         self.pose_visualizer = PoseVisualizer(configer)
         self.pose_model_manager = ModelManager(configer)
@@ -37,6 +38,9 @@ class PoseEstimator(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -50,6 +54,8 @@ class PoseEstimator(object):
         self.val_loader = self.pose_data_loader.get_valloader()
 
         self.pose_loss = self.pose_model_manager.get_pose_loss()
+        self.engine = TrainEngine(self, self.pose_net, self.optimizer, hooks=[
+            LrUpdateHook(warm_list=(0,)), LoggerHook(), EvalHook()])
 
     def _get_parameters(self):
         lr_1 = []
@@ -70,52 +76,14 @@ class PoseEstimator(object):
         """
           Train function of every epoch during train phase.
         """
-        self.pose_net.train()
-        start_time = time.time()
         # Adjust the learning rate after every epoch.
         self.runner_state['epoch'] += 1
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, warm_list=(0,), solver_dict=self.configer.get('solver'))
-            self.data_time.update(time.time() - start_time)
-            # Forward pass.
-            out = self.pose_net(data_dict)
-
-            # Compute the loss of the train batch & backward.
-            loss_dict = self.pose_loss(out)
-
-            loss = loss_dict['loss']
-            self.train_losses.update({key: loss.item() for key, loss in loss_dict.items()}, data_dict['img'].size(0))
+        self.engine.train()
 
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {4}\tLoss = {3}\n'.format(
-                    self.runner_state['epoch'], self.runner_state['iters'],
-                    self.configer.get('solver', 'display_iter'), self.train_losses.info(),
-                    RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time, data_time=self.data_time))
-
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0:
-                self.val()
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out = self.pose_net(data_dict)
+        return self.pose_loss(out)
 
     def val(self):
         """
@@ -10,7 +10,11 @@ import numpy as np
 import torch
 
 from data.seg.data_loader import DataLoader
+from lib.runner.grad_accumulator import GradAccumulator
+from lib.runner.hooks import CheckpointHook, EvalHook, LoggerHook, LrUpdateHook
+from lib.runner.mixed_precision import MixedPrecision
 from lib.runner.runner_helper import RunnerHelper
+from lib.runner.train_engine import TrainEngine
 from lib.runner.trainer import Trainer
 from model.seg.model_manager import ModelManager
 from lib.tools.util.average_meter import AverageMeter, DictAverageMeter
@@ -27,8 +31,6 @@ class FCNSegmentor(object):
     def __init__(self, configer):
         self.configer = configer
         self.batch_time = AverageMeter()
-        self.data_time = AverageMeter()
-        self.train_losses = DictAverageMeter()
         self.val_losses = DictAverageMeter()
         self.seg_running_score = SegRunningScore(configer)
         self.seg_visualizer = SegVisualizer(configer)
@@ -41,6 +43,9 @@ class FCNSegmentor(object):
         self.optimizer = None
         self.scheduler = None
         self.runner_state = dict()
+        self.amp = MixedPrecision(configer)
+        self.accum = GradAccumulator(configer)
+        self.engine = None
 
         self._init_model()
 
@@ -54,6 +59,8 @@ class FCNSegmentor(object):
         self.val_loader = self.seg_data_loader.get_valloader()
 
         self.loss = self.seg_model_manager.get_seg_loss()
+        self.engine = TrainEngine(self, self.seg_net, self.optimizer, hooks=[
+            LrUpdateHook(warm_list=(0,)), LoggerHook(), CheckpointHook(), EvalHook(skip_distributed=True)])
 
     def _get_parameters(self):
         lr_1 = []
@@ -73,58 +80,14 @@ class FCNSegmentor(object):
         """
           Train function of every epoch during train phase.
         """
-        self.seg_net.train()
-        start_time = time.time()
-        # Adjust the learning rate after every epoch.
-
-        for i, data_dict in enumerate(self.train_loader):
-            Trainer.update(self, warm_list=(0,), solver_dict=self.configer.get('solver'))
-            self.data_time.update(time.time() - start_time)
-
-            # Forward pass.
-            data_dict = RunnerHelper.to_device(self, data_dict)
-            out = self.seg_net(data_dict)
-            # Compute the loss of the train batch & backward.
-            loss_dict = self.loss(out)
-            loss = loss_dict['loss']
-            self.train_losses.update({key: loss.item() for key, loss in loss_dict.items()}, data_dict['img'].size(0))
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
-
-            # Update the vars of the train phase.
-            self.batch_time.update(time.time() - start_time)
-            start_time = time.time()
-            self.runner_state['iters'] += 1
-
-            # Print the log info & reset the states.
-            if self.runner_state['iters'] % self.configer.get('solver', 'display_iter') == 0:
-                Log.info('Train Epoch: {0}\tTrain Iteration: {1}\t'
-                         'Time {batch_time.sum:.3f}s / {2}iters, ({batch_time.avg:.3f})\t'
-                         'Data load {data_time.sum:.3f}s / {2}iters, ({data_time.avg:3f})\n'
-                         'Learning rate = {4}\tLoss = {3}\n'.format(
-                         self.runner_state['epoch'], self.runner_state['iters'],
-                         self.configer.get('solver', 'display_iter'), self.train_losses.info(),
-                         RunnerHelper.get_lr(self.optimizer), batch_time=self.batch_time, data_time=self.data_time))
-                self.batch_time.reset()
-                self.data_time.reset()
-                self.train_losses.reset()
-
-            if self.runner_state['iters'] % self.configer.get('solver.save_iters') == 0 \
-                    and self.configer.get('local_rank') == 0:
-                RunnerHelper.save_net(self, self.seg_net)
-
-            if self.configer.get('solver', 'lr')['metric'] == 'iters' \
-                    and self.runner_state['iters'] == self.configer.get('solver', 'max_iters'):
-                break
-
-            # Check to val the current model.
-            if self.runner_state['iters'] % self.configer.get('solver', 'test_interval') == 0 \
-                    and not self.configer.get('network.distributed'):
-                self.val()
-
+        self.engine.train()
         self.runner_state['epoch'] += 1
 
+    def train_step(self, data_dict):
+        # Forward pass & the loss of the train batch.
+        out = self.seg_net(data_dict)
+        return self.loss(out)
+
     def val(self, data_loader=None):
         """
           Validation function during the train phase.
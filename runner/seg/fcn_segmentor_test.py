@@ -15,6 +15,7 @@ from lib.runner.blob_helper import BlobHelper
 from lib.runner.runner_helper import RunnerHelper
 from model.seg.model_manager import ModelManager
 from lib.tools.helper.image_helper import ImageHelper
+from lib.tools.helper.label_helper import LabelHelper
 from lib.tools.util.logger import Logger as Log
 from lib.tools.parser.seg_parser import SegParser
 from lib.tools.vis.seg_visualizer import SegVisualizer
@@ -31,6 +32,13 @@ class FCNSegmentorTest(object):
         self.test_loader = TestDataLoader(configer)
         self.device = torch.device('cpu' if self.configer.get('gpu') is None else 'cuda')
         self.seg_net = None
+        label_list = self.configer.get('data.label_list', default=None)
+        # The inverse of the dataset encoding: label_list, then reduce_zero_label.
+        self.label_lut = LabelHelper.compose(
+            LabelHelper.decode_lut(label_list, self.configer.get('data', 'num_classes'))
+            if label_list is not None else None,
+            LabelHelper.restore_zero_lut() if self.configer.get('data.reduce_zero_label', default=False) else None
+        )
 
         self._init_model()
 
@@ -40,7 +48,7 @@ class FCNSegmentorTest(object):
         self.seg_net.eval()
 
     def test(self, test_dir, out_dir):
-        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir)):
+        for _, data_dict in enumerate(self.test_loader.get_testloader(test_dir=test_dir, out_dir=out_dir)):
             total_logits = None
             if self.configer.get('test', 'mode') == 'ss_test':
                 total_logits = self.ss_test(data_dict)
@@ -67,12 +75,7 @@ class FCNSegmentorTest(object):
                 ImageHelper.save(image_canvas,
                                  save_path=os.path.join(out_dir, 'vis/{}.png'.format(meta_list[i]['filename'])))
 
-                if self.configer.get('data.label_list', default=None) is not None:
-                    label_img = self.__relabel(label_img)
-
-                if self.configer.get('data.reduce_zero_label', default=False):
-                    label_img = label_img + 1
-                    label_img = label_img.astype(np.uint8)
+                label_img = LabelHelper.apply(label_img, self.label_lut)
 
                 label_img = Image.fromarray(label_img, 'P')
                 label_path = os.path.join(out_dir, 'label/{}.png'.format(meta_list[i]['filename']))
@@ -218,15 +221,3 @@ class FCNSegmentorTest(object):
                                              tuple(meta['ori_img_size']), interpolation=cv2.INTER_CUBIC)
 
         return total_logits
-
-    def __relabel(self, label_map):
-        height, width = label_map.shape
-        label_dst = np.zeros((height, width), dtype=np.uint8)
-        for i in range(self.configer.get('data', 'num_classes')):
-            label_dst[label_map == i] = self.configer.get('data', 'label_list')[i]
-
-        label_dst = np.array(label_dst, dtype=np.uint8)
-
-        return label_dst
-
-
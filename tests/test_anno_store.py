@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the round trip of AnnoStore against the json files it replaced.
+
+
+import os
+import numpy as np
+import pytest
+
+from lib.data.anno_store import AnnoStore
+from lib.tools.helper.json_helper import JsonHelper
+
+
+def get_object(rng, with_kpts=False, with_segm=False):
+    x, y = rng.uniform(0, 100, 2)
+    object = dict(label=int(rng.randint(0, 20)), bbox=[x, y, x + rng.uniform(1, 50), y + rng.uniform(1, 50)])
+    if rng.rand() < 0.3:
+        object['difficult'] = True
+
+    if with_kpts:
+        object['keypoints'] = [[x + rng.uniform(0, 50), y + rng.uniform(0, 50), int(rng.randint(-1, 2))]
+                               for _ in range(17)]
+
+    if with_segm:
+        object['segm'] = [rng.uniform(0, 100, 2 * rng.randint(3, 8)).tolist() for _ in range(rng.randint(1, 3))]
+
+    return object
+
+
+def get_records(seed, with_kpts=False, with_segm=False):
+    rng = np.random.RandomState(seed)
+    record_list = list()
+    for i in range(8):
+        num_objects = 0 if i == 3 else rng.randint(1, 6)
+        record_list.append(dict(name='{:06d}'.format(i), meta=dict(
+            objects=[get_object(rng, with_kpts=with_kpts, with_segm=with_segm) for _ in range(num_objects)])))
+
+    if with_segm:
+        # The crowd objects of coco, with the RLE segm.
+        record_list[1]['meta']['objects'].insert(1, dict(label=1, bbox=[0, 0, 10, 10],
+                                                         segm=dict(counts=[5, 10, 85], size=[10, 10])))
+
+    return record_list
+
+
+def build_split(split_dir, record_list):
+    json_dir = os.path.join(split_dir, 'json')
+    os.makedirs(json_dir)
+    for record in record_list:
+        JsonHelper.save_file(record['meta'], os.path.join(json_dir, '{}.json'.format(record['name'])))
+
+    AnnoStore.build(os.path.join(split_dir, 'anno'), record_list)
+
+
+@pytest.mark.parametrize('with_kpts,with_segm', [(False, False), (True, False), (False, True)])
+def test_round_trip(tmp_path, with_kpts, with_segm):
+    record_list = get_records(0, with_kpts=with_kpts, with_segm=with_segm)
+    build_split(str(tmp_path / 'train'), record_list)
+    cache_dir = str(tmp_path / 'manifest')
+    json_annos = AnnoStore.list_annos(str(tmp_path / 'train'), use_store=False, cache_dir=cache_dir)
+    store_annos = AnnoStore.list_annos(str(tmp_path / 'train'), use_store=True, cache_dir=cache_dir)
+    assert [name for name, _ in store_annos] == [record['name'] for record in record_list]
+    assert sorted(name for name, _ in json_annos) == [name for name, _ in store_annos]
+    json_dict = dict(json_annos)
+    for (name, anno), record in zip(store_annos, record_list):
+        object_list = [object for object in record['meta']['objects'] if isinstance(object.get('segm', []), list)]
+        json_objects = AnnoStore.read_objects(json_dict[name])
+        store_objects = AnnoStore.read_objects(anno)
+        for objects in (json_objects, store_objects):
+            np.testing.assert_array_equal(objects['labels'], [object['label'] for object in object_list])
+            np.testing.assert_array_equal(objects['difficult'],
+                                          [object.get('difficult', False) for object in object_list])
+            np.testing.assert_allclose(objects['bboxes'].reshape(-1, 4),
+                                       np.array([object['bbox'] for object in object_list]).reshape(-1, 4),
+                                       rtol=1e-6)
+            assert objects['has_bbox'].all()
+
+        for key in ['labels', 'difficult', 'bboxes', 'has_bbox']:
+            assert store_objects[key].dtype == json_objects[key].dtype
+            np.testing.assert_array_equal(store_objects[key], json_objects[key])
+
+        if with_kpts:
+            # The empty sample has no keypoints in the json file.
+            json_kpts = json_objects['kpts'] if len(object_list) > 0 else np.zeros((0, 17, 3), dtype=np.float32)
+            np.testing.assert_array_equal(store_objects['kpts'].reshape(-1, 17, 3), json_kpts)
+        else:
+            assert store_objects['kpts'] is None
+
+        if with_segm:
+            # The objects of the empty sample have no polygons in the json file.
+            json_polygons = json_objects['polygons'] or list()
+            assert len(store_objects['polygons']) == len(json_polygons) == len(object_list)
+            for store_polygons, json_polygons in zip(store_objects['polygons'], json_polygons):
+                assert len(store_polygons) == len(json_polygons)
+                for store_polygon, json_polygon in zip(store_polygons, json_polygons):
+                    np.testing.assert_array_equal(store_polygon, json_polygon)
+        else:
+            assert store_objects['polygons'] is None
+
+
+def test_skip_rle():
+    object_list = get_records(1, with_segm=True)[1]['meta']['objects']
+    objects = AnnoStore.parse_objects(object_list)
+    assert len(objects['labels']) == len(objects['polygons']) == len(object_list) - 1
+    assert all(isinstance(polygon, np.ndarray) for polygons in objects['polygons'] for polygon in polygons)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the memory-mapped checkpoint loading against the full torch.load it replaced.
+
+
+import json
+import pytest
+import torch
+import torch.nn as nn
+
+from lib.runner.runner_helper import RunnerHelper
+from lib.tools.helper.checkpoint_helper import CheckpointHelper
+from lib.tools.util.configer import Configer
+
+
+class Runner(object):
+    def __init__(self, resume, resume_strict=False, resume_continue=False):
+        self.configer = Configer(config_dict=dict(gpu=None, network=dict(
+            resume=resume, resume_strict=resume_strict, resume_continue=resume_continue, gather=True)))
+        self.runner_state = None
+
+
+def get_net(seed):
+    torch.manual_seed(seed)
+    net = nn.Sequential(nn.Conv2d(3, 8, 3), nn.BatchNorm2d(8), nn.ReLU(), nn.Flatten(), nn.Linear(8 * 6 * 6, 10))
+    # The running stats are saved as the buffers.
+    net[1].running_mean.normal_()
+    net[1].running_var.uniform_(0.5, 2.0)
+    return net
+
+
+def assert_state_equal(net, state_dict):
+    own_state = net.state_dict()
+    assert set(own_state.keys()) == set(state_dict.keys())
+    for key, value in state_dict.items():
+        assert torch.equal(own_state[key], value)
+
+
+@pytest.mark.parametrize('legacy', [False, True])
+def test_load(tmp_path, legacy):
+    state_dict = get_net(0).state_dict()
+    checkpoint_path = str(tmp_path / 'net.pth')
+    torch.save(dict(state_dict=state_dict, runner_state=dict(iters=10)), checkpoint_path,
+               _use_new_zipfile_serialization=not legacy)
+    ref_dict = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+    out_dict = CheckpointHelper.load(checkpoint_path)
+    assert out_dict['runner_state'] == ref_dict['runner_state']
+    assert out_dict['state_dict'].keys() == ref_dict['state_dict'].keys()
+    for key in ref_dict['state_dict']:
+        assert torch.equal(out_dict['state_dict'][key], ref_dict['state_dict'][key])
+
+
+@pytest.mark.parametrize('format', ['state_dict', 'model', 'plain', 'parallel'])
+def test_load_net(tmp_path, format):
+    state_dict = get_net(0).state_dict()
+    checkpoint_path = str(tmp_path / 'net.pth')
+    if format == 'plain':
+        torch.save(state_dict, checkpoint_path)
+    elif format == 'parallel':
+        torch.save(dict(state_dict={'module.{}'.format(key): value for key, value in state_dict.items()}),
+                   checkpoint_path)
+    else:
+        torch.save({format: state_dict, 'runner_state': dict(iters=10)}, checkpoint_path)
+
+    net = RunnerHelper.load_net(Runner(checkpoint_path, resume_strict=True), get_net(1))
+    assert_state_equal(net.module, state_dict)
+
+
+def test_load_net_continue(tmp_path):
+    checkpoint_path = str(tmp_path / 'net.pth')
+    torch.save(dict(state_dict=get_net(0).state_dict(), runner_state=dict(iters=10, epoch=2)), checkpoint_path)
+    runner = Runner(checkpoint_path, resume_continue=True)
+    RunnerHelper.load_net(runner, get_net(1))
+    assert runner.runner_state == dict(iters=10, epoch=2)
+
+
+def test_load_net_sharded(tmp_path):
+    state_dict = get_net(0).state_dict()
+    weight_map = dict()
+    for i, key_list in enumerate([list(state_dict.keys())[:3], list(state_dict.keys())[3:]]):
+        shard_file = 'net-{:05d}.pth'.format(i)
+        torch.save({key: state_dict[key] for key in key_list}, str(tmp_path / shard_file))
+        weight_map.update({key: shard_file for key in key_list})
+
+    with open(str(tmp_path / 'net.index.json'), 'w') as write_stream:
+        json.dump(dict(weight_map=weight_map), write_stream)
+
+    net = RunnerHelper.load_net(Runner(str(tmp_path / 'net.index.json'), resume_strict=True), get_net(1))
+    assert_state_equal(net.module, state_dict)
+
+
+def test_load_state_dict_unmatched():
+    state_dict = get_net(0).state_dict()
+    state_dict['4.weight'] = torch.zeros(5, 8 * 6 * 6)
+    state_dict['extra'] = torch.zeros(1)
+    net = get_net(1)
+    ref_weight = net[4].weight.detach().clone()
+    loaded_keys = RunnerHelper.load_state_dict(net, state_dict, strict=False)
+    assert set(loaded_keys) == set(net.state_dict().keys()) - {'4.weight'}
+    assert torch.equal(net[4].weight, ref_weight)
+    assert torch.equal(net[4].bias, state_dict['4.bias'])
+    with pytest.raises(RuntimeError):
+        RunnerHelper.load_state_dict(get_net(1), state_dict, strict=True)
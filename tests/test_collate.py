@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the preallocated collate against the per-sample resize & pad it replaced.
+
+
+import copy
+import random
+import pytest
+import torch
+import torch.nn.functional as F
+
+from lib.data.collate import collate
+from lib.parallel.data_container import DataContainer
+from lib.tools.helper.tensor_helper import TensorHelper
+
+
+def get_batch(rng, batch_size):
+    batch = list()
+    for _ in range(batch_size):
+        width, height = rng.randint(20, 60), rng.randint(20, 60)
+        bboxes = torch.rand(3, 4) * 20
+        bboxes[:, 2:] += bboxes[:, :2]
+        batch.append(dict(
+            img=DataContainer(torch.rand(3, height, width), stack=True, return_dc=True, samples_per_gpu=True),
+            labelmap=DataContainer(torch.randint(-1, 5, (height, width)), stack=True, return_dc=True,
+                                   samples_per_gpu=True),
+            maskmap=DataContainer(torch.randint(0, 2, (height, width)).float(), stack=True, return_dc=True,
+                                  samples_per_gpu=True),
+            bboxes=DataContainer(bboxes, stack=False, return_dc=True, samples_per_gpu=True),
+            meta=DataContainer(dict(border_wh=[width, height]), stack=False, cpu_only=True, return_dc=True,
+                               samples_per_gpu=True)
+        ))
+
+    return batch
+
+
+def ref_collate(batch, trans_dict, device_ids):
+    """The per-sample resize, pad & stack of the collate before the preallocation."""
+    samples_per_gpu = (len(batch) - 1 + len(device_ids)) // len(device_ids)
+    chunks = [batch[start:start + samples_per_gpu] for start in range(0, len(batch), samples_per_gpu)]
+    out = dict(img=list(), labelmap=list(), maskmap=list(), bboxes=list(), meta=list())
+    for chunk in chunks:
+        if trans_dict['size_mode'] == 'fix_size':
+            target_width, target_height = trans_dict['input_size']
+        else:
+            target_width = max(sample['img'].size(2) for sample in chunk)
+            target_height = max(sample['img'].size(1) for sample in chunk)
+
+        maps = dict(img=list(), labelmap=list(), maskmap=list())
+        for sample in chunk:
+            sample['meta'].data['input_size'] = [target_width, target_height]
+            _, height, width = sample['img'].size()
+            scaled_size, left_pad, up_pad = [width, height], 0, 0
+            if scaled_size == [target_width, target_height]:
+                for key in maps:
+                    maps[key].append(sample[key].data)
+
+                continue
+
+            if trans_dict['align_method'] == 'scale_and_pad':
+                scale_ratio = min(target_width / width, target_height / height)
+                sample['bboxes'].data.mul_(scale_ratio)
+                scaled_size = (int(round(width * scale_ratio)), int(round(height * scale_ratio)))
+                sample['meta'].data['border_wh'] = scaled_size
+                for key, mode in (('img', 'bilinear'), ('labelmap', 'nearest'), ('maskmap', 'nearest')):
+                    align_corners = dict(align_corners=True) if key == 'img' else dict()
+                    sample[key]._data = TensorHelper.resize(sample[key].data, (scaled_size[1], scaled_size[0]),
+                                                            mode=mode, **align_corners)
+
+            pad_width, pad_height = target_width - scaled_size[0], target_height - scaled_size[1]
+            if trans_dict['pad_mode'] == 'random':
+                left_pad, up_pad = random.randint(0, pad_width), random.randint(0, pad_height)
+            elif trans_dict['pad_mode'] == 'pad_center':
+                left_pad, up_pad = pad_width // 2, pad_height // 2
+
+            pad = [left_pad, pad_width - left_pad, up_pad, pad_height - up_pad]
+            for key, value in (('img', 0), ('labelmap', -1), ('maskmap', 1)):
+                maps[key].append(F.pad(sample[key].data, pad=pad, value=value))
+
+            sample['bboxes'].data[:, 0::2] += left_pad
+            sample['bboxes'].data[:, 1::2] += up_pad
+
+        for key in maps:
+            out[key].append(torch.stack(maps[key]))
+
+        out['bboxes'].append([sample['bboxes'].data for sample in chunk])
+        out['meta'].append([sample['meta'].data for sample in chunk])
+
+    return out
+
+
+@pytest.mark.parametrize('device_ids', [[0], [0, 1]])
+@pytest.mark.parametrize('size_mode', ['fix_size', 'max_size'])
+@pytest.mark.parametrize('align_method', ['only_pad', 'scale_and_pad'])
+@pytest.mark.parametrize('pad_mode', ['random', 'pad_center', 'pad_right_down'])
+def test_collate(device_ids, size_mode, align_method, pad_mode):
+    rng = random.Random(len(device_ids))
+    trans_dict = dict(size_mode=size_mode, input_size=[64, 64], align_method=align_method, pad_mode=pad_mode)
+    for batch_size in (1, 4, 5):
+        batch = get_batch(rng, batch_size)
+        seed = rng.random()
+        random.seed(seed)
+        ref_dict = ref_collate(copy.deepcopy(batch), trans_dict, device_ids)
+        random.seed(seed)
+        out_dict = collate(copy.deepcopy(batch), trans_dict, device_ids=device_ids)
+        for key in ['img', 'labelmap', 'maskmap', 'bboxes', 'meta']:
+            out = out_dict[key].data if len(device_ids) > 1 else [out_dict[key]]
+            assert len(out) == len(ref_dict[key])
+            for out_chunk, ref_chunk in zip(out, ref_dict[key]):
+                if key in ['img', 'labelmap', 'maskmap']:
+                    assert out_chunk.dtype == ref_chunk.dtype and torch.equal(out_chunk, ref_chunk)
+                elif key == 'bboxes':
+                    assert all(torch.equal(a, b) for a, b in zip(out_chunk, ref_chunk))
+                else:
+                    # border_xy is added by the preallocated collate.
+                    assert [{k: v for k, v in meta.items() if k != 'border_xy'} for meta in out_chunk] == ref_chunk
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the fused affine transforms of CV2AugCompose against the sequential transforms.
+
+
+import random
+import numpy as np
+
+from lib.data.cv2_aug_transforms import CV2AugCompose
+from lib.tools.util.configer import Configer
+
+
+TRANS_DICT = dict(
+    random_resize=dict(ratio=1.0, method='random', scale_range=[0.6, 1.4], aspect_range=[0.8, 1.2]),
+    random_rotate=dict(ratio=1.0, max_degree=30, mean=[104, 117, 123]),
+    random_crop=dict(ratio=1.0, crop_size=[80, 64], method='random', allow_outside_center=True),
+    random_hflip=dict(ratio=0.5, swap_pair=[[1, 2]]),
+)
+
+
+def get_compose(trans_seq, fuse_affine):
+    aug_trans = dict(trans_seq=trans_seq, fuse_affine=fuse_affine)
+    aug_trans.update({trans_key: TRANS_DICT[trans_key] for trans_key in trans_seq})
+    configer = Configer(config_dict=dict(data=dict(input_mode='BGR'), train=dict(aug_trans=aug_trans)))
+    return CV2AugCompose(configer, split='train')
+
+
+def get_sample(width=128, height=96):
+    xs, ys = np.meshgrid(np.arange(width), np.arange(height))
+    img = np.stack([xs * 255.0 / width, ys * 255.0 / height, (xs + ys) * 127.0 / (width + height)], axis=-1)
+    labelmap = (xs // 16 + ys // 16 * 8) % 5
+    kpts = np.array([[[20.0, 30.0, 1.0], [60.5, 40.25, 1.0], [100.0, 70.0, 1.0]]])
+    return img.astype(np.uint8), labelmap.astype(np.uint8), kpts
+
+
+def run(trans_seq, fuse_affine, seed):
+    img, labelmap, kpts = get_sample()
+    random.seed(seed)
+    return get_compose(trans_seq, fuse_affine)(img, labelmap=labelmap, kpts=kpts)
+
+
+def check_fused(trans_seq, max_img_diff, min_label_acc):
+    for seed in range(20):
+        seq_img, seq_labelmap, seq_kpts = run(trans_seq, False, seed)
+        img, labelmap, kpts = run(trans_seq, True, seed)
+        assert img.shape == seq_img.shape and labelmap.shape == seq_labelmap.shape
+        assert np.abs(img.astype(np.float32) - seq_img.astype(np.float32)).mean() <= max_img_diff
+        assert (labelmap == seq_labelmap).mean() >= min_label_acc
+        np.testing.assert_allclose(kpts, seq_kpts, atol=1e-4)
+
+
+def test_fused_resize():
+    # Only one interpolation, the same as cv2.resize with the half-pixel centers.
+    for seed in range(20):
+        seq_img, seq_labelmap, _ = run(['random_resize'], False, seed)
+        img, labelmap, _ = run(['random_resize'], True, seed)
+        assert np.abs(img.astype(np.int32) - seq_img.astype(np.int32)).max() <= 1
+        assert (labelmap == seq_labelmap).mean() >= 0.98
+
+
+def test_fused_resize_crop_flip():
+    check_fused(['random_resize', 'random_crop', 'random_hflip'], max_img_diff=0.5, min_label_acc=0.98)
+
+
+def test_fused_rotate():
+    check_fused(['random_resize', 'random_rotate', 'random_crop', 'random_hflip'],
+                max_img_diff=1.5, min_label_acc=0.95)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the foreach gradient norm & clip against the per-parameter loop they replaced.
+
+
+import math
+import pytest
+import torch
+import torch.nn as nn
+
+from lib.runner.runner_helper import RunnerHelper
+
+
+class Net(nn.Module):
+    def __init__(self):
+        super(Net, self).__init__()
+        self.backbone = nn.Sequential(nn.Conv2d(3, 8, 3), nn.BatchNorm2d(8), nn.ReLU())
+        self.decoder = nn.Sequential(nn.Flatten(), nn.Linear(8 * 6 * 6, 10))
+        # Not used in forward, so its parameters require grad but have no grad.
+        self.aux = nn.Linear(4, 4)
+
+    def forward(self, x):
+        return self.decoder(self.backbone(x))
+
+
+class Wrapper(nn.Module):
+    # The parameter names with module., as the parallel wrappers.
+    def __init__(self, module):
+        super(Wrapper, self).__init__()
+        self.module = module
+
+
+def get_net(seed, scale=1.0):
+    torch.manual_seed(seed)
+    net = Net()
+    net.backbone[0].bias.requires_grad_(False)
+    (net(torch.randn(4, 3, 8, 8)).pow(2).sum() * scale).backward()
+    return net
+
+
+def ref_clip_grad(net, max_grad):
+    # The loop before the foreach kernels, on the parameters with a grad.
+    total_norm = 0
+    for p in net.parameters():
+        if p.grad is not None:
+            total_norm += p.grad.data.norm() ** 2
+
+    total_norm = math.sqrt(total_norm)
+    norm = max_grad / max(total_norm, max_grad)
+    for p in net.parameters():
+        if p.grad is not None:
+            p.grad.mul_(norm)
+
+    return total_norm
+
+
+def test_grad_norm():
+    net = get_net(0)
+    total_norm, group_norms = RunnerHelper.grad_norm(Wrapper(net), group_depth=1)
+    grad_dict = {name: p.grad for name, p in net.named_parameters() if p.grad is not None}
+    ref_norm = torch.stack([grad.norm() for grad in grad_dict.values()]).norm()
+    assert torch.allclose(total_norm, ref_norm, rtol=1e-6)
+    assert list(group_norms.keys()) == ['backbone', 'decoder']
+    for group, group_norm in group_norms.items():
+        ref_norm = torch.stack([grad.norm() for name, grad in grad_dict.items() if name.startswith(group)]).norm()
+        assert torch.allclose(group_norm, ref_norm, rtol=1e-6)
+
+    assert len(RunnerHelper.grad_norm(net)[1]) == 0
+    assert RunnerHelper.grad_norm(Net())[0].item() == 0
+
+
+@pytest.mark.parametrize('scale', [1e-4, 1.0, 1e4])
+def test_clip_grad(scale):
+    net = get_net(0, scale=scale)
+    ref_net, torch_net = get_net(0, scale=scale), get_net(0, scale=scale)
+    total_norm = RunnerHelper.clip_grad(net, max_grad=10.)
+    ref_norm = ref_clip_grad(ref_net, max_grad=10.)
+    torch_norm = torch.nn.utils.clip_grad_norm_([p for p in torch_net.parameters() if p.grad is not None], 10.)
+    assert math.isclose(total_norm.item(), ref_norm, rel_tol=1e-5)
+    assert torch.allclose(total_norm, torch_norm, rtol=1e-6)
+    for p, ref_p, torch_p in zip(net.parameters(), ref_net.parameters(), torch_net.parameters()):
+        if p.grad is None:
+            assert ref_p.grad is None and torch_p.grad is None
+            continue
+
+        assert torch.allclose(p.grad, ref_p.grad, rtol=1e-5, atol=1e-12)
+        assert torch.allclose(p.grad, torch_p.grad, rtol=1e-6, atol=1e-12)
+
+
+def test_clip_grad_total_norm():
+    # The norm precomputed by grad_norm, e.g. kept for the logging.
+    net, ref_net = get_net(0, scale=1e4), get_net(0, scale=1e4)
+    total_norm, _ = RunnerHelper.grad_norm(net)
+    assert RunnerHelper.clip_grad(net, max_grad=10., total_norm=total_norm) is total_norm
+    RunnerHelper.clip_grad(ref_net, max_grad=10.)
+    for p, ref_p in zip(net.parameters(), ref_net.parameters()):
+        if p.grad is not None:
+            assert torch.equal(p.grad, ref_p.grad)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the label lookup tables against the per-class masks they replaced.
+
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from lib.tools.helper.label_helper import LabelHelper
+from lib.tools.util.configer import Configer
+
+
+# The train ids of cityscapes.
+LABEL_LIST = [7, 8, 11, 12, 13, 17, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 31, 32, 33]
+
+
+def get_labelmap(seed):
+    rng = np.random.RandomState(seed)
+    # Every id of uint8 is present, with the ids of label_list more frequent.
+    labelmap = np.concatenate([np.arange(256), rng.choice(LABEL_LIST + [0, 255], 64 * 64 - 256)])
+    return rng.permutation(labelmap).reshape(64, 64).astype(np.uint8)
+
+
+def ref_encode(labelmap, label_list):
+    encoded_labelmap = np.ones(shape=labelmap.shape, dtype=np.float32) * 255
+    for i, class_id in enumerate(label_list):
+        encoded_labelmap[labelmap == class_id] = i
+
+    return encoded_labelmap
+
+
+def ref_reduce_zero(labelmap):
+    labelmap = np.array(labelmap)
+    labelmap[labelmap == 0] = 255
+    labelmap = labelmap - 1
+    labelmap[labelmap == 254] = 255
+    return labelmap
+
+
+def ref_decode(labelmap, label_list, num_classes):
+    label_dst = np.zeros(labelmap.shape, dtype=np.uint8)
+    for i in range(num_classes):
+        label_dst[labelmap == i] = label_list[i]
+
+    return label_dst
+
+
+@pytest.mark.parametrize('label_list', [None, LABEL_LIST])
+@pytest.mark.parametrize('reduce_zero_label', [False, True])
+def test_encode(label_list, reduce_zero_label):
+    configer = Configer(config_dict=dict(data=dict(label_list=label_list, reduce_zero_label=reduce_zero_label)))
+    lut = LabelHelper.get_encode_lut(configer)
+    labelmap = get_labelmap(0)
+    ref_labelmap = labelmap
+    if label_list:
+        ref_labelmap = ref_encode(ref_labelmap, label_list)
+
+    if reduce_zero_label:
+        ref_labelmap = ref_reduce_zero(ref_labelmap)
+
+    out_labelmap = LabelHelper.apply(labelmap, lut)
+    assert out_labelmap.dtype == np.uint8
+    np.testing.assert_array_equal(out_labelmap, ref_labelmap)
+    # The pil labelmaps are mapped to pil labelmaps.
+    out_img = LabelHelper.apply(Image.fromarray(labelmap, 'P'), lut)
+    assert isinstance(out_img, Image.Image)
+    np.testing.assert_array_equal(np.array(out_img), ref_labelmap)
+
+
+def test_relabel():
+    # The order of SegEvaluator.relabel: reduce_zero_label, then label_list.
+    labelmap = get_labelmap(1)
+    lut = LabelHelper.compose(LabelHelper.reduce_zero_lut(), LabelHelper.encode_lut(LABEL_LIST))
+    ref_labelmap = ref_encode(ref_reduce_zero(labelmap).astype(np.uint8), LABEL_LIST)
+    np.testing.assert_array_equal(LabelHelper.apply(labelmap, lut), ref_labelmap)
+
+
+@pytest.mark.parametrize('reduce_zero_label', [False, True])
+def test_decode(reduce_zero_label):
+    # The label writer of FCNSegmentorTest: label_list, then reduce_zero_label.
+    labelmap = get_labelmap(2)
+    lut = LabelHelper.compose(LabelHelper.decode_lut(LABEL_LIST, len(LABEL_LIST)),
+                              LabelHelper.restore_zero_lut() if reduce_zero_label else None)
+    ref_labelmap = ref_decode(labelmap, LABEL_LIST, len(LABEL_LIST))
+    if reduce_zero_label:
+        ref_labelmap = (ref_labelmap + 1).astype(np.uint8)
+
+    np.testing.assert_array_equal(LabelHelper.apply(labelmap, lut), ref_labelmap)
+
+
+def test_none():
+    labelmap = get_labelmap(3)
+    assert LabelHelper.compose(None, None) is None
+    assert LabelHelper.apply(labelmap, None) is labelmap
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# Author: Donny You(youansheng@gmail.com)
+# Tests of the vectorized heatmap & PAF generators against the per-keypoint loops they replaced.
+
+
+import math
+import numpy as np
+import pytest
+
+from data.pose.utils.heatmap_generator import HeatmapGenerator
+from data.pose.utils.paf_generator import PafGenerator
+from lib.tools.util.configer import Configer
+
+
+LIMB_SEQ = [[1, 2], [2, 3], [3, 4], [1, 4], [2, 5]]
+
+
+def get_configer(stride, sigma=2.0, method='gaussian', theta=1.0):
+    return Configer(config_dict=dict(
+        network=dict(stride=stride), data=dict(num_kpts=5), details=dict(limb_seq=LIMB_SEQ),
+        target=dict(heatmap=dict(sigma=sigma, method=method), paf=dict(theta=theta))))
+
+
+def get_kpts(rng, num_persons, width, height):
+    kpts = np.zeros((num_persons, 5, 3), dtype=np.float32)
+    kpts[:, :, 0] = rng.uniform(-10, width + 10, (num_persons, 5))
+    kpts[:, :, 1] = rng.uniform(-10, height + 10, (num_persons, 5))
+    kpts[:, :, 2] = rng.choice([-1, 1], (num_persons, 5), p=[0.2, 0.8])
+    return kpts
+
+
+def ref_heatmap(gt_kpts, input_size, stride, sigma, method):
+    width, height = input_size
+    heatmap = np.zeros((5 + 1, height // stride, width // stride), dtype=np.float32)
+    start = stride / 2.0 - 0.5
+    for i in range(len(gt_kpts)):
+        for j in range(5):
+            if gt_kpts[i][j][2] < 0:
+                continue
+
+            xx, yy = np.meshgrid(range(int(width // stride)), range(int(height // stride)))
+            d2 = (xx * stride + start - gt_kpts[i][j][0]) ** 2 + (yy * stride + start - gt_kpts[i][j][1]) ** 2
+            exponent = d2 / 2.0 / sigma / sigma if method == 'gaussian' else np.sqrt(d2) / 2.0 / sigma
+            heatmap[j:j+1] += np.multiply(exponent <= 4.6052, np.exp(-exponent))[np.newaxis]
+            heatmap[j:j+1][heatmap[j:j+1] > 1.0] = 1.0
+
+        heatmap[5] = 1.0 - np.max(heatmap[:-1], axis=0)
+
+    return heatmap
+
+
+def ref_paf(gt_kpts, input_size, stride, theta):
+    width, height = input_size[0] // stride, input_size[1] // stride
+    accumulate_vec_map = np.zeros((len(LIMB_SEQ) * 2, height, width), dtype=np.float32)
+    cnt = np.zeros((len(LIMB_SEQ), height, width), dtype=np.int32)
+    for j in range(len(gt_kpts)):
+        for i in range(len(LIMB_SEQ)):
+            a, b = LIMB_SEQ[i][0] - 1, LIMB_SEQ[i][1] - 1
+            if gt_kpts[j][a][2] < 0 or gt_kpts[j][b][2] < 0:
+                continue
+
+            ax, ay = gt_kpts[j][a][0].item() / stride, gt_kpts[j][a][1].item() / stride
+            bx, by = gt_kpts[j][b][0].item() / stride, gt_kpts[j][b][1].item() / stride
+            bax, bay = bx - ax, by - ay
+            norm_ba = math.sqrt(bax * bax + bay * bay)
+            if norm_ba == 0:
+                continue
+
+            bax, bay = bax / norm_ba, bay / norm_ba
+            min_w, max_w = max(int(round(min(ax, bx) - theta)), 0), min(int(round(max(ax, bx) + theta)), width)
+            min_h, max_h = max(int(round(min(ay, by) - theta)), 0), min(int(round(max(ay, by) + theta)), height)
+            xx, yy = np.meshgrid(list(range(min_w, max_w)), list(range(min_h, max_h)))
+            xx, yy = xx.astype(np.uint32), yy.astype(np.uint32)
+            mask = np.abs(bax * (yy - ay) - bay * (xx - ax)) < theta
+            vec_map = np.zeros((2, height, width), dtype=np.float32)
+            vec_map[:, yy, xx] = np.repeat(mask[np.newaxis], 2, axis=0)
+            vec_map[:, yy, xx] *= np.array([bax, bay])[:, np.newaxis, np.newaxis]
+            mask = np.logical_or(np.abs(vec_map[0:1]) > 0, np.abs(vec_map[1:2]) > 0)
+            accumulate_vec_map[2*i:2*i+2] = np.multiply(accumulate_vec_map[2*i:2*i+2], cnt[i:i+1])
+            accumulate_vec_map[2*i:2*i+2] += vec_map
+            cnt[i:i+1][mask == 1] += 1
+            mask = cnt[i:i+1] == 0
+            cnt[i:i+1][mask == 1] = 1
+            accumulate_vec_map[2*i:2*i+2] = np.divide(accumulate_vec_map[2*i:2*i+2], cnt[i:i+1])
+            cnt[i:i+1][mask == 1] = 0
+
+    return accumulate_vec_map
+
+
+@pytest.mark.parametrize('stride', [1, 4, 8])
+@pytest.mark.parametrize('method', ['gaussian', 'laplace'])
+def test_heatmap(stride, method):
+    rng = np.random.RandomState(stride)
+    for num_persons in (0, 1, 6):
+        kpts = get_kpts(rng, num_persons, 96, 64)
+        heatmap = HeatmapGenerator(get_configer(stride, sigma=3.0, method=method))(kpts, [96, 64])
+        np.testing.assert_array_equal(heatmap.numpy(), ref_heatmap(kpts, [96, 64], stride, 3.0, method))
+
+
+@pytest.mark.parametrize('stride', [1, 4, 8])
+def test_paf(stride):
+    rng = np.random.RandomState(stride)
+    for num_persons in (0, 1, 8):
+        kpts = get_kpts(rng, num_persons, 96, 64)
+        vecmap = PafGenerator(get_configer(stride, theta=1.0))(kpts, [96, 64])
+        np.testing.assert_array_equal(vecmap.numpy(), ref_paf(kpts, [96, 64], stride, 1.0))